@@ -1,8 +1,12 @@
 
 import os
+import sys
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from services.mongo_service import lookup_keys_for
+
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
@@ -30,6 +34,8 @@ new_drivers = [
 ]
 
 for d in new_drivers:
+    # Canonical lookup keys used by the backend
+    d.update(lookup_keys_for(d))
     if not drivers.find_one({"driverId": d["driverId"]}):
         drivers.insert_one(d)
         print(f"Added {d['driverId']}")
@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+# Drives /chat, /chat/history and /agent/escalations at a fixed concurrency
+# and reports throughput and latency percentiles per scenario. Point it at
+# bench/server.py (stubbed Bedrock/Polly/Mongo) or at a real deployment.
+# Usage (from backend/):
+#   python -m bench.loadgen [--url http://127.0.0.1:8100] [--concurrency 32]
+#       [--duration 30] [--warmup 5] [--mix chat=6,history=3,escalations=1]
+#       [--json results.json] [--compare baseline.json] [--spawn-server]
+# --json writes the results with the commit hash, so runs on different
+# commits can be compared with --compare. Needs httpx (requirements-bench.txt).
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_PATH = os.path.join(BACKEND_DIR, "data", "language_corpus.tsv")
+PERCENTILES = (50, 90, 95, 99)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--url", default="http://127.0.0.1:8100")
+parser.add_argument("--concurrency", type=int, default=32, help="concurrent virtual users")
+parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before the run")
+parser.add_argument("--mix", default="chat=6,history=3,escalations=1", help="relative weight of each scenario")
+parser.add_argument("--drivers", type=int, default=1000, help="driver ids DRV00000.. to spread load over")
+parser.add_argument("--timeout", type=float, default=30.0)
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--json", dest="json_path", help="write results to this file")
+parser.add_argument("--compare", help="results file from an earlier run to diff against")
+parser.add_argument("--spawn-server", action="store_true",
+                    help="start bench/server.py on the --url port for the run; extra server flags follow --")
+args, server_args = parser.parse_known_args()
+if server_args and server_args[0] == "--":
+    server_args = server_args[1:]
+
+
+def load_messages():
+    messages = []
+    try:
+        with open(CORPUS_PATH, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#") or "\t" not in line:
+                    continue
+                text = line.split("\t", 1)[0].strip()
+                if text:
+                    messages.append(text)
+    except OSError:
+        pass
+    return messages or ["Where is the nearest station?", "I want to swap my battery", "Mera invoice bhejo"]
+
+
+def parse_mix(spec):
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def driver_id(rng):
+    return f"DRV{rng.randrange(args.drivers):05d}"
+
+
+async def chat(client, rng, messages):
+    return await client.post("/chat", json={"message": rng.choice(messages), "driver_id": driver_id(rng)})
+
+
+async def history(client, rng, messages):
+    return await client.get(f"/chat/history/{driver_id(rng)}", params={"limit": 50})
+
+
+async def escalations(client, rng, messages):
+    return await client.get("/agent/escalations", params={"status": "OPEN", "limit": 20})
+
+
+SCENARIOS = {"chat": chat, "history": history, "escalations": escalations}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}    # scenario -> [seconds]
+        self.errors = {}       # scenario -> {reason: count}
+        self.recording = False
+
+    def add(self, scenario, seconds, error=None):
+        if not self.recording:
+            return
+        if error:
+            errors = self.errors.setdefault(scenario, {})
+            errors[error] = errors.get(error, 0) + 1
+        else:
+            self.latencies.setdefault(scenario, []).append(seconds)
+
+    def summary(self, elapsed):
+        scenarios = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            samples = sorted(self.latencies.get(name, []))
+            errors = sum(self.errors.get(name, {}).values())
+            entry = {"requests": len(samples) + errors, "errors": errors, "error_kinds": self.errors.get(name, {}),
+                     "rps": round(len(samples) / elapsed, 2)}
+            entry.update(_distribution(samples))
+            scenarios[name] = entry
+        total = sorted(s for samples in self.latencies.values() for s in samples)
+        overall = {"requests": sum(e["requests"] for e in scenarios.values()),
+                   "errors": sum(e["errors"] for e in scenarios.values()),
+                   "rps": round(len(total) / elapsed, 2)}
+        overall.update(_distribution(total))
+        return {"overall": overall, "scenarios": scenarios}
+
+
+def _distribution(samples):
+    if not samples:
+        return {}
+    out = {f"p{p}_ms": round(_percentile(samples, p) * 1000, 1) for p in PERCENTILES}
+    out["max_ms"] = round(samples[-1] * 1000, 1)
+    out["mean_ms"] = round(sum(samples) / len(samples) * 1000, 1)
+    return out
+
+
+def _percentile(sorted_samples, p):
+    """Nearest-rank percentile."""
+    rank = max(1, math.ceil(p / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+async def user(client, rng, weights, messages, recorder, stop_at):
+    names, shares = list(weights), list(weights.values())
+    while time.perf_counter() < stop_at:
+        name = rng.choices(names, shares)[0]
+        start = time.perf_counter()
+        try:
+            response = await SCENARIOS[name](client, rng, messages)
+            error = None if response.status_code < 400 else f"HTTP {response.status_code}"
+        except Exception as e:
+            error = type(e).__name__
+        recorder.add(name, time.perf_counter() - start, error)
+
+
+async def run(weights, messages):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    recorder = Recorder()
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        stop_at = start + args.warmup + args.duration
+        users = [asyncio.create_task(user(client, random.Random(args.seed + i), weights, messages, recorder, stop_at))
+                 for i in range(args.concurrency)]
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        measured_from = time.perf_counter()
+        await asyncio.gather(*users)
+        elapsed = time.perf_counter() - measured_from
+        server_stats = None
+        try:
+            server_stats = (await client.get("/stats")).json()
+        except Exception:
+            pass
+    return recorder.summary(elapsed), elapsed, server_stats
+
+
+def wait_ready(timeout=60.0):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{args.url}/ready", timeout=2).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def spawn_server():
+    port = args.url.rsplit(":", 1)[-1].split("/")[0]
+    command = [sys.executable, "-m", "bench.server", "--port", port, "--drivers", str(args.drivers)] + server_args
+    process = subprocess.Popen(command, cwd=BACKEND_DIR)
+    if not wait_ready():
+        process.terminate()
+        raise SystemExit("Bench server did not become ready")
+    return process
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(summary):
+    columns = ["requests", "errors", "rps"] + [f"p{p}_ms" for p in PERCENTILES] + ["max_ms", "mean_ms"]
+    print(f"{'scenario':<12}" + "".join(f"{c:>10}" for c in columns))
+    rows = list(summary["scenarios"].items()) + [("overall", summary["overall"])]
+    for name, entry in rows:
+        print(f"{name:<12}" + "".join(f"{entry.get(c, '-'):>10}" for c in columns))
+
+
+def print_comparison(summary, baseline):
+    print(f"\nvs {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp', '?')}):")
+    keys = ("rps", "p50_ms", "p95_ms", "p99_ms")
+    print(f"{'scenario':<12}" + "".join(f"{k:>18}" for k in keys))
+    rows = list(summary["scenarios"].items()) + [("overall", summary["overall"])]
+    for name, entry in rows:
+        before = baseline["overall"] if name == "overall" else baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        cells = []
+        for k in keys:
+            old, new = before.get(k), entry.get(k)
+            if not old or new is None:
+                cells.append(f"{'-':>18}")
+            else:
+                cells.append(f"{new:>9} ({(new - old) / old * 100:+5.1f}%)")
+        print(f"{name:<12}" + "".join(cells))
+
+
+def main():
+    weights = parse_mix(args.mix)
+    messages = load_messages()
+    process = spawn_server() if args.spawn_server else None
+    try:
+        summary, elapsed, server_stats = asyncio.run(run(weights, messages))
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+    print(f"{args.concurrency} users, {elapsed:.1f}s measured after {args.warmup:.0f}s warmup, mix {args.mix}")
+    print_table(summary)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "url": args.url,
+        "config": {"concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup,
+                   "mix": weights, "drivers": args.drivers, "server_args": server_args if process else None},
+        "elapsed": round(elapsed, 2),
+        **summary,
+        "server": server_stats,
+    }
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nWrote {args.json_path}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(summary, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import re
+import copy
+import asyncio
+
+from bench.stubs import LatencyDistribution
+
+# An in-memory stand-in for the subset of Motor the services use: find_one,
+# find().sort().limit().to_list(), insert_one/insert_many,
+# update_one/find_one_and_update with $set, count_documents and create_index.
+# Filters understand equality, $or/$and, $gt/$gte/$lt/$lte/$ne/$in/$regex
+# and $exists. There are no change streams (watch() raises, so the services
+# fall back to polling), and indexes are recorded but not used.
+
+
+def _object_id():
+    from bson import ObjectId
+    return ObjectId()
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return _MISSING
+        doc = doc[part]
+    return doc
+
+
+_MISSING = object()
+
+
+def _compare(value, op, operand):
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$regex":
+        return isinstance(value, str) and re.search(operand, value) is not None
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise NotImplementedError(f"Unsupported query operator {op}")
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            value = _get(doc, key)
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif _get(doc, key) != condition:
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v}
+    if include:
+        out = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    return {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+
+
+def _sort_key(spec):
+    def key(doc):
+        parts = []
+        for field, direction in spec:
+            value = _get(doc, field)
+            # Missing sorts first, as in Mongo; wrap so descending can invert
+            parts.append(_Ordered(value is not _MISSING, value if value is not _MISSING else None, direction))
+        return parts
+    return key
+
+
+class _Ordered:
+    __slots__ = ("present", "value", "direction")
+
+    def __init__(self, present, value, direction):
+        self.present, self.value, self.direction = present, value, direction
+
+    def __lt__(self, other):
+        a, b = (self.present, self.value), (other.present, other.value)
+        if a == b:
+            return False
+        try:
+            less = a < b
+        except TypeError:
+            less = str(a) < str(b)
+        return less if self.direction > 0 else not less
+
+    def __eq__(self, other):
+        return (self.present, self.value) == (other.present, other.value)
+
+
+def _normalize_sort(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    return list(key_or_list)
+
+
+class _InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class _InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+class _UpdateResult:
+    def __init__(self, matched, modified):
+        self.matched_count = matched
+        self.modified_count = modified
+
+
+class MemoryCursor:
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = None
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def _results(self):
+        docs = [d for d in self._collection._docs.values() if matches(d, self._query)]
+        if self._sort:
+            docs.sort(key=_sort_key(self._sort))
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(d, self._projection) for d in docs]
+
+    async def to_list(self, length=None):
+        await self._collection._delay()
+        docs = self._results()
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._collection._delay()
+        for doc in self._results():
+            yield doc
+
+
+class MemoryCollection:
+    def __init__(self, name, latency=None):
+        self.name = name
+        self.latency = latency or LatencyDistribution("0")
+        self._docs = {}      # _id -> doc, in insertion order
+        self.indexes = {}
+        self.ops = 0
+
+    async def _delay(self):
+        self.ops += 1
+        delay = self.latency.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def with_options(self, **kwargs):
+        return self
+
+    async def create_index(self, keys, **options):
+        name = options.get("name") or "_".join(f"{k}_{d}" for k, d in _normalize_sort(keys))
+        self.indexes[name] = (keys, options)
+        return name
+
+    def _insert(self, doc):
+        doc.setdefault("_id", _object_id())
+        if doc["_id"] in self._docs:
+            from pymongo.errors import DuplicateKeyError
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} _id: {doc['_id']}")
+        self._docs[doc["_id"]] = copy.deepcopy(doc)
+        return doc["_id"]
+
+    async def insert_one(self, doc):
+        await self._delay()
+        return _InsertOneResult(self._insert(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        await self._delay()
+        inserted, errors = [], []
+        for i, doc in enumerate(docs):
+            try:
+                inserted.append(self._insert(doc))
+            except Exception as e:
+                errors.append({"index": i, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            from pymongo.errors import BulkWriteError
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return _InsertManyResult(inserted)
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        await self._delay()
+        cursor = MemoryCursor(self, query or {}, projection)
+        if sort:
+            cursor.sort(sort)
+        docs = cursor.limit(1)._results()
+        return docs[0] if docs else None
+
+    def find(self, query=None, projection=None):
+        return MemoryCursor(self, query or {}, projection)
+
+    async def count_documents(self, query):
+        await self._delay()
+        return sum(1 for d in self._docs.values() if matches(d, query))
+
+    def _apply(self, doc, update):
+        for op, fields in update.items():
+            if op == "$set":
+                doc.update(copy.deepcopy(fields))
+            elif op == "$inc":
+                for k, v in fields.items():
+                    doc[k] = doc.get(k, 0) + v
+            else:
+                raise NotImplementedError(f"Unsupported update operator {op}")
+
+    async def update_one(self, query, update):
+        await self._delay()
+        for doc in self._docs.values():
+            if matches(doc, query):
+                self._apply(doc, update)
+                return _UpdateResult(1, 1)
+        return _UpdateResult(0, 0)
+
+    async def find_one_and_update(self, query, update, projection=None, **kwargs):
+        """Returns the document as it was before the update (Motor's default)."""
+        await self._delay()
+        for doc in self._docs.values():
+            if matches(doc, query):
+                before = _project(doc, projection)
+                self._apply(doc, update)
+                return before
+        return None
+
+    def watch(self, *args, **kwargs):
+        raise NotImplementedError("The in-memory stand-in has no change streams")
+
+    def __len__(self):
+        return len(self._docs)
+
+
+class _Admin:
+    async def command(self, name, *args, **kwargs):
+        return {"ok": 1.0}
+
+
+class MemoryClient:
+    def __init__(self, latency=None):
+        self.admin = _Admin()
+        self.latency = latency
+        self._databases = {}
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(name, self)
+        return self._databases[name]
+
+
+class MemoryDatabase:
+    def __init__(self, name="bench", client=None, latency=None):
+        self.name = name
+        self.client = client or MemoryClient(latency)
+        self.latency = latency or self.client.latency
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name, self.latency)
+        return self._collections[name]
+
+    def stats(self):
+        return {name: {"documents": len(c), "ops": c.ops} for name, c in self._collections.items()}
@@ -0,0 +1,116 @@
+import os
+import sys
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Runs the real app in-process with Bedrock, Polly and Mongo replaced by the
+# stand-ins in bench/, seeded with drivers, escalations and chat history, so
+# bench/loadgen.py can measure the app itself without AWS or a database.
+# Usage (from backend/):
+#   python -m bench.server [--port 8100] [--bedrock-latency lognormal:800ms:0.5]
+#       [--token-latency fixed:10ms] [--polly-latency lognormal:150ms:0.4]
+#       [--mongo-latency fixed:1ms] [--drivers 1000] [--escalations 5000] [--history 20]
+# Latency specs are described in bench/stubs.py.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--host", default="127.0.0.1")
+parser.add_argument("--port", type=int, default=8100)
+parser.add_argument("--bedrock-latency", default="lognormal:800ms:0.5", help="time to first token")
+parser.add_argument("--token-latency", default="fixed:10ms", help="gap between generated tokens")
+parser.add_argument("--bedrock-error-rate", type=float, default=0.0)
+parser.add_argument("--escalate-rate", type=float, default=0.05, help="share of generations with escalate=true")
+parser.add_argument("--generations", help="JSON file with a list of raw generations to cycle through")
+parser.add_argument("--polly-latency", default="lognormal:150ms:0.4")
+parser.add_argument("--mongo-latency", default="fixed:1ms", help="added to every Mongo operation")
+parser.add_argument("--drivers", type=int, default=1000)
+parser.add_argument("--escalations", type=int, default=5000)
+parser.add_argument("--history", type=int, default=20, help="seeded messages per driver")
+parser.add_argument("--seed", type=int, default=1)
+args = parser.parse_args()
+
+# The bench runs one process; cross-worker relays would only add noise
+os.environ.setdefault("EVENT_BROKER", "memory")
+os.environ.setdefault("PREWARM_BEDROCK_INVOKE", "0")
+
+import json
+import uvicorn
+
+from bench.stubs import StubBedrockClient, StubPollyClient, LatencyDistribution
+from bench.memory_mongo import MemoryDatabase
+from services.container import services, DB_NAME
+from services.mongo_service import lookup_keys_for
+
+
+def driver_id_for(i):
+    return f"DRV{i:05d}"
+
+
+def seed(db, rng):
+    drivers = db["drivers"]
+    escalations = db["escalations"]
+    messages = db["messages"]
+    now = datetime.utcnow().replace(microsecond=0)
+    plans = ("Basic", "Standard", "Premium")
+
+    for i in range(args.drivers):
+        driver = {
+            "driver_id": driver_id_for(i),
+            "name": f"Driver {i}",
+            "phone": f"98{i:08d}",
+            "language": rng.choice(("English", "Hindi", "Marathi")),
+            "subscription": rng.choice(plans),
+            "subscription_expiry": (now + timedelta(days=rng.randint(-10, 90))).date().isoformat(),
+            "last_swap": (now - timedelta(days=rng.randint(0, 30))).date().isoformat(),
+            "vehicle_no": f"MH12AB{i:04d}",
+        }
+        driver.update(lookup_keys_for(driver))
+        drivers._insert(driver)
+
+        for j in range(args.history):
+            messages._insert({
+                "driver_id": driver_id_for(i),
+                "sender": "user" if j % 2 == 0 else "bot",
+                "text": f"Seeded message {j}",
+                "timestamp": now - timedelta(minutes=args.history - j),
+            })
+
+    intents = ("battery swap", "invoice", "subscription", "nearest station", "leave")
+    for k in range(args.escalations):
+        escalations._insert({
+            "driver_id": driver_id_for(rng.randrange(max(1, args.drivers))),
+            "intent": rng.choice(intents),
+            "confidence": round(rng.uniform(0.3, 0.9), 2),
+            "summary": "Seeded escalation",
+            # Mostly history, as in production; a few open and in progress
+            "status": rng.choices(("RESOLVED", "OPEN", "IN_PROGRESS"), weights=(90, 9, 1))[0],
+            "created_at": now - timedelta(seconds=k * 30),
+        })
+
+
+def main():
+    rng = random.Random(args.seed)
+    generations = None
+    if args.generations:
+        with open(args.generations, encoding="utf-8") as f:
+            generations = json.load(f)
+
+    db = MemoryDatabase(DB_NAME, latency=LatencyDistribution(args.mongo_latency, random.Random(args.seed)))
+    seed(db, rng)
+    services.override(
+        mongo_db=db,
+        bedrock_client=StubBedrockClient(args.bedrock_latency, args.token_latency, args.escalate_rate,
+                                         args.bedrock_error_rate, generations, seed=args.seed),
+        polly_client=StubPollyClient(args.polly_latency, seed=args.seed),
+    )
+    print(f"Seeded {args.drivers} drivers, {args.escalations} escalations, "
+          f"{args.drivers * args.history} messages; serving on http://{args.host}:{args.port}", flush=True)
+
+    import main as app_module
+    uvicorn.run(app_module.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
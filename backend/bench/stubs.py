@@ -0,0 +1,187 @@
+import io
+import re
+import json
+import time
+import random
+import itertools
+import threading
+
+from services.degraded_mode import degraded_result
+
+# Stand-ins for the bedrock-runtime and Polly clients, with the same call
+# signatures and response shapes the services use. Latencies are drawn from
+# a LatencyDistribution; generations are canned (the degraded-mode templates
+# for the intent the query's keywords suggest, or a file of raw generations).
+
+
+class LatencyDistribution:
+    """
+    Parsed from a spec string:
+      0 / none                  no delay
+      fixed:50ms                always 50 ms
+      uniform:20ms-80ms         uniform between the bounds
+      lognormal:800ms:0.5       log-normal with median 800 ms and sigma 0.5 (long right tail)
+    Durations take ms or s.
+    """
+
+    def __init__(self, spec, rng=None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, _, args = (spec or "0").partition(":")
+        self.kind = kind.strip().lower()
+        if self.kind in ("0", "none", ""):
+            self.kind = "none"
+        elif self.kind == "fixed":
+            self.value = _seconds(args)
+        elif self.kind == "uniform":
+            low, high = args.split("-")
+            self.low, self.high = _seconds(low), _seconds(high)
+        elif self.kind == "lognormal":
+            median, _, sigma = args.partition(":")
+            self.median, self.sigma = _seconds(median), float(sigma or "0.5")
+        else:
+            raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+    def sample(self):
+        if self.kind == "none":
+            return 0.0
+        if self.kind == "fixed":
+            return self.value
+        if self.kind == "uniform":
+            return self.rng.uniform(self.low, self.high)
+        return self.median * self.rng.lognormvariate(0.0, self.sigma)
+
+    def sleep(self):
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def __repr__(self):
+        return f"LatencyDistribution({self.spec!r})"
+
+
+def _seconds(text):
+    text = text.strip().lower()
+    if text.endswith("ms"):
+        return float(text[:-2]) / 1000
+    if text.endswith("s"):
+        return float(text[:-1])
+    return float(text) / 1000  # bare numbers are milliseconds
+
+
+_USER_QUERY = re.compile(r'user<\|end_header_id\|>\n(.*?)<\|eot_id\|>', re.S)
+_LANGUAGE_HINT = re.compile(r'Detected language: (\w+)\.')
+_TOKEN = re.compile(r'\s*\S{1,6}')
+
+
+class _Body:
+    def __init__(self, data):
+        self._data = data
+
+    def read(self):
+        return self._data
+
+
+class StubBedrockClient:
+    """
+    invoke_model / invoke_model_with_response_stream for Llama-style
+    {"prompt": ...} bodies. `latency` is the time to the first token,
+    `token_latency` the gap between tokens; invoke_model waits for both.
+    """
+
+    def __init__(self, latency="lognormal:800ms:0.5", token_latency="fixed:10ms",
+                 escalate_rate=0.05, error_rate=0.0, generations=None, seed=None):
+        self.rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.latency = LatencyDistribution(latency, self.rng)
+        self.token_latency = LatencyDistribution(token_latency, self.rng)
+        self.escalate_rate = escalate_rate
+        self.error_rate = error_rate
+        self._generations = itertools.cycle(generations) if generations else None
+        self.calls = 0
+
+    def invoke_model(self, body, modelId, accept=None, contentType=None):
+        tokens = self._start(body)
+        for _ in tokens[1:]:
+            self.token_latency.sleep()
+        payload = {"generation": "".join(tokens), "prompt_token_count": len(body) // 4,
+                   "generation_token_count": len(tokens)}
+        return {"body": _Body(json.dumps(payload).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, body, modelId, accept=None, contentType=None):
+        tokens = self._start(body)
+
+        def events():
+            for i, token in enumerate(tokens):
+                if i:
+                    self.token_latency.sleep()
+                chunk = {"generation": token}
+                if i == 0:
+                    chunk["prompt_token_count"] = len(body) // 4
+                yield {"chunk": {"bytes": json.dumps(chunk).encode("utf-8")}}
+
+        return {"body": events()}
+
+    def _start(self, body):
+        """Waits out the time to first token and returns the generation split into tokens."""
+        self.calls += 1
+        with self._rng_lock:
+            fail = self.rng.random() < self.error_rate
+            escalate = self.rng.random() < self.escalate_rate
+        self.latency.sleep()
+        if fail:
+            raise RuntimeError("Stub Bedrock error")
+        prompt = json.loads(body).get("prompt", "")
+        return _TOKEN.findall(self._generation(prompt, escalate)) or [""]
+
+    def _generation(self, prompt, escalate):
+        if self._generations is not None:
+            with self._rng_lock:
+                return next(self._generations)
+        if prompt.startswith("Translate"):
+            return prompt.rsplit("Text:\n", 1)[-1]
+        match = _USER_QUERY.search(prompt)
+        query = match.group(1) if match else prompt[-200:]
+        hint = _LANGUAGE_HINT.search(prompt)
+        result = degraded_result(query, hint.group(1) if hint else "English")
+        result.pop("source", None)
+        result["confidence"] = 0.9 if result["intent"] != "unrelated" else 0.4
+        result["escalate"] = escalate
+        return json.dumps(result, ensure_ascii=False)
+
+
+class _AudioStream:
+    def __init__(self, data):
+        self._buffer = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._buffer.read(size)
+
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            chunk = self._buffer.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class StubPollyClient:
+    """synthesize_speech returning silent-ish MP3-sized bytes (~1 KB per 10 characters)."""
+
+    def __init__(self, latency="lognormal:150ms:0.4", error_rate=0.0, seed=None):
+        self.rng = random.Random(seed)
+        self.latency = LatencyDistribution(latency, self.rng)
+        self.error_rate = error_rate
+        self.calls = 0
+
+    def synthesize_speech(self, Text, OutputFormat, VoiceId, Engine=None, **kwargs):
+        self.calls += 1
+        self.latency.sleep()
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise RuntimeError("Stub Polly error")
+        size = max(1024, len(Text) * 100)
+        return {"AudioStream": _AudioStream(b"\xff\xfb\x90\x00" + bytes(size - 4)), "ContentType": "audio/mpeg"}
+
+    def describe_voices(self, **kwargs):
+        return {"Voices": []}
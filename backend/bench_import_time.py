@@ -0,0 +1,94 @@
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+
+# Cold-start cost of importing the app, measured in fresh interpreters with
+# `python -X importtime`: wall time, the heaviest imports, peak RSS, and
+# whether any dependency that should load on first use was pulled in eagerly.
+# Exits 1 if the median import time exceeds --max-ms or a deferred module
+# was imported, so it can gate CI.
+# Usage:
+#   python bench_import_time.py [--module main] [--runs 5] [--max-ms 1500] [--top 15]
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Must not be imported just by importing the app
+DEFERRED = ("boto3", "botocore", "pymongo", "bson", "motor", "langdetect", "dateutil")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--module", default="main", help="module to import, relative to backend/")
+parser.add_argument("--runs", type=int, default=5)
+parser.add_argument("--max-ms", type=float, default=1500, help="fail if the median import time is above this")
+parser.add_argument("--top", type=int, default=15, help="how many of the heaviest imports to list")
+args = parser.parse_args()
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+# Prints the child's own peak RSS (KiB on Linux, bytes on macOS)
+_CHILD = """
+import importlib, resource, sys
+importlib.import_module(sys.argv[1])
+print("maxrss", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def run_once():
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD, args.module],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        sys.exit(f"Importing {args.module} failed")
+
+    imports = []  # (cumulative_us, self_us, depth, name)
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            imports.append((int(m.group(2)), int(m.group(1)), len(m.group(3)) // 2, m.group(4)))
+    rss = int(proc.stdout.split("maxrss")[-1])
+    rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    return wall_ms, imports, rss_mb
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+results = [run_once() for _ in range(args.runs)]
+walls = [wall for wall, _, _ in results]
+# Top-level entries (depth 0) add up to everything this import loaded
+import_ms = [sum(c for c, _, depth, _ in imports if depth == 0) / 1000 for _, imports, _ in results]
+rss_mb = [rss for _, _, rss in results]
+
+_, imports, _ = results[-1]
+loaded = {name for _, _, _, name in imports}
+eager = sorted(name for name in loaded if name.split(".")[0] in DEFERRED)
+
+print(f"Import of {args.module!r} over {args.runs} fresh interpreters:")
+print(f"  import time  median {median(import_ms):7.1f} ms  (min {min(import_ms):.1f}, max {max(import_ms):.1f})")
+print(f"  process wall median {median(walls):7.1f} ms  (includes interpreter startup)")
+print(f"  peak RSS     median {median(rss_mb):7.1f} MB")
+print(f"  modules      {len(loaded)}")
+
+print(f"\nHeaviest imports (cumulative, last run):")
+for cumulative, own, depth, name in sorted(imports, reverse=True)[:args.top]:
+    print(f"  {cumulative / 1000:8.1f} ms  (self {own / 1000:6.1f})  {name}")
+
+failed = False
+if eager:
+    failed = True
+    print(f"\nFAIL: imported eagerly, should load on first use: {', '.join(eager[:10])}"
+          f"{' ...' if len(eager) > 10 else ''}")
+if median(import_ms) > args.max_ms:
+    failed = True
+    print(f"\nFAIL: median import time {median(import_ms):.1f} ms exceeds {args.max_ms:.0f} ms")
+if not failed:
+    print(f"\nok: within {args.max_ms:.0f} ms and no deferred modules imported")
+sys.exit(1 if failed else 0)
@@ -0,0 +1,134 @@
+
+import os
+import re
+import sys
+import time
+import argparse
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from services.language_detector import detect
+
+# Accuracy and throughput of the language detector on a labelled corpus
+# (tab-separated "text<TAB>label"; lines starting with # are ignored).
+# Usage:
+#   python bench_language_detector.py [--corpus data/language_corpus.tsv] [--repeat 200]
+#   python bench_language_detector.py --export new_corpus.tsv [--limit 2000]
+# --export writes distinct user messages from chat history, anonymised
+# (driver names, emails and long numbers masked), with the detector's
+# guess pre-filled, ready to be corrected by hand and appended to the
+# corpus. The bundled corpus is a hand-written seed; the script says so
+# when it is used, since accuracy on it doesn't reflect real traffic.
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "language_corpus.tsv")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+parser.add_argument("--repeat", type=int, default=200, help="passes over the corpus for the throughput run")
+parser.add_argument("--export", help="write unlabelled user messages from MongoDB to this TSV and exit")
+parser.add_argument("--limit", type=int, default=2000)
+args = parser.parse_args()
+
+
+_EMAIL = re.compile(r'\S+@\S+')
+_LONG_NUMBER = re.compile(r'\d{4,}')
+
+
+def anonymize(text, names):
+    """Masks emails, numbers of 4+ digits (phones, ids) and the sender's name parts."""
+    text = _EMAIL.sub("EMAIL", text)
+    text = _LONG_NUMBER.sub(lambda m: "0" * len(m.group()), text)
+    for name in names:
+        text = re.sub(rf'(?i)\b{re.escape(name)}\b', "NAME", text)
+    return text
+
+
+def export_history(path):
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    db = client[os.getenv("MONGO_DB_NAME", "smart_battery_db")]
+    names = {}   # driver_id -> name parts of 3+ letters
+    seen = set()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# text\tlabel (anonymised; pre-filled by the detector, review before use)\n")
+        for msg in db["messages"].find({"sender": "user"}, {"text": 1, "driver_id": 1}).sort("timestamp", -1).limit(args.limit):
+            driver_id = msg.get("driver_id")
+            if driver_id not in names:
+                driver = db["drivers"].find_one({"driver_id": driver_id}, {"name": 1, "driver_name": 1}) or {}
+                full_name = str(driver.get("name") or driver.get("driver_name") or "")
+                names[driver_id] = [part for part in full_name.split() if len(part) >= 3]
+            text = anonymize(" ".join(str(msg.get("text", "")).split()), names[driver_id])
+            if text and text not in seen:
+                seen.add(text)
+                f.write(f"{text}\t{detect(text)[0]}\n")
+    print(f"Wrote {len(seen)} messages to {path}")
+
+
+def load_corpus(path):
+    """(samples, is_seed); is_seed when the file is marked as a hand-written seed corpus."""
+    samples = []
+    is_seed = False
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("# seed corpus"):
+                is_seed = True
+            if not line.strip() or line.startswith("#"):
+                continue
+            text, label = line.rstrip("\n").rsplit("\t", 1)
+            samples.append((text, label.strip()))
+    return samples, is_seed
+
+
+if args.export:
+    export_history(args.export)
+    sys.exit(0)
+
+samples, is_seed = load_corpus(args.corpus)
+correct = Counter()
+totals = Counter()
+confusion = defaultdict(Counter)
+for text, label in samples:
+    guess, confidence = detect(text)
+    totals[label] += 1
+    confusion[label][guess] += 1
+    if guess == label:
+        correct[label] += 1
+    else:
+        print(f"MISS  {label:8s} -> {guess:8s} ({confidence:.2f})  {text}")
+
+print(f"\nAccuracy: {sum(correct.values())}/{len(samples)} = {sum(correct.values()) / len(samples):.1%}")
+for label in sorted(totals):
+    print(f"  {label:8s} {correct[label]:4d}/{totals[label]:<4d}  confusions={dict(confusion[label])}")
+if is_seed:
+    print("Note: hand-written seed corpus; this is a regression check, not an accuracy estimate for real traffic")
+
+texts = [text for text, _ in samples]
+start = time.perf_counter()
+for _ in range(args.repeat):
+    for text in texts:
+        detect(text)
+elapsed = time.perf_counter() - start
+calls = args.repeat * len(texts)
+print(f"\nThroughput: {calls / elapsed:,.0f} detections/s, {elapsed / calls * 1e6:.1f} us/detection")
+
+# Same checks for langdetect, if it is still installed, for comparison
+try:
+    from langdetect import detect as langdetect_detect, DetectorFactory
+    DetectorFactory.seed = 0
+    codes = {"en": "English", "hi": "Hindi", "mr": "Marathi"}
+    start = time.perf_counter()
+    hits = 0
+    for text, label in samples:
+        try:
+            guess = codes.get(langdetect_detect(text), "English")
+        except Exception:
+            guess = "English"
+        hits += guess == ("Hindi" if label == "Hinglish" else label)
+    elapsed = time.perf_counter() - start
+    print(f"langdetect: {hits}/{len(samples)} = {hits / len(samples):.1%} (Hinglish counted as Hindi), "
+          f"{elapsed / len(samples) * 1e6:.1f} us/detection including profile load")
+except ImportError:
+    pass
@@ -0,0 +1,97 @@
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from services.mongo_service import lookup_keys_for, normalize_phone_key
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("MONGO_DB_NAME", "smart_battery_db")
+
+# Compares the old unanchored-regex $or phone lookup with the phone_key point
+# lookup on a seeded drivers collection in a separate "<db>_bench" database.
+# Usage: python bench_phone_lookup.py [--drivers 1000000] [--lookups 200] [--keep]
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--drivers", type=int, default=1_000_000)
+parser.add_argument("--lookups", type=int, default=200)
+parser.add_argument("--legacy-lookups", type=int, default=20, help="the regex scan is slow; sample fewer")
+parser.add_argument("--keep", action="store_true", help="reuse/keep the seeded collection")
+args = parser.parse_args()
+
+client = MongoClient(MONGO_URI)
+drivers = client[f"{DB_NAME}_bench"]["drivers"]
+
+# Formats the legacy regex can still match (it never handled "98765-43210")
+FORMATS = [
+    lambda n: n,
+    lambda n: f"+91{n}",
+    lambda n: f"+91 {n}",
+    lambda n: f"0{n}",
+]
+FIELDS = ("phone", "phone_number", "mobile", "mobile_no", "driverMobileNumber")
+
+
+def seed():
+    drivers.drop()
+    print(f"Seeding {args.drivers} drivers...")
+    start = time.time()
+    batch = []
+    for i in range(args.drivers):
+        number = str(7000000000 + i)
+        doc = {
+            "driverId": f"DRV{i:07d}",
+            random.choice(FIELDS): random.choice(FORMATS)(number),
+            "name": f"Driver {i}",
+        }
+        doc.update(lookup_keys_for(doc))
+        batch.append(doc)
+        if len(batch) == 10_000:
+            drivers.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        drivers.insert_many(batch, ordered=False)
+    drivers.create_index([("phone_key", 1)], unique=True, sparse=True, name="phone_key_unique")
+    print(f"Seeded in {time.time() - start:.1f}s")
+
+
+def legacy_query(phone):
+    last10 = normalize_phone_key(phone)
+    return {"$or": [{f: phone} for f in FIELDS] + [{f: {"$regex": last10}} for f in FIELDS]}
+
+
+def indexed_query(phone):
+    return {"phone_key": normalize_phone_key(phone)}
+
+
+def measure(name, build_query, samples):
+    timings = []
+    for phone in samples:
+        start = time.perf_counter()
+        found = drivers.find_one(build_query(phone), {"_id": 1})
+        timings.append((time.perf_counter() - start) * 1000)
+        assert found is not None, f"{name}: {phone} not found"
+    stats = drivers.find(build_query(samples[0])).explain().get("executionStats", {})
+    timings.sort()
+    print(f"{name:8s} n={len(timings):4d}  p50={statistics.median(timings):9.2f}ms  "
+          f"p95={timings[int(len(timings) * 0.95) - 1]:9.2f}ms  "
+          f"docsExamined={stats.get('totalDocsExamined')}  keysExamined={stats.get('totalKeysExamined')}")
+
+
+if not args.keep or drivers.estimated_document_count() != args.drivers:
+    seed()
+
+phones = [f"+91 {7000000000 + random.randrange(args.drivers)}" for _ in range(args.lookups)]
+measure("before", legacy_query, phones[:args.legacy_lookups])
+measure("after", indexed_query, phones)
+
+if not args.keep:
+    drivers.drop()
@@ -0,0 +1,104 @@
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from services.response_parser import StreamingJSONParser, extract_json_object
+from services.localization import localize_dates_in_text
+
+# Microbenchmark: JSON extraction and date localization of model output,
+# old implementation vs the current one.
+# Usage: python bench_response_parser.py [--iterations 20000]
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--iterations", type=int, default=20000)
+args = parser.parse_args()
+
+GENERATION = "Here is the JSON:\n```json\n" + json.dumps({
+    "intent": "subscription",
+    "confidence": 0.93,
+    "response": "Your subscription (Gold) expires on 2026-02-01. Your last swap was on 15/01/2026 at Station A {Kothrud}.",
+    "language": "English",
+    "escalate": False,
+}, indent=2) + "\n```"
+# Worst case for the brace counter: many unbalanced braces before the answer
+ADVERSARIAL = "{" * 2000 + GENERATION
+
+
+def legacy_extract(completion):
+    """The brace counter + rfind fallback that used to live in bedrock_service."""
+    cleaned = completion.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    start_idx = cleaned.find('{')
+    if start_idx != -1:
+        brace_count = 0
+        for i in range(start_idx, len(cleaned)):
+            if cleaned[i] == '{':
+                brace_count += 1
+            elif cleaned[i] == '}':
+                brace_count -= 1
+            if brace_count == 0:
+                try:
+                    return json.loads(cleaned[start_idx:i + 1])
+                except json.JSONDecodeError:
+                    break
+
+    start_idx = cleaned.find('{')
+    end_idx = cleaned.rfind('}')
+    if start_idx != -1 and end_idx != -1:
+        try:
+            return json.loads(cleaned[start_idx:end_idx + 1])
+        except json.JSONDecodeError:
+            pass
+    return None
+
+
+def legacy_localize(text):
+    """Two regex passes with dateutil on every match (needs python-dateutil)."""
+    from dateutil import parser as date_parser
+
+    def repl_iso(m):
+        return date_parser.parse(m.group(0)).strftime('%d %b %Y')
+
+    def repl_dmy(m):
+        return date_parser.parse(m.group(0), dayfirst=True).strftime('%d %b %Y')
+
+    text = re.sub(r'\b\d{4}-\d{2}-\d{2}\b', repl_iso, text)
+    return re.sub(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{4}\b', repl_dmy, text)
+
+
+def streaming_parse(text):
+    stream = StreamingJSONParser()
+    for i in range(0, len(text), 8):
+        stream.feed(text[i:i + 8])
+    return stream.fields
+
+
+def bench(name, func, payload, iterations):
+    try:
+        func(payload)
+    except ImportError as e:
+        print(f"{name:34s} skipped ({e})")
+        return
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(payload)
+    elapsed = time.perf_counter() - start
+    print(f"{name:34s} {elapsed / iterations * 1e6:9.1f} us/op")
+
+
+n = args.iterations
+response = json.loads(GENERATION[GENERATION.index("{"):GENERATION.rindex("}") + 1])["response"]
+bench("extract: brace counter (old)", legacy_extract, GENERATION, n)
+bench("extract: raw_decode (new)", extract_json_object, GENERATION, n)
+bench("extract: streaming, 8-char chunks", streaming_parse, GENERATION, n // 10)
+bench("adversarial: brace counter (old)", legacy_extract, ADVERSARIAL, max(1, n // 100))
+bench("adversarial: raw_decode (new)", extract_json_object, ADVERSARIAL, max(1, n // 100))
+bench("dates: dateutil (old)", legacy_localize, response, n)
+bench("dates: fixed-format (new)", lambda t: localize_dates_in_text(t, "English"), response, n)
+bench("dates: no digits, fast path (new)", lambda t: localize_dates_in_text(t, "English"), "Please visit the nearest station.", n)
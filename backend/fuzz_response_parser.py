@@ -0,0 +1,119 @@
+
+import os
+import sys
+import json
+import random
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from services.response_parser import StreamingJSONParser, extract_json_object
+from services.localization import localize_dates_in_text, parse_date, format_date_for_lang
+
+# Randomized checks for the model-output parsers and date localization.
+# Usage: python fuzz_response_parser.py [--cases 5000] [--seed 1]
+# Exits 1 on the first failure and prints the input that caused it.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--cases", type=int, default=5000)
+parser.add_argument("--seed", type=int, default=None)
+args = parser.parse_args()
+
+seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+rng = random.Random(seed)
+print(f"seed={seed}")
+
+ALPHABET = 'abc xyz{}[]":,\\/\n\tआहेमलाहै0123456789' + "é\U0001F50B"
+PREAMBLES = ["", "Here is the JSON:\n", "```json\n", "```\n", "Sure! {not json} ", "{\"broken\": ", "Answer:"]
+SUFFIXES = ["", "\n```", " Let me know if you need anything else.", "}", "\n{\"second\": 1}"]
+INTENTS = ["leave", "subscription", "nearest station", "battery swap", "invoice", "emergency", "unrelated"]
+
+
+def random_text(max_len=40):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randrange(max_len)))
+
+
+def random_result():
+    result = {
+        "intent": rng.choice(INTENTS),
+        "confidence": round(rng.random(), 2),
+        "response": random_text(),
+        "language": rng.choice(["English", "Hindi", "Marathi"]),
+        "escalate": rng.random() < 0.5,
+    }
+    if rng.random() < 0.3:
+        result["details"] = {"items": [random_text(5), rng.randrange(100)], "note": random_text(10)}
+    return result
+
+
+def chunked(text):
+    i = 0
+    while i < len(text):
+        n = rng.randrange(1, 12)
+        yield text[i:i + n]
+        i += n
+
+
+def fail(kind, payload, detail):
+    print(f"FAIL [{kind}] {detail}\ninput={payload!r}")
+    sys.exit(1)
+
+
+def check_generation():
+    expected = random_result()
+    body = json.dumps(expected, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2]))
+    text = rng.choice(PREAMBLES) + body + rng.choice(SUFFIXES)
+    # A preamble like '{"broken": ' swallows the real object; only check the common path
+    if "broken" in text or "{not json}" in text:
+        extract_json_object(text)
+        return
+    got = extract_json_object(text)
+    if got != expected:
+        fail("extract", text, f"got {got!r}")
+
+    stream = StreamingJSONParser()
+    streamed = []
+    done = None
+    for chunk in chunked(text):
+        for kind, key, value in stream.feed(chunk):
+            if kind == "delta":
+                streamed.append(value)
+            elif kind == "done":
+                done = value
+    if done != expected:
+        fail("stream", text, f"got {done!r}")
+    if "".join(streamed) != expected["response"]:
+        fail("stream-delta", text, f"got {''.join(streamed)!r}")
+
+
+def check_garbage():
+    text = random_text(200)
+    got = extract_json_object(text)
+    if got is not None and not isinstance(got, dict):
+        fail("garbage", text, f"got {got!r}")
+    stream = StreamingJSONParser()
+    for chunk in chunked(text):
+        stream.feed(chunk)
+
+
+def check_dates():
+    day = date(2000, 1, 1) + timedelta(days=rng.randrange(20000))
+    iso = day.isoformat()
+    dmy = f"{day.day}/{day.month}/{day.year}"
+    if parse_date(iso) != day or parse_date(dmy) != day:
+        fail("parse_date", (iso, dmy), "round trip failed")
+    lang = rng.choice(["English", "Hindi", "Marathi"])
+    text = f"{random_text(10)} {iso} {random_text(10)} {dmy}"
+    localized = localize_dates_in_text(text, lang)
+    if localized.count(format_date_for_lang(day, lang)) < 2:
+        fail("localize", text, f"got {localized!r}")
+    bad = f"{day.year}-{rng.randrange(13, 99)}-{day.day:02d}"
+    if localize_dates_in_text(bad, lang) != bad:
+        fail("localize-invalid", bad, "invalid date was rewritten")
+
+
+for _ in range(args.cases):
+    check_generation()
+    check_garbage()
+    check_dates()
+print(f"OK: {args.cases} cases each for generations, garbage and dates")
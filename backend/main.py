@@ -1,18 +1,67 @@
-
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
+import asyncio
+import hashlib
+import json
 import logging
+import re
+import time
+
+# Before the service modules, which read their settings at import
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+
+from services.container import services
 from services.mongo_service import (
-    verify_driver, get_driver_details, get_driver_by_phone, verify_phone, 
-    create_escalation, get_escalations,
-    save_message, get_chat_history, update_escalation_status, check_active_escalation
+    connect, ensure_indexes, watch_driver_changes, driver_cache_stats,
+    run_message_sink, close_message_sink, message_sink_stats,
+    event_hub, run_event_relay, event_hub_stats, refresh_active_escalations, active_escalations_stats,
+    verify_driver, get_driver_details, get_driver_by_phone, verify_phone,
+    create_escalation, get_escalations, count_escalations,
+    save_message, get_chat_history, get_chat_history_head, update_escalation_status, check_active_escalation
+)
+from services.bedrock_service import (
+    detect_intent_async, open_intent_stream, parse_completion, fallback_result,
+    localize_dates_in_text, record_result, preclassifier_stats, response_cache_stats,
+    translation_stats, prompt_stats, bedrock_stats
+)
+from services.polly_service import (
+    register_audio, cache_key, get_cached_audio, synthesize_registered, stream_audio, audio_cache_stats
+)
+from services.response_parser import StreamingJSONParser
+from services.tts_pipeline import SpeechPipeline, RESET
+from services.async_utils import run_blocking, iterate_blocking, blocking_io_stats
+from services.event_hub import driver_topic, AGENTS_TOPIC
+from services.metrics import (
+    start_trace, current_trace, observe_stage, span, request_seconds, latency_stats, TRACE_HEADERS,
+    render as render_metrics
 )
-from services.bedrock_service import detect_intent
-from services.polly_service import generate_audio_base64
 
 # 1. App Initialization
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients are created here, in each worker, and warmed up in the
+    # background; /ready turns 200 once Mongo answers
+    connect()
+    warmup = asyncio.create_task(services.prewarm(on_mongo_ready=ensure_indexes))
+    driver_watcher = asyncio.create_task(watch_driver_changes())
+    sink_flusher = asyncio.create_task(run_message_sink())
+    event_relay = asyncio.create_task(run_event_relay())
+    escalation_refresher = asyncio.create_task(refresh_active_escalations())
+    yield
+    warmup.cancel()
+    driver_watcher.cancel()
+    event_relay.cancel()
+    escalation_refresher.cancel()
+    sink_flusher.cancel()
+    await asyncio.gather(sink_flusher, *_detached, return_exceptions=True)
+    await close_message_sink()
+
+app = FastAPI(lifespan=lifespan)
 
 # 2. CORS Middleware
 app.add_middleware(
@@ -24,9 +73,30 @@ app.add_middleware(
 )
 
 # 3. Logging Setup
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Starts the request's trace (continuing an incoming W3C traceparent),
+    times it to response headers, and reports its stages in Server-Timing.
+    Streaming endpoints mark their trace deferred and finish it themselves.
+    """
+    trace = start_trace(request.headers.get("traceparent"))
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    request_seconds.observe(time.perf_counter() - start, getattr(route, "path", "unmatched"),
+                            request.method, str(response.status_code))
+    if not trace.deferred:
+        trace.finish()
+    if TRACE_HEADERS:
+        response.headers["traceparent"] = trace.traceparent()
+        timing = trace.server_timing()
+        if timing:
+            response.headers["Server-Timing"] = timing
+    return response
+
 # 4. Pydantic Models
 class DriverRequest(BaseModel):
     driver_id: str | int
@@ -51,10 +121,40 @@ class AgentMessageRequest(BaseModel):
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+def readiness_check():
+    """200 once this worker can reach Mongo; 503 (with per-client status) until then."""
+    ready, details = services.readiness()
+    return JSONResponse({"ready": ready, **details}, status_code=200 if ready else 503)
+
+def _collect_stats():
+    return {
+        "audio_cache": audio_cache_stats(),
+        "driver_cache": driver_cache_stats(),
+        "message_sink": message_sink_stats(),
+        "events": event_hub_stats(),
+        "active_escalations": active_escalations_stats(),
+        "preclassifier": preclassifier_stats(),
+        "response_cache": response_cache_stats(),
+        "translation": translation_stats(),
+        "prompt": prompt_stats(),
+        "bedrock": bedrock_stats(),
+        "blocking_io": blocking_io_stats(),
+    }
+
+@app.get("/stats")
+def stats_endpoint():
+    return {**_collect_stats(), "latency": latency_stats()}
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text format: stage/route latency histograms plus the /stats counters as gauges."""
+    return PlainTextResponse(render_metrics(_collect_stats()), media_type="text/plain; version=0.0.4")
+
 @app.post("/validate-driver")
-def validate_driver_endpoint(request: DriverRequest):
-    is_valid = verify_driver(request.driver_id)
-    
+async def validate_driver_endpoint(request: DriverRequest):
+    is_valid = await verify_driver(request.driver_id)
+
     if is_valid:
         return {"valid": True, "message": "Driver ID verified safely."}
     else:
@@ -62,29 +162,43 @@ def validate_driver_endpoint(request: DriverRequest):
 
 
 @app.post("/validate-phone")
-def validate_phone_endpoint(request: PhoneRequest):
+async def validate_phone_endpoint(request: PhoneRequest):
     # Lookup driver by phone; return the linked driver id if present
-    driver = get_driver_by_phone(request.phone)
+    driver = await get_driver_by_phone(request.phone)
     if driver:
         driver_id = driver.get('driver_id') or driver.get('driverId') or None
         return {"valid": True, "driver_id": driver_id, "message": "Phone number linked to driver."}
     else:
         raise HTTPException(status_code=404, detail={"valid": False, "message": "Phone number not found."})
 
+ESCALATIONS_MAX_LIMIT = 100
+
 @app.get("/agent/escalations")
-def get_escalations_endpoint(status: str = "OPEN"):
-    return get_escalations(status)
+async def get_escalations_endpoint(status: str = "OPEN", limit: int = 20, before: str | None = None):
+    """One page of tickets, newest first; before=<next_cursor> fetches the next page."""
+    limit = max(1, min(limit, ESCALATIONS_MAX_LIMIT))
+    try:
+        return await get_escalations(status, limit=limit, before=before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid escalations cursor")
+
+@app.get("/agent/escalations/count")
+async def count_escalations_endpoint(status: str = "OPEN"):
+    count = await count_escalations(status)
+    if count is None:
+        raise HTTPException(status_code=500, detail="Failed to count escalations")
+    return {"status": status, "count": count}
 
 @app.post("/agent/accept")
-def agent_accept_endpoint(request: AgentAcceptRequest):
-    success = update_escalation_status(request.ticket_id, "IN_PROGRESS")
+async def agent_accept_endpoint(request: AgentAcceptRequest):
+    success = await update_escalation_status(request.ticket_id, "IN_PROGRESS")
     if success:
         return {"status": "success", "message": "Escalation accepted"}
     raise HTTPException(status_code=500, detail="Failed to accept escalation")
 
 @app.post("/agent/message")
-def agent_message_endpoint(request: AgentMessageRequest):
-    msg_id = save_message(request.driver_id, "agent", request.message)
+async def agent_message_endpoint(request: AgentMessageRequest):
+    msg_id = await save_message(request.driver_id, "agent", request.message)
     if msg_id:
         return {"status": "success", "message_id": msg_id}
     raise HTTPException(status_code=500, detail="Failed to send message")
@@ -93,82 +207,415 @@ class AgentResolveRequest(BaseModel):
     driver_id: str
 
 @app.post("/agent/resolve")
-def agent_resolve_endpoint(request: AgentResolveRequest):
+async def agent_resolve_endpoint(request: AgentResolveRequest):
     driver_id = request.driver_id
-    ticket_id = check_active_escalation(driver_id)
-    
+    ticket_id = await check_active_escalation(driver_id)
+
     if not ticket_id:
          raise HTTPException(status_code=404, detail="No active escalation found for this driver.")
-         
-    success = update_escalation_status(ticket_id, "RESOLVED")
+
+    success = await update_escalation_status(ticket_id, "RESOLVED")
     if success:
-        save_message(driver_id, "system", "Chat ended by agent.")
+        await save_message(driver_id, "system", "Chat ended by agent.")
         return {"status": "success", "message": "Escalation resolved"}
-    
+
     raise HTTPException(status_code=500, detail="Failed to resolve escalation")
 
+HISTORY_MAX_LIMIT = 200
+
 @app.get("/chat/history/{driver_id}")
-def get_history_endpoint(driver_id: str):
-    return get_chat_history(driver_id)
+async def get_history_endpoint(driver_id: str, request: Request, limit: int = 50,
+                               before: str | None = None, after: str | None = None, since: str | None = None):
+    """
+    Newest `limit` messages by default; before=<cursor> pages back, and
+    after=<cursor> (or since=<cursor or ISO time>) returns only newer ones.
+    An unchanged conversation costs one covered index lookup and a 304.
+    """
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+    after = after or since
+    head = await get_chat_history_head(driver_id)
+    headers = {"Cache-Control": "no-cache"}
+    if head is not None:
+        digest = hashlib.sha1(f"{driver_id}|{head}|{limit}|{before}|{after}".encode("utf-8")).hexdigest()
+        headers["ETag"] = f'"{digest}"'
+        if_none_match = request.headers.get("if-none-match", "")
+        if headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+    try:
+        messages = await get_chat_history(driver_id, limit=limit, before=before, after=after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+    return JSONResponse(messages, headers=headers)
+
+EVENTS_HEARTBEAT_SECONDS = 15
+
+def _sse_frame(event: dict) -> str:
+    # Only messages carry an id, so Last-Event-ID is always a history cursor
+    event_id = f"id: {event['id']}\n" if event["type"] == "message" else ""
+    return f"{event_id}event: {event['type']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+async def _event_stream(request: Request, topic: str, replay=None):
+    """
+    Server-Sent Events for one hub topic, with a comment line every
+    EVENTS_HEARTBEAT_SECONDS to keep proxies from closing the connection.
+    Subscribes before replaying, so nothing published in between is lost.
+    """
+    sub = event_hub.subscribe(topic)
+    try:
+        sent = set()
+        for event in replay or []:
+            sent.add(event["id"])
+            yield _sse_frame(event)
+        while not sub.overflowed:
+            event = await sub.get(timeout=EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+            elif event["id"] not in sent:
+                yield _sse_frame(event)
+    finally:
+        sub.close()
+
+_EVENT_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.get("/events/driver/{driver_id}")
+async def driver_events_endpoint(driver_id: str, request: Request):
+    """
+    Live chat for one driver: `message` (same shape as /chat/history items)
+    and `escalation` ({id, driver_id, status}). On reconnect the browser
+    sends Last-Event-ID and the messages missed since then are replayed.
+    """
+    replay = []
+    last_id = request.headers.get("last-event-id")
+    if last_id:
+        try:
+            missed = await get_chat_history(driver_id, limit=HISTORY_MAX_LIMIT, after=last_id)
+        except ValueError:
+            missed = []
+        replay = [{"id": m["cursor"], "type": "message", "data": m} for m in missed]
+    return StreamingResponse(_event_stream(request, driver_topic(driver_id), replay),
+                             media_type="text/event-stream", headers=_EVENT_HEADERS)
+
+@app.get("/events/agents")
+async def agent_events_endpoint(request: Request):
+    """Escalation created / accepted / resolved, for the agent dashboard."""
+    return StreamingResponse(_event_stream(request, AGENTS_TOPIC),
+                             media_type="text/event-stream", headers=_EVENT_HEADERS)
+
+async def _no_context():
+    return None
+
+LIVE_CHAT_RESULT = {
+    "intent": "live_chat",
+    "confidence": 1.0,
+    "response": "Message sent to agent.",
+    "escalate": True,
+    "live_mode": True
+}
+
+async def _start_turn(request: ChatRequest, driver_id: str):
+    """
+    Saves the user message, checks for a live agent session and loads the
+    driver context concurrently - none of them depend on each other.
+    Returns (active_ticket, context).
+    """
+    start_time = time.perf_counter()
+    _, active_ticket, context = await asyncio.gather(
+        save_message(driver_id, "user", request.message),
+        check_active_escalation(driver_id),
+        get_driver_details(request.driver_id) if request.driver_id else _no_context(),
+    )
+    logger.info(f"Mongo lookups took {time.perf_counter() - start_time:.2f}s")
+
+    if request.driver_id and not active_ticket:
+        if context:
+            logger.info(f"Found context for driver {request.driver_id}")
+        else:
+            logger.warning(f"No details found for driver {request.driver_id}")
+    return active_ticket, context
+
+# Writes that must outlive the request: a stream's tasks are cancelled when
+# the client disconnects, but the turn is still saved and escalated
+_detached = set()
+
+def _detach(coro):
+    task = asyncio.create_task(coro)
+    _detached.add(task)
+    task.add_done_callback(_detached.discard)
+    return task
+
+def _escalation_for(driver_id: str, result: dict):
+    return create_escalation(
+        driver_id=driver_id,
+        intent=result.get("intent", "unknown"),
+        confidence=float(result.get("confidence", 0.0)),
+        summary=result.get("response")
+    )
 
 @app.post("/chat")
-def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks):
     driver_id = str(request.driver_id) if request.driver_id else "unknown"
-    
-    # 1. Save User Message
-    save_message(driver_id, "user", request.message)
+    # Taken before the Mongo calls, so the total includes them
+    start_time = time.perf_counter()
+    trace = current_trace()
+
+    # 1. Save user message, live-session check and driver context
+    active_ticket, context = await _start_turn(request, driver_id)
 
-    # 2. Check for Active Live Agent Session
-    active_ticket = check_active_escalation(driver_id)
+    # 2. Active Live Agent Session
     if active_ticket:
         logger.info(f"Active escalation for {driver_id}, skipping AI response.")
-        return {
-            "intent": "live_chat", 
-            "confidence": 1.0, 
-            "response": "Message sent to agent.", 
-            "escalate": True,
-            "live_mode": True
-        }
+        if trace:
+            trace.finish(LIVE_CHAT_RESULT["intent"])
+        return dict(LIVE_CHAT_RESULT)
 
     # 3. Standard AI Logic
-    context = None
-    if request.driver_id:
-        context = get_driver_details(request.driver_id)
-        if context:
-            logger.info(f"Found context for driver {request.driver_id}")
-        else:
-            logger.warning(f"No details found for driver {request.driver_id}")
-            
-    import time
-    start_time = time.time()
-    result = detect_intent(request.message, context=context)
-    logger.info(f"Intent detection took {time.time() - start_time:.2f}s")
-    
-    # Handle Escalation
+    intent_start = time.perf_counter()
+    result = await detect_intent_async(request.message, context=context)
+    logger.info(f"Intent detection took {time.perf_counter() - intent_start:.2f}s")
+
     if result.get("escalate"):
-        create_escalation(
-            driver_id=driver_id,
-            intent=result.get("intent", "unknown"),
-            confidence=float(result.get("confidence", 0.0)),
-            summary=result.get("response")
-        )
-
-    # Generate Audio and Save Bot Response
+        await _escalation_for(driver_id, result)
+
     if result.get("response"):
+        # Bot response is persisted after the reply has been sent
+        background_tasks.add_task(save_message, driver_id, "bot", result["response"])
+
+        # Audio is fetched separately from /audio/{id}, so the text isn't held
+        # back by Polly and the client can start playback progressively
+        audio_id = register_audio(result["response"], language=result.get("language", "English"))
+        result["audio_id"] = audio_id
+        result["audio_url"] = f"/audio/{audio_id}"
+
+    with span("serialize"):
+        response = JSONResponse(result)
+    if trace:
+        trace.finish(result.get("intent"), result.get("language"))
+    logger.info(f"Total request processed in {time.perf_counter() - start_time:.2f}s"
+                + (f" (trace {trace.trace_id})" if trace else ""))
+    return response
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _same_text(a: str, b: str) -> bool:
+    return " ".join((a or "").split()) == " ".join((b or "").split())
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Streaming variant of /chat as Server-Sent Events:
+      meta        - intent / escalate / language / confidence as soon as each is generated
+      token       - the next piece of the response text
+      done        - the final result (same shape as /chat, minus audio)
+      audio       - audio id/url for the next sentence, in order (seq)
+      audio_reset - discard queued audio; the final text differs from what was streamed
+    Sentences go to Polly while the model is still generating, so playback of
+    the first sentence can start before the generation has finished.
+    """
+    driver_id = str(request.driver_id) if request.driver_id else "unknown"
+    start_time = time.perf_counter()
+    trace = current_trace()
+    if trace:
+        # The stages run while the body streams, after the middleware has returned
+        trace.deferred = True
+    active_ticket, context = await _start_turn(request, driver_id)
+    outcome = {}
+
+    async def events():
         try:
-            # Save bot response to DB
-            save_message(driver_id, "bot", result["response"])
-
-            tts_start = time.time()
-            detected_lang = result.get("language", "English")
-            audio_data = generate_audio_base64(result["response"], language=detected_lang)
-            result["audio"] = audio_data # Add base64 audio to response
-            logger.info(f"TTS generation took {time.time() - tts_start:.2f}s")
-        except Exception as e:
-            logger.error(f"TTS failed: {e}")
-            
-    logger.info(f"Total request processed in {time.time() - start_time:.2f}s")
-    return result
+            async for item in _events():
+                yield item
+        finally:
+            if trace:
+                trace.finish(outcome.get("intent"), outcome.get("language"))
+
+    async def _events():
+        if active_ticket:
+            logger.info(f"Active escalation for {driver_id}, skipping AI response.")
+            outcome["intent"] = LIVE_CHAT_RESULT["intent"]
+            yield _sse("done", LIVE_CHAT_RESULT)
+            return
+
+        out = asyncio.Queue()
+        finished = object()
+        pipeline = SpeechPipeline("English", prepare=lambda text: localize_dates_in_text(text, pipeline.language))
+
+        async def generate():
+            completion = []
+            first_token = None
+            parser = StreamingJSONParser()
+            escalation = None
+            try:
+                try:
+                    stream_start = time.perf_counter()
+                    detected_lang, chunks = await run_blocking(open_intent_stream, request.message, context)
+                    pipeline.language = detected_lang
+                    async for chunk in iterate_blocking(chunks):
+                        completion.append(chunk)
+                        for kind, key, value in parser.feed(chunk):
+                            if kind == "delta":
+                                if first_token is None:
+                                    first_token = time.perf_counter()
+                                    observe_stage("first_token", first_token - start_time)
+                                    logger.info(f"Time to first token {first_token - start_time:.2f}s")
+                                out.put_nowait(_sse("token", {"text": value}))
+                                pipeline.feed(value)
+                            elif kind == "field" and key in ("intent", "escalate", "language", "confidence"):
+                                out.put_nowait(_sse("meta", {key: value}))
+                                if key == "escalate" and value is True and escalation is None:
+                                    # Open the ticket now rather than after the rest of the stream;
+                                    # intent, confidence and response come before escalate
+                                    escalation = _detach(_escalation_for(driver_id, parser.fields))
+                    observe_stage("bedrock.stream", time.perf_counter() - stream_start)
+                    result = await run_blocking(parse_completion, "".join(completion), detected_lang)
+                    record_result(request.message, detected_lang, result, context)
+                except Exception as e:
+                    result = fallback_result(request.message, pipeline.language, context, e)
+
+                outcome.update(intent=result.get("intent"), language=result.get("language") or pipeline.language)
+                out.put_nowait(_sse("done", result))
+
+                # Only re-synthesize if post-processing (e.g. Marathi translation) changed the text
+                streamed = localize_dates_in_text(parser.fields.get("response") or "", pipeline.language)
+                if _same_text(streamed, result.get("response", "")):
+                    pipeline.finish()
+                else:
+                    pipeline.language = result.get("language") or pipeline.language
+                    pipeline.reset(result.get("response") or "")
+
+                # Persisting happens after the driver already has the text
+                if result.get("response"):
+                    _detach(save_message(driver_id, "bot", result["response"]))
+                if result.get("escalate") and escalation is None:
+                    _detach(_escalation_for(driver_id, result))
+            finally:
+                out.put_nowait(finished)
+
+        async def speak():
+            try:
+                async for item in pipeline.chunks():
+                    if item is RESET:
+                        out.put_nowait(_sse("audio_reset", {}))
+                        continue
+                    seq, sentence, audio_id = item
+                    if seq == 0:
+                        observe_stage("first_audio", time.perf_counter() - start_time)
+                        logger.info(f"Time to first audio {time.perf_counter() - start_time:.2f}s")
+                    out.put_nowait(_sse("audio", {
+                        "seq": seq,
+                        "text": sentence,
+                        "audio_id": audio_id,
+                        "audio_url": f"/audio/{audio_id}"
+                    }))
+            finally:
+                out.put_nowait(finished)
+
+        tasks = [asyncio.create_task(generate()), asyncio.create_task(speak())]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                item = await out.get()
+                if item is finished:
+                    remaining -= 1
+                    continue
+                yield item
+            logger.info(f"Streamed request processed in {time.perf_counter() - start_time:.2f}s"
+                        + (f" (trace {trace.trace_id})" if trace else ""))
+        finally:
+            # Client went away: stop generating and synthesizing
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+_AUDIO_ID = re.compile(r'^[0-9a-f]{64}(\.[A-Za-z0-9_-]+\.[0-9a-f]{32})?$')
+_BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+AUDIO_CHUNK_SIZE = 64 * 1024
+
+def _parse_range(header: str, size: int):
+    """
+    Parses a single-range 'bytes=' header into (start, end_exclusive).
+    Returns None if the range can't be satisfied.
+    """
+    match = _BYTE_RANGE.match(header.strip())
+    if not match or size == 0:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    elif last:
+        start = max(size - int(last), 0)
+        end = size
+    else:
+        return None
+    if start >= end:
+        return None
+    return start, end
+
+def _is_whole_range(header: str) -> bool:
+    """'bytes=0-' (what <audio> sends first) asks for the whole file."""
+    match = _BYTE_RANGE.match(header.strip())
+    return match is not None and match.groups() == ("0", "")
+
+async def _iter_buffer(data, start: int, end: int):
+    # Slicing an mmap only copies the slice, so large files are never loaded whole
+    for offset in range(start, end, AUDIO_CHUNK_SIZE):
+        yield data[offset:min(offset + AUDIO_CHUNK_SIZE, end)]
+
+@app.get("/audio/{audio_id}")
+async def audio_endpoint(audio_id: str, request: Request):
+    """
+    Serves synthesized speech as binary MP3. Ids start with a content hash, so
+    responses are immutable: strong ETag, long-lived caching, Range support.
+    Audio not cached yet is streamed straight from Polly as it is produced.
+    """
+    if not _AUDIO_ID.match(audio_id):
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    etag = f'"{cache_key(audio_id)}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    data = await run_blocking(get_cached_audio, audio_id)
+    if data is None and range_header:
+        if _is_whole_range(range_header):
+            # Answered like no Range at all: a streamed 200 without Content-Length
+            range_header = None
+        else:
+            # Ranges need the total length, so synthesize fully first
+            data = await run_blocking(synthesize_registered, audio_id)
+
+    if data is None:
+        chunks = stream_audio(audio_id)
+        if chunks is None:
+            raise HTTPException(status_code=404, detail="Audio not found")
+        return StreamingResponse(iterate_blocking(chunks), media_type="audio/mpeg", headers=headers)
+
+    size = len(data)
+    if range_header:
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+        headers["Content-Length"] = str(end - start)
+        return StreamingResponse(_iter_buffer(data, start, end), status_code=206, media_type="audio/mpeg", headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_iter_buffer(data, 0, size), media_type="audio/mpeg", headers=headers)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,63 @@
+
+import os
+import sys
+from collections import defaultdict
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from services.mongo_service import lookup_keys_for, PHONE_FIELDS
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("MONGO_DB_NAME", "smart_battery_db")
+BATCH_SIZE = 1000
+
+# Backfills the normalized lookup fields (driver_key, phone_key, phone_e164)
+# on every driver so lookups become single exact-match queries. Safe to re-run.
+# Usage: python migrate_driver_keys.py [--dry-run]
+
+dry_run = "--dry-run" in sys.argv
+
+try:
+    client = MongoClient(MONGO_URI)
+    drivers = client[DB_NAME]['drivers']
+
+    UNIQUE_KEYS = ("driver_key", "phone_key")
+    owners = {field: defaultdict(list) for field in UNIQUE_KEYS}
+    projection = {f: 1 for f in ("driver_id", "driverId", "phone_e164", *UNIQUE_KEYS, *PHONE_FIELDS)}
+    scanned = 0
+    ops = []
+    updated = 0
+    for d in drivers.find({}, projection):
+        scanned += 1
+        keys = lookup_keys_for(d)
+        for field in UNIQUE_KEYS:
+            if keys.get(field):
+                owners[field][keys[field]].append(d["_id"])
+        changed = {k: v for k, v in keys.items() if d.get(k) != v}
+        if changed:
+            ops.append(UpdateOne({"_id": d["_id"]}, {"$set": changed}))
+        if len(ops) >= BATCH_SIZE:
+            if not dry_run:
+                updated += drivers.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops and not dry_run:
+        updated += drivers.bulk_write(ops, ordered=False).modified_count
+
+    print(f"Drivers scanned: {scanned}")
+    print(f"Drivers updated: {updated}{' (dry run)' if dry_run else ''}")
+    for field in UNIQUE_KEYS:
+        duplicates = {k: v for k, v in owners[field].items() if len(v) > 1}
+        if duplicates:
+            # The unique index can't be built until these are merged
+            print(f"Duplicate {field} values ({len(duplicates)}):")
+            for k, ids in duplicates.items():
+                print(f"  {k}: {ids}")
+        elif not dry_run:
+            drivers.create_index([(field, 1)], unique=True, sparse=True, name=f"{field}_unique")
+            print(f"Unique index on {field} ensured.")
+
+except Exception as e:
+    print(f"Error: {e}")
@@ -1,6 +1,10 @@
 
 import os
 import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
 from services.bedrock_service import detect_intent
 
 # Fake context
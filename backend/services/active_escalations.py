@@ -0,0 +1,106 @@
+import os
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_ESCALATIONS_INDEX = os.getenv("ACTIVE_ESCALATIONS_INDEX", "1") != "0"
+# Full reload as a safety net for writes that bypass the app (or a worker
+# that missed an event); the set is small, fewer than 1% of drivers
+ACTIVE_ESCALATIONS_REFRESH_SECONDS = float(os.getenv("ACTIVE_ESCALATIONS_REFRESH_SECONDS", "60"))
+
+ACTIVE_STATUS = "IN_PROGRESS"
+
+
+class ActiveEscalations:
+    """
+    In-process index of drivers with an IN_PROGRESS escalation, so the
+    per-message live-chat check is a dict lookup instead of a query.
+
+    Until the first load() succeeds, lookup() can't answer and the caller
+    asks Mongo. The same goes for as long as `relayed` is False: without a
+    broker that carries other workers' events, their accepts and resolves
+    would only show up at the next reload. Status changes are applied as
+    they happen (locally and from other workers' hub events); a reload
+    keeps any change applied while its query was in flight, so it can't
+    resurrect a resolved ticket.
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, enabled=ACTIVE_ESCALATIONS_INDEX):
+        self.enabled = enabled
+        self.ready = False
+        self.relayed = False       # set by connect() from the event hub's broker
+        self._tickets = {}         # driver_id -> set of IN_PROGRESS ticket ids
+        self._during_load = None   # changes applied while a load is running
+        self.counters = Counter()
+
+    def lookup(self, driver_id):
+        """(True, ticket_id or None) from the index, or (False, None) if it can't answer yet."""
+        if not self.enabled or not self.ready or not self.relayed:
+            self.counters["bypassed"] += 1
+            return False, None
+        tickets = self._tickets.get(str(driver_id))
+        if not tickets:
+            self.counters["negative"] += 1
+            return True, None
+        self.counters["positive"] += 1
+        return True, next(iter(tickets))
+
+    def apply(self, ticket_id, driver_id, status):
+        """Records a ticket's new status. Idempotent."""
+        if driver_id is None:
+            return
+        driver_id, ticket_id = str(driver_id), str(ticket_id)
+        if self._during_load is not None:
+            self._during_load.append((ticket_id, driver_id, status))
+        self._set(ticket_id, driver_id, status)
+
+    def _set(self, ticket_id, driver_id, status):
+        if status == ACTIVE_STATUS:
+            self._tickets.setdefault(driver_id, set()).add(ticket_id)
+        else:
+            tickets = self._tickets.get(driver_id)
+            if tickets:
+                tickets.discard(ticket_id)
+                if not tickets:
+                    del self._tickets[driver_id]
+
+    def on_event(self, event):
+        """Hub listener for escalation events."""
+        if event["type"] == "escalation":
+            data = event["data"]
+            self.apply(data.get("id"), data.get("driver_id"), data.get("status"))
+
+    async def load(self, collection):
+        """Replaces the index with the IN_PROGRESS tickets in Mongo. Returns False on error."""
+        if not self.enabled or collection is None:
+            return False
+        self._during_load = []
+        try:
+            docs = await collection.find({"status": ACTIVE_STATUS}, {"driver_id": 1}).to_list(length=None)
+        except Exception as e:
+            logger.error(f"Failed to load active escalations: {e}")
+            return False
+        else:
+            tickets = {}
+            for doc in docs:
+                if doc.get("driver_id") is not None:
+                    tickets.setdefault(str(doc["driver_id"]), set()).add(str(doc["_id"]))
+            self._tickets = tickets
+            for change in self._during_load:
+                self._set(*change)
+            self.ready = True
+            self.counters["loads"] += 1
+            return True
+        finally:
+            self._during_load = None
+
+    def stats(self):
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "drivers": len(self._tickets),
+            "relayed": self.relayed,
+        }
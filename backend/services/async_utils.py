@@ -0,0 +1,67 @@
+import os
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# boto3 has no asyncio API, so Bedrock/Polly calls run on their own pool.
+# Keeping them off Starlette's default threadpool (~40 threads) means a slow
+# model call never starves the event loop or the other sync endpoints.
+# A turn holds one thread while it waits on Bedrock (the whole call for
+# /chat, the gap to the next chunk for /chat/stream) and briefly one per
+# sentence sent to Polly, so this is the ceiling on concurrent turns per
+# worker: past it, calls wait for a thread ("queued" on /stats). The threads
+# mostly sleep in socket reads, so size it for the target load, not for CPU.
+# Bedrock's connection pool follows it (BEDROCK_POOL_SIZE), as does Polly's.
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "512"))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking function on the shared I/O pool and awaits its result.
+    Context variables (the request's trace) carry over, as with asyncio.to_thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(ctx.run, func, *args, **kwargs))
+
+
+async def iterate_blocking(iterable):
+    """
+    Yields items from a blocking iterator (e.g. a Bedrock response stream)
+    without blocking the event loop while waiting for the next item. The
+    iterator is closed however iteration ends, e.g. when the client leaves.
+    """
+    iterator = iter(iterable)
+    done = object()
+    try:
+        while True:
+            item = await run_blocking(next, iterator, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                pass  # still inside next() on a pool thread; it is finalized when that returns
+
+
+def blocking_io_stats():
+    return {
+        "workers": BLOCKING_IO_WORKERS,
+        "threads": len(_executor._threads),
+        "queued": _executor._work_queue.qsize(),
+    }
+
+
+def submit_blocking(func, *args, **kwargs):
+    """
+    Schedules a blocking function on the shared I/O pool without waiting
+    for it (fire-and-forget work such as cache warming).
+    """
+    return _executor.submit(func, *args, **kwargs)
@@ -0,0 +1,212 @@
+import os
+import mmap
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+AUDIO_CACHE_ENABLED = os.getenv("AUDIO_CACHE_ENABLED", "1") != "0"
+AUDIO_CACHE_MEMORY_MB = float(os.getenv("AUDIO_CACHE_MEMORY_MB", "32"))
+AUDIO_CACHE_DISK_MB = float(os.getenv("AUDIO_CACHE_DISK_MB", "512"))
+AUDIO_CACHE_DIR = os.getenv(
+    "AUDIO_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".audio_cache")
+)
+
+
+def normalize_text(text):
+    """Unicode-normalizes and collapses whitespace so trivial variants share an entry."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class AudioCache:
+    """
+    Content-addressed cache of synthesized audio.
+
+    Two tiers: a bounded in-memory LRU, and a size-capped directory of audio
+    files that survives restarts. Disk entries are memory-mapped on read, so
+    a hit costs a page-cache lookup rather than a copy. Safe to use from the
+    executor threads that run Polly calls.
+    """
+
+    def __init__(self, directory=AUDIO_CACHE_DIR, max_memory_bytes=None, max_disk_bytes=None):
+        self.directory = directory
+        self.max_memory_bytes = int(AUDIO_CACHE_MEMORY_MB * 1024 * 1024) if max_memory_bytes is None else max_memory_bytes
+        self.max_disk_bytes = int(AUDIO_CACHE_DISK_MB * 1024 * 1024) if max_disk_bytes is None else max_disk_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # key -> bytes-like, least recently used first
+        self._memory_bytes = 0
+        self._disk = OrderedDict()     # key -> size, least recently used first
+        self._disk_bytes = 0
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        self._load_disk_index()
+
+    @staticmethod
+    def make_key(text, voice, engine, output_format):
+        raw = "\x1f".join((normalize_text(text), voice, engine, output_format))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.audio")
+
+    def _load_disk_index(self):
+        """Rebuilds the disk LRU from what a previous process left behind."""
+        if self.max_disk_bytes <= 0:
+            return
+        entries = []
+        try:
+            for shard in os.scandir(self.directory):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".audio"):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, entry.name[:-len(".audio")], st.st_size))
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Could not index audio cache at {self.directory}: {e}")
+            return
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        for old_key in self._evict_disk():
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+        logger.info(f"Audio cache: {len(self._disk)} files ({self._disk_bytes} bytes) on disk")
+
+    def get(self, key):
+        """Returns the cached audio (bytes or a read-only mmap) or None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return data
+            on_disk = key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+
+        # The index only knows this process's writes; other workers share the
+        # directory, so a miss is checked against the file itself
+        if on_disk or (self.max_disk_bytes > 0 and os.path.exists(self._path(key))):
+            data = self._read_disk(key)
+            if data is not None:
+                with self._lock:
+                    self.counters["disk_hits"] += 1
+                    if key not in self._disk:
+                        self._disk[key] = len(data)
+                        self._disk_bytes += len(data)
+                    self._remember(key, data)
+                return data
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, key, data):
+        if not data:
+            return
+        with self._lock:
+            self.counters["stores"] += 1
+            self._remember(key, data)
+        self._write_disk(key, data)
+
+    def _remember(self, key, data):
+        # Caller holds the lock
+        size = len(data)
+        if size > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.counters["memory_evictions"] += 1
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Bump mtime so the LRU order survives a restart
+            os.utime(path)
+            return data
+        except (OSError, ValueError) as e:
+            logger.warning(f"Audio cache read failed for {key}: {e}")
+            with self._lock:
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            return None
+
+    def _write_disk(self, key, data):
+        if self.max_disk_bytes <= 0 or len(data) > self.max_disk_bytes:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Audio cache write failed for {key}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            old = self._disk.pop(key, None)
+            if old is not None:
+                self._disk_bytes -= old
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            evicted = self._evict_disk()
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def _evict_disk(self):
+        # Caller holds the lock (or is __init__); returns keys whose files should go
+        evicted = []
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            old_key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.counters["disk_evictions"] += 1
+            evicted.append(old_key)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+audio_cache = AudioCache() if AUDIO_CACHE_ENABLED else None
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .async_utils import BLOCKING_IO_WORKERS
+
+# boto3/botocore are imported on first use, so importing
+# the app (health checks, scripts, tests) doesn't pay for them
+
+logger = logging.getLogger(__name__)
+
+# One HTTP connection per thread that can be calling Bedrock at once
+BEDROCK_POOL_SIZE = int(os.getenv("BEDROCK_POOL_SIZE", str(BLOCKING_IO_WORKERS)))
+BEDROCK_CONNECT_TIMEOUT = float(os.getenv("BEDROCK_CONNECT_TIMEOUT", "2"))
+BEDROCK_READ_TIMEOUT = float(os.getenv("BEDROCK_READ_TIMEOUT", "20"))
+BEDROCK_MAX_ATTEMPTS = int(os.getenv("BEDROCK_MAX_ATTEMPTS", "3"))
+
+# Hedging: once a call has run longer than the rolling p95, send a second
+# one (optionally to another region/model) and take whichever finishes first.
+BEDROCK_HEDGE_ENABLED = os.getenv("BEDROCK_HEDGE_ENABLED", "0") == "1"
+BEDROCK_HEDGE_REGION = os.getenv("BEDROCK_HEDGE_REGION")
+BEDROCK_HEDGE_MODEL_ID = os.getenv("BEDROCK_HEDGE_MODEL_ID")
+BEDROCK_HEDGE_QUANTILE = float(os.getenv("BEDROCK_HEDGE_QUANTILE", "0.95"))
+BEDROCK_HEDGE_MIN_DELAY = float(os.getenv("BEDROCK_HEDGE_MIN_DELAY", "0.5"))
+# Cap on hedged/total calls, so a slow-down can't double the load on Bedrock
+BEDROCK_HEDGE_MAX_FRACTION = float(os.getenv("BEDROCK_HEDGE_MAX_FRACTION", "0.1"))
+LATENCY_WINDOW = int(os.getenv("BEDROCK_LATENCY_WINDOW", "500"))
+LATENCY_MIN_SAMPLES = 20
+
+
+def aws_errors():
+    """(BotoCoreError, ClientError), for except clauses; only evaluated once something has failed."""
+    from botocore.exceptions import BotoCoreError, ClientError
+    return BotoCoreError, ClientError
+
+
+def client_config():
+    from botocore.config import Config
+    return Config(
+        max_pool_connections=BEDROCK_POOL_SIZE,
+        connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+        read_timeout=BEDROCK_READ_TIMEOUT,
+        retries={"mode": "adaptive", "max_attempts": BEDROCK_MAX_ATTEMPTS},
+        tcp_keepalive=True,
+    )
+
+
+def make_client(region):
+    """A bedrock-runtime client with explicit pool size, timeouts and adaptive retries."""
+    import boto3
+    return boto3.client(
+        service_name='bedrock-runtime',
+        region_name=region,
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
+        config=client_config(),
+    )
+
+
+class LatencyWindow:
+    """Rolling window of successful call latencies (seconds) with cached quantiles."""
+
+    def __init__(self, size=LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._sorted = None
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._sorted = None
+
+    def quantile(self, q):
+        with self._lock:
+            if len(self._samples) < LATENCY_MIN_SAMPLES:
+                return None
+            if self._sorted is None:
+                self._sorted = sorted(self._samples)
+            return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class BedrockInvoker:
+    """
+    invoke_model with optional hedging against tail latency.
+
+    Without hedging a call runs on the caller's thread. With hedging the
+    primary call runs on a small dedicated pool (not the shared I/O pool the
+    caller is already on, which could deadlock) and a duplicate is fired at
+    the rolling p95. The loser is not cancelled - boto3 can't abort an
+    in-flight HTTP request - its result is just dropped.
+    """
+
+    def __init__(self, client, model_id, hedge_client=None, hedge_model_id=None, hedge_enabled=BEDROCK_HEDGE_ENABLED):
+        self.client = client
+        self.model_id = model_id
+        self.hedge_client = hedge_client or client
+        self.hedge_model_id = hedge_model_id or model_id
+        self.hedge_enabled = hedge_enabled and client is not None
+        self.latency = LatencyWindow()
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=BEDROCK_POOL_SIZE, thread_name_prefix="bedrock-hedge") if self.hedge_enabled else None
+
+    def _call(self, client, model_id, body):
+        start = time.perf_counter()
+        response = client.invoke_model(
+            body=body,
+            modelId=model_id,
+            accept='application/json',
+            contentType='application/json'
+        )
+        result = json.loads(response.get('body').read())
+        self.latency.observe(time.perf_counter() - start)
+        return result
+
+    def _hedge_delay(self):
+        p = self.latency.quantile(BEDROCK_HEDGE_QUANTILE)
+        if p is None:
+            return None
+        with self._lock:
+            if self.counters["hedged"] >= BEDROCK_HEDGE_MAX_FRACTION * max(1, self.counters["requests"]):
+                return None
+        return max(BEDROCK_HEDGE_MIN_DELAY, p)
+
+    def invoke(self, body):
+        """Returns the decoded response body. Raises the primary's error if every attempt fails."""
+        with self._lock:
+            self.counters["requests"] += 1
+        delay = self._hedge_delay() if self.hedge_enabled else None
+        if delay is None:
+            return self._call(self.client, self.model_id, body)
+
+        primary = self._pool.submit(self._call, self.client, self.model_id, body)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        with self._lock:
+            self.counters["hedged"] += 1
+        hedge = self._pool.submit(self._call, self.hedge_client, self.hedge_model_id, body)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.counters["hedge_wins"] += 1
+                    return future.result()
+                logger.warning(f"{'Hedged' if future is hedge else 'Primary'} Bedrock call failed: {future.exception()}")
+        return primary.result()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        quantiles = {f"p{int(q * 100)}_ms": self.latency.quantile(q) for q in (0.5, 0.95, 0.99)}
+        return {
+            **counters,
+            "hedge_enabled": self.hedge_enabled,
+            **{k: round(v * 1000, 1) if v is not None else None for k, v in quantiles.items()},
+        }
+
+
+def make_invoker(region, model_id):
+    """Builds the primary client, plus a hedge client if a second region is configured."""
+    client = make_client(region)
+    hedge_client = None
+    if BEDROCK_HEDGE_ENABLED and BEDROCK_HEDGE_REGION and BEDROCK_HEDGE_REGION != region:
+        try:
+            hedge_client = make_client(BEDROCK_HEDGE_REGION)
+        except Exception as e:
+            logger.error(f"Failed to initialize hedge Bedrock client for {BEDROCK_HEDGE_REGION}: {e}")
+    return client, BedrockInvoker(client, model_id, hedge_client, BEDROCK_HEDGE_MODEL_ID)
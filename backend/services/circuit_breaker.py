@@ -0,0 +1,140 @@
+import os
+import time
+import logging
+import threading
+from collections import deque, Counter
+
+logger = logging.getLogger(__name__)
+
+BREAKER_ENABLED = os.getenv("BREAKER_ENABLED", "1") != "0"
+BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "30"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "8"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Trips when, over the last BREAKER_WINDOW_SECONDS, at least BREAKER_MIN_CALLS
+    calls were made and the failure rate or the slow-call rate crosses its
+    threshold. While open, allow() is False for BREAKER_OPEN_SECONDS; then up
+    to BREAKER_HALF_OPEN_PROBES calls are let through, and their outcome closes
+    the breaker or opens it again. Used from executor threads, hence the lock.
+    """
+
+    def __init__(self, name, enabled=BREAKER_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._calls = deque()      # (finished_at, ok, slow)
+        self._opened_at = 0.0
+        self._probes = 0
+        self.counters = Counter()
+
+    def allow(self):
+        """True if a call may go out now. Each True must be followed by record()."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < BREAKER_OPEN_SECONDS:
+                    self.counters["rejected"] += 1
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes >= BREAKER_HALF_OPEN_PROBES:
+                    self.counters["rejected"] += 1
+                    return False
+                self._probes += 1
+                self.counters["probes"] += 1
+            return True
+
+    def record(self, ok, latency):
+        if not self.enabled:
+            return
+        slow = latency >= BREAKER_SLOW_CALL_SECONDS
+        now = time.monotonic()
+        with self._lock:
+            self.counters["successes" if ok else "failures"] += 1
+            if slow:
+                self.counters["slow_calls"] += 1
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                self._transition(CLOSED if ok and not slow else OPEN)
+                return
+            if self.state == OPEN:
+                return  # a call that started before the breaker tripped
+            self._calls.append((now, ok, slow))
+            while self._calls and self._calls[0][0] < now - BREAKER_WINDOW_SECONDS:
+                self._calls.popleft()
+            total = len(self._calls)
+            if total < BREAKER_MIN_CALLS:
+                return
+            failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+            slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+            if failures / total >= BREAKER_ERROR_RATE or slow_calls / total >= BREAKER_SLOW_RATE:
+                logger.warning(f"Circuit '{self.name}' opening: {failures}/{total} failed, {slow_calls}/{total} slow")
+                self._transition(OPEN)
+
+    def _transition(self, state):
+        # Caller holds the lock
+        if state == self.state:
+            return
+        logger.info(f"Circuit '{self.name}': {self.state} -> {state}")
+        self.state = state
+        self.counters[f"to_{state}"] += 1
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self._probes = 0
+        elif state == CLOSED:
+            self._calls.clear()
+            self._probes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "enabled": self.enabled, **self.counters}
+
+
+class PendingOutcome:
+    """
+    The one record() owed for a call that allow() let through, for calls
+    whose end isn't a single return (response streams). record() only counts
+    the first time; if nothing was recorded by the time the object is
+    closed or garbage-collected (a stream dropped before it was read), the
+    call counts as a success, so a half-open probe is never left hanging.
+    """
+
+    def __init__(self, breaker, start=None):
+        self.breaker = breaker
+        self.start = time.perf_counter() if start is None else start
+        self._recorded = False
+        self._lock = threading.Lock()
+
+    @property
+    def recorded(self):
+        return self._recorded
+
+    def record(self, ok):
+        with self._lock:
+            if self._recorded:
+                return
+            self._recorded = True
+        self.breaker.record(ok, time.perf_counter() - self.start)
+
+    def close(self):
+        self.record(True)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
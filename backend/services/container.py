@@ -0,0 +1,209 @@
+import os
+import time
+import json
+import asyncio
+import logging
+import threading
+
+from .async_utils import run_blocking, BLOCKING_IO_WORKERS
+from .bedrock_invoker import make_invoker, BedrockInvoker
+
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("MONGO_DB_NAME", "smart_battery_db")
+AWS_REGION = os.getenv("AWS_REGION", "us-west-2")
+MODEL_ID = os.getenv("LLM_MODEL_ID", "meta.llama3-1-8b-instruct-v1:0")
+
+# A 1-token invoke at startup opens the TLS connection to Bedrock before the
+# first driver pays for it; off by default since it is a billed call
+PREWARM_BEDROCK_INVOKE = os.getenv("PREWARM_BEDROCK_INVOKE", "0") == "1"
+# Mongo is pinged until it answers, backing off between these bounds, so a
+# worker that started during an outage becomes ready once Mongo is back
+MONGO_RETRY_MIN_SECONDS = float(os.getenv("MONGO_RETRY_MIN_SECONDS", "1"))
+MONGO_RETRY_MAX_SECONDS = float(os.getenv("MONGO_RETRY_MAX_SECONDS", "30"))
+# Attempts at on_mongo_ready (index builds, cache loads) before giving up
+MONGO_SETUP_ATTEMPTS = int(os.getenv("MONGO_SETUP_ATTEMPTS", "5"))
+
+COMPONENTS = ("mongo", "bedrock", "polly")
+
+
+class ServiceContainer:
+    """
+    This process's clients for Mongo, Bedrock and Polly, each built on first
+    use. Nothing is created at import, so under a pre-fork server every
+    worker opens its own sockets after the fork. prewarm() builds them and
+    opens their connections in the background, retrying Mongo until it
+    answers; readiness() reports how far that got, for /ready.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mongo_db = None
+        self._bedrock = None       # (client, invoker)
+        self._polly = None
+        self._failed = set()       # components whose client couldn't be built
+        self.status = {name: "pending" for name in COMPONENTS}
+        self.errors = {}
+        self.warm_ms = {}
+
+    def mongo_db(self):
+        """The Motor database handle, or None if the client can't be created."""
+        if self._mongo_db is None and "mongo" not in self._failed:
+            with self._lock:
+                if self._mongo_db is None and "mongo" not in self._failed:
+                    try:
+                        from motor.motor_asyncio import AsyncIOMotorClient
+                        # Motor connects lazily, so this never blocks
+                        client = AsyncIOMotorClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+                        self._mongo_db = client[DB_NAME]
+                    except Exception as e:
+                        self._fail("mongo", e)
+        return self._mongo_db
+
+    def bedrock(self):
+        """(client, invoker), or (None, None) if the client can't be created."""
+        if self._bedrock is None and "bedrock" not in self._failed:
+            with self._lock:
+                if self._bedrock is None and "bedrock" not in self._failed:
+                    try:
+                        self._bedrock = make_invoker(AWS_REGION, MODEL_ID)
+                        logger.info("Bedrock client initialized")
+                    except Exception as e:
+                        self._fail("bedrock", e)
+        return self._bedrock or (None, None)
+
+    def polly(self):
+        """The Polly client, or None if it can't be created."""
+        if self._polly is None and "polly" not in self._failed:
+            with self._lock:
+                if self._polly is None and "polly" not in self._failed:
+                    try:
+                        import boto3
+                        from botocore.config import Config
+                        # botocore's default of 10 connections would cap concurrent synthesis
+                        self._polly = boto3.client('polly', region_name=AWS_REGION,
+                                                   config=Config(max_pool_connections=BLOCKING_IO_WORKERS))
+                    except Exception as e:
+                        self._fail("polly", e)
+        return self._polly
+
+    def override(self, mongo_db=None, bedrock_client=None, polly_client=None):
+        """Installs ready-made clients (benchmark stand-ins) instead of building real ones. Call before startup."""
+        with self._lock:
+            if mongo_db is not None:
+                self._mongo_db = mongo_db
+            if bedrock_client is not None:
+                self._bedrock = (bedrock_client, BedrockInvoker(bedrock_client, MODEL_ID))
+            if polly_client is not None:
+                self._polly = polly_client
+
+    def built(self, name):
+        """True once the named client exists (without building it)."""
+        return {"mongo": self._mongo_db, "bedrock": self._bedrock, "polly": self._polly}[name] is not None
+
+    def _fail(self, name, e):
+        logger.error(f"Failed to initialize {name} client: {e}")
+        self._failed.add(name)
+        self.status[name] = "failed"
+        self.errors[name] = str(e)
+
+    async def prewarm(self, on_mongo_ready=None):
+        """
+        Builds every client and opens a connection for each, concurrently.
+        Mongo is retried with backoff until it answers a ping, which is when
+        /ready turns 200. on_mongo_ready (a coroutine function returning
+        True on success, e.g. index creation) runs after that and doesn't
+        hold readiness back.
+        """
+        await asyncio.gather(
+            self._warm_mongo(on_mongo_ready),
+            self._warm("bedrock", run_blocking, self._warm_bedrock),
+            self._warm("polly", run_blocking, self._warm_polly),
+        )
+
+    async def _warm(self, name, func, *args):
+        start = time.perf_counter()
+        try:
+            ok = await func(*args)
+        except Exception as e:
+            ok = False
+            self.errors[name] = str(e)
+            logger.warning(f"Pre-warming {name} failed: {e}")
+        self.warm_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+        if self.status[name] != "failed":
+            self.status[name] = "ready" if ok else "unavailable"
+
+    async def _warm_mongo(self, on_ready):
+        start = time.perf_counter()
+        delay = MONGO_RETRY_MIN_SECONDS
+        attempt = 0
+        while True:
+            db = self.mongo_db()
+            if db is None:
+                return  # the client can't be built at all; _fail() recorded why
+            attempt += 1
+            try:
+                await db.client.admin.command("ping")
+                break
+            except Exception as e:
+                self.status["mongo"] = "retrying"
+                self.errors["mongo"] = str(e)
+                logger.warning(f"MongoDB ping failed (attempt {attempt}), retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MONGO_RETRY_MAX_SECONDS)
+        self.warm_ms["mongo"] = round((time.perf_counter() - start) * 1000, 1)
+        self.status["mongo"] = "ready"
+        self.errors.pop("mongo", None)
+        logger.info("Connected to MongoDB")
+        if on_ready is not None:
+            await self._setup_mongo(on_ready)
+
+    async def _setup_mongo(self, on_ready):
+        self.status["mongo_setup"] = "running"
+        delay = MONGO_RETRY_MIN_SECONDS
+        for attempt in range(1, MONGO_SETUP_ATTEMPTS + 1):
+            try:
+                if await on_ready():
+                    self.status["mongo_setup"] = "done"
+                    self.errors.pop("mongo_setup", None)
+                    return
+                self.errors["mongo_setup"] = "incomplete"
+            except Exception as e:
+                self.errors["mongo_setup"] = str(e)
+            if attempt < MONGO_SETUP_ATTEMPTS:
+                logger.warning(f"MongoDB setup incomplete (attempt {attempt}), retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MONGO_RETRY_MAX_SECONDS)
+        self.status["mongo_setup"] = "failed"
+        logger.error(f"MongoDB setup failed after {MONGO_SETUP_ATTEMPTS} attempts; serving without it")
+
+    def _warm_bedrock(self):
+        client, invoker = self.bedrock()
+        if client is None:
+            return False
+        if PREWARM_BEDROCK_INVOKE:
+            invoker.invoke(json.dumps({"prompt": "hi", "max_gen_len": 1, "temperature": 0.0}))
+        return True
+
+    def _warm_polly(self):
+        client = self.polly()
+        if client is None:
+            return False
+        # Cheap, unbilled call that opens the TLS connection
+        client.describe_voices(LanguageCode="en-US")
+        return True
+
+    def readiness(self):
+        """
+        (ready, details). Ready once Mongo answers; Bedrock/Polly trouble and
+        unfinished index builds (mongo_setup) degrade but don't block.
+        """
+        return self.status["mongo"] == "ready", {
+            "components": dict(self.status),
+            "warm_ms": dict(self.warm_ms),
+            **({"errors": dict(self.errors)} if self.errors else {}),
+        }
+
+
+services = ServiceContainer()
@@ -0,0 +1,130 @@
+import re
+from datetime import date
+
+from .localization import format_date_for_lang, localize_dates_in_text
+from .preclassifier import is_emergency, emergency_result
+
+# Answers given without the model, while Bedrock is failing or the circuit
+# breaker is open: keyword intent matching plus templated replies filled in
+# from the driver context.
+
+_TOKEN = re.compile(r'[A-Za-z]+|[ऀ-ॿ]+')
+
+# In priority order: an invoice question that mentions "battery swap" is still
+# an invoice question, and "nearest battery station" is a station question.
+INTENT_KEYWORDS = (
+    ("invoice", frozenset("""
+        invoice invoices bill bills receipt payment paid amount
+        बिल भुगतान पेमेंट रसीद राशि पावती रक्कम
+    """.split())),
+    ("subscription", frozenset("""
+        subscription plan renew renewal recharge expire expiry expires validity upgrade
+        सदस्यता प्लान रिन्यू रिचार्ज सदस्यत्व प्लॅन नूतनीकरण
+    """.split())),
+    ("nearest station", frozenset("""
+        station stations nearest nearby near where kaha kahan kuthe jawal najdeek nazdeek
+        स्टेशन नजदीकी पास कहां कहाँ जवळ जवळचे जवळच्या कुठे
+    """.split())),
+    ("battery swap", frozenset("""
+        swap swapping swaps battery batteries badalna badal
+        बैटरी स्वैप बदलना बदलनी बॅटरी स्वॅप बदलायची बदलणे
+    """.split())),
+    ("leave", frozenset("""
+        leave leaves holiday holidays chutti chhutti sutti raja
+        छुट्टी अवकाश रजा सुट्टी
+    """.split())),
+)
+
+TEMPLATES = {
+    "subscription": {
+        "English": "Your {plan} subscription is valid until {expiry}.",
+        "Hindi": "आपकी {plan} सदस्यता {expiry} तक मान्य है।",
+        "Marathi": "तुमचे {plan} सदस्यत्व {expiry} पर्यंत वैध आहे.",
+    },
+    "subscription_unknown": {
+        "English": "I can't fetch your subscription details right now. Please try again in a few minutes.",
+        "Hindi": "मैं अभी आपकी सदस्यता की जानकारी नहीं ला पा रहा हूं। कृपया कुछ मिनट बाद फिर कोशिश करें।",
+        "Marathi": "मी आत्ता तुमच्या सदस्यत्वाची माहिती आणू शकत नाही. कृपया काही मिनिटांनी पुन्हा प्रयत्न करा.",
+    },
+    "battery swap": {
+        "English": "Your last battery swap was on {last_swap}. You can swap your battery at any of our stations.",
+        "Hindi": "आपका पिछला बैटरी स्वैप {last_swap} को हुआ था। आप हमारे किसी भी स्टेशन पर बैटरी बदल सकते हैं।",
+        "Marathi": "तुमचा शेवटचा बॅटरी स्वॅप {last_swap} रोजी झाला होता. तुम्ही आमच्या कोणत्याही स्टेशनवर बॅटरी बदलू शकता.",
+    },
+    "battery swap_unknown": {
+        "English": "You can swap your battery at any of our stations.",
+        "Hindi": "आप हमारे किसी भी स्टेशन पर बैटरी बदल सकते हैं।",
+        "Marathi": "तुम्ही आमच्या कोणत्याही स्टेशनवर बॅटरी बदलू शकता.",
+    },
+    "nearest station": {
+        "English": "I can't look up stations right now. Please check the station map in the app to find the nearest one.",
+        "Hindi": "मैं अभी स्टेशन नहीं ढूंढ पा रहा हूं। कृपया नजदीकी स्टेशन के लिए ऐप में मैप देखें।",
+        "Marathi": "मी आत्ता स्टेशन शोधू शकत नाही. कृपया जवळचे स्टेशन शोधण्यासाठी अ‍ॅपमधील नकाशा पहा.",
+    },
+    "invoice": {
+        "English": "Invoice details are unavailable right now. Please try again in a few minutes.",
+        "Hindi": "बिल की जानकारी अभी उपलब्ध नहीं है। कृपया कुछ मिनट बाद फिर कोशिश करें।",
+        "Marathi": "बिलाची माहिती आत्ता उपलब्ध नाही. कृपया काही मिनिटांनी पुन्हा प्रयत्न करा.",
+    },
+    "leave": {
+        "English": "Leave details are unavailable right now. Please try again in a few minutes.",
+        "Hindi": "छुट्टी की जानकारी अभी उपलब्ध नहीं है। कृपया कुछ मिनट बाद फिर कोशिश करें।",
+        "Marathi": "रजेची माहिती आत्ता उपलब्ध नाही. कृपया काही मिनिटांनी पुन्हा प्रयत्न करा.",
+    },
+    "unrelated": {
+        "English": "Our assistant is busy right now. Please try again in a few minutes.",
+        "Hindi": "हमारा सहायक अभी व्यस्त है। कृपया कुछ मिनट बाद फिर कोशिश करें।",
+        "Marathi": "आमचा सहाय्यक आत्ता व्यस्त आहे. कृपया काही मिनिटांनी पुन्हा प्रयत्न करा.",
+    },
+}
+
+
+def match_intent(text):
+    """The first intent in priority order with a keyword in the text, or 'unrelated'."""
+    tokens = {t.lower() for t in _TOKEN.findall(text or "")}
+    for intent, keywords in INTENT_KEYWORDS:
+        if not tokens.isdisjoint(keywords):
+            return intent
+    return "unrelated"
+
+
+def _format_value(value, language):
+    if isinstance(value, date):
+        return format_date_for_lang(value, language)
+    return localize_dates_in_text(str(value).strip(), language)
+
+
+def _fill(intent, language, context):
+    context = context or {}
+    if intent == "subscription":
+        expiry = context.get("subscription_expiry")
+        if expiry:
+            plan = context.get("subscription") or context.get("plan") or ""
+            text = TEMPLATES["subscription"][language].format(plan=plan, expiry=_format_value(expiry, language))
+            return " ".join(text.split())  # no plan name -> no double space
+        return TEMPLATES["subscription_unknown"][language]
+    if intent == "battery swap":
+        last_swap = context.get("last_swap")
+        if last_swap:
+            return TEMPLATES["battery swap"][language].format(last_swap=_format_value(last_swap, language))
+        return TEMPLATES["battery swap_unknown"][language]
+    return TEMPLATES[intent][language]
+
+
+def degraded_result(user_query, language, context=None):
+    """A complete intent result built without the model."""
+    language = language if language in TEMPLATES["unrelated"] else "English"
+    # Checked whatever PRECLASSIFIER_MODE says: with the model down this is
+    # the only thing that can still page an agent for a fire or an injury
+    if is_emergency(user_query or ""):
+        return emergency_result(language, source="degraded")
+    intent = match_intent(user_query)
+    return {
+        "intent": intent,
+        "confidence": 0.5 if intent != "unrelated" else 0.0,
+        "response": _fill(intent, language, context),
+        "language": language,
+        # Don't flood the agent queue during an outage; emergencies are handled above
+        "escalate": False,
+        "source": "degraded",
+    }
@@ -0,0 +1,100 @@
+import os
+import copy
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DRIVER_CACHE_ENABLED = os.getenv("DRIVER_CACHE_ENABLED", "1") != "0"
+DRIVER_CACHE_TTL_SECONDS = float(os.getenv("DRIVER_CACHE_TTL_SECONDS", "300"))
+DRIVER_CACHE_MAX_ENTRIES = int(os.getenv("DRIVER_CACHE_MAX_ENTRIES", "10000"))
+
+
+class DriverCache:
+    """
+    In-process cache of driver documents with TTL and max-size (LRU) eviction.
+
+    A document is stored once under its Mongo _id and reachable through any
+    number of lookup keys, e.g. ("id", "DRV001") or ("phone", "9876543210"),
+    so verify_driver, get_driver_details and get_driver_by_phone share entries
+    and a single invalidation by _id drops all of them. Documents are
+    deep-copied on the way in and out, so callers can modify what they get.
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, ttl=DRIVER_CACHE_TTL_SECONDS, max_entries=DRIVER_CACHE_MAX_ENTRIES, enabled=DRIVER_CACHE_ENABLED):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries = OrderedDict()  # _id -> (expires_at, doc)
+        self._keys = {}                # lookup key -> _id
+        self._keys_by_id = {}          # _id -> set of lookup keys
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def get(self, kind, value):
+        """Returns a deep copy of the cached document (without _id) or None."""
+        if not self.enabled:
+            self.counters["bypassed"] += 1
+            return None
+        doc_id = self._keys.get((kind, str(value)))
+        entry = self._entries.get(doc_id) if doc_id is not None else None
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        expires_at, doc = entry
+        if expires_at < time.monotonic():
+            self.counters["expired"] += 1
+            self.counters["misses"] += 1
+            self._drop(doc_id)
+            return None
+        self._entries.move_to_end(doc_id)
+        self.counters["hits"] += 1
+        return copy.deepcopy({k: v for k, v in doc.items() if k != "_id"})
+
+    def put(self, kind, value, doc):
+        """Caches a document fetched with its _id under the given lookup key."""
+        if not self.enabled or not doc or "_id" not in doc:
+            return
+        doc_id = doc["_id"]
+        key = (kind, str(value))
+        self._entries[doc_id] = (time.monotonic() + self.ttl, copy.deepcopy(doc))
+        self._entries.move_to_end(doc_id)
+        self._keys[key] = doc_id
+        self._keys_by_id.setdefault(doc_id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.counters["evictions"] += 1
+
+    def invalidate(self, doc_id):
+        if doc_id in self._entries or doc_id in self._keys_by_id:
+            self.counters["invalidations"] += 1
+            self._drop(doc_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._keys.clear()
+        self._keys_by_id.clear()
+
+    def _drop(self, doc_id):
+        self._entries.pop(doc_id, None)
+        for key in self._keys_by_id.pop(doc_id, ()):
+            if self._keys.get(key) == doc_id:
+                del self._keys[key]
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,269 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict, Counter
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# mongo  - events are also written to an `events` collection and every worker
+#          tails it (change stream, or polling where change streams aren't available)
+# memory - events reach subscribers of this process only (single worker, tests)
+# The frontend no longer polls, so anything but a single worker needs mongo.
+EVENT_BROKER = os.getenv("EVENT_BROKER", "mongo").strip().lower()
+EVENT_SUBSCRIBER_QUEUE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE", "100"))
+EVENT_DEDUPE_WINDOW = int(os.getenv("EVENT_DEDUPE_WINDOW", "5000"))
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "1"))
+# Polls re-read this far back, so events stamped by a worker whose clock or
+# insert lags behind aren't skipped; the hub drops the repeats by id
+EVENTS_POLL_OVERLAP_SECONDS = float(os.getenv("EVENTS_POLL_OVERLAP_SECONDS", "5"))
+# Events read per poll query; a poll keeps paging until it is drained
+EVENTS_POLL_PAGE_SIZE = int(os.getenv("EVENTS_POLL_PAGE_SIZE", "1000"))
+# Published events are inserted in batches, at most this long after the
+# first one is queued, so a chat turn never waits on an events write
+EVENTS_BATCH_SECONDS = float(os.getenv("EVENTS_BATCH_SECONDS", "0.05"))
+EVENTS_BATCH_SIZE = int(os.getenv("EVENTS_BATCH_SIZE", "500"))
+# TTL for the events collection; it is a relay, not a log
+EVENTS_TTL_SECONDS = int(os.getenv("EVENTS_TTL_SECONDS", "3600"))
+
+AGENTS_TOPIC = "agents"
+
+
+def driver_topic(driver_id):
+    return f"driver:{driver_id}"
+
+
+class Subscription:
+    """One subscriber's bounded event queue. Marked overflowed if the client falls too far behind."""
+
+    def __init__(self, hub, topics):
+        self.hub = hub
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=EVENT_SUBSCRIBER_QUEUE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client reconnects and catches up from history
+            self.overflowed = True
+
+    async def get(self, timeout=None):
+        """The next event, or None on timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """
+    In-process pub/sub for live chat. publish() fans an event out to local
+    subscribers at once and hands it to the broker for other workers; events
+    coming back from the broker are dropped if their id was already seen.
+    Only used from the event loop, so it needs no locking.
+
+    An event is a dict: {"id": ..., "topic": ..., "type": ..., "data": {...}}.
+    """
+
+    def __init__(self, broker=None):
+        self.broker = broker
+        self._subscribers = {}        # topic -> set of Subscription
+        self._listeners = {}          # topic -> list of callbacks, run inline on delivery
+        self._seen = OrderedDict()    # recent event ids
+        self._tasks = set()
+        self.counters = Counter()
+
+    def subscribe(self, *topics):
+        sub = Subscription(self, topics)
+        for topic in topics:
+            self._subscribers.setdefault(topic, set()).add(sub)
+        return sub
+
+    @property
+    def shared(self):
+        """True when events from other worker processes reach this hub."""
+        return getattr(self.broker, "shared", False)
+
+    def add_listener(self, topic, callback):
+        """Calls callback(event) for every event on a topic, local or relayed."""
+        self._listeners.setdefault(topic, []).append(callback)
+
+    def unsubscribe(self, sub):
+        for topic in sub.topics:
+            subs = self._subscribers.get(topic)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[topic]
+
+    def publish(self, topic, event_type, data, event_id):
+        """Delivers locally and forwards to the broker (fire-and-forget)."""
+        event = {"id": event_id, "topic": topic, "type": event_type, "data": data}
+        if not self.deliver(event):
+            return
+        self.counters["published"] += 1
+        if self.broker is not None:
+            task = asyncio.create_task(self._forward(event))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _forward(self, event):
+        try:
+            await self.broker.publish(event)
+        except Exception as e:
+            self.counters["broker_errors"] += 1
+            logger.error(f"Event broker publish failed: {e}")
+
+    def deliver(self, event):
+        """Fans an event out to local subscribers unless it was seen before. Returns False for duplicates."""
+        if event["id"] in self._seen:
+            self.counters["duplicates"] += 1
+            return False
+        self._seen[event["id"]] = True
+        while len(self._seen) > EVENT_DEDUPE_WINDOW:
+            self._seen.popitem(last=False)
+        for callback in self._listeners.get(event["topic"], ()):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Event listener failed for {event['topic']}: {e}")
+        for sub in self._subscribers.get(event["topic"], ()):
+            sub.deliver(event)
+            self.counters["delivered"] += 1
+        return True
+
+    async def run(self):
+        """Relays events from other workers until cancelled."""
+        if self.broker is not None:
+            await self.broker.listen(self)
+
+    def stats(self):
+        return {
+            **self.counters,
+            "broker": type(self.broker).__name__ if self.broker else None,
+            "broker_counters": dict(getattr(self.broker, "counters", {})),
+            "shared": self.shared,
+            "topics": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+        }
+
+
+class InMemoryBroker:
+    """Connects the hubs attached to it, e.g. several 'workers' inside one test process."""
+
+    shared = False
+
+    def __init__(self):
+        self.hubs = []
+
+    def attach(self, hub):
+        self.hubs.append(hub)
+        return hub
+
+    async def publish(self, event):
+        for hub in self.hubs:
+            hub.deliver(dict(event))
+
+    async def listen(self, hub):
+        if hub not in self.hubs:
+            self.attach(hub)
+
+
+class MongoEventBroker:
+    """
+    Relays events through a Mongo collection. Published events are queued
+    and written with one insert_many per EVENTS_BATCH_SECONDS. Every worker
+    tails inserts with a change stream (replica set / Atlas) or, failing
+    that, by polling for documents newer than the last one seen.
+    """
+
+    shared = True
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._pending = []
+        self._flusher = None
+        self.counters = Counter()
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("created_at", expireAfterSeconds=EVENTS_TTL_SECONDS, name="events_ttl")
+        # Serves the paged polls
+        await self.collection.create_index([("created_at", 1), ("_id", 1)], name="created_at_id")
+
+    async def publish(self, event):
+        """Queues the event for the next batch insert."""
+        self._pending.append({**event, "_id": event["id"], "created_at": datetime.utcnow()})
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        await asyncio.sleep(EVENTS_BATCH_SECONDS)
+        while self._pending:
+            batch = self._pending[:EVENTS_BATCH_SIZE]
+            del self._pending[:EVENTS_BATCH_SIZE]
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+                self.counters["inserted"] += len(batch)
+                self.counters["batches"] += 1
+            except Exception as e:
+                # Other workers miss these; their clients catch up from history on reconnect
+                self.counters["insert_errors"] += 1
+                logger.error(f"Event broker insert of {len(batch)} events failed: {e}")
+
+    async def listen(self, hub):
+        try:
+            await self.ensure_indexes()
+        except Exception as e:
+            logger.warning(f"Could not create events TTL index: {e}")
+        try:
+            pipeline = [{"$match": {"operationType": "insert"}}]
+            async with self.collection.watch(pipeline) as stream:
+                logger.info("Relaying live chat events via change stream")
+                async for change in stream:
+                    hub.deliver(_from_doc(change["fullDocument"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Events change stream unavailable ({e}); polling every {EVENTS_POLL_SECONDS}s")
+
+        since = datetime.utcnow()
+        while True:
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+            try:
+                since = await self._poll(hub, since)
+            except Exception as e:
+                logger.error(f"Events poll failed: {e}")
+
+    async def _poll(self, hub, since):
+        """Delivers every event newer than since minus the overlap, a page at a time. Returns the new since."""
+        query = {"created_at": {"$gt": since - timedelta(seconds=EVENTS_POLL_OVERLAP_SECONDS)}}
+        while True:
+            docs = await self.collection.find(query).sort([("created_at", 1), ("_id", 1)]).to_list(length=EVENTS_POLL_PAGE_SIZE)
+            for doc in docs:
+                since = max(since, doc["created_at"])
+                hub.deliver(_from_doc(doc))
+            if len(docs) < EVENTS_POLL_PAGE_SIZE:
+                return since
+            # Next page: after the last (created_at, _id) read
+            last = docs[-1]
+            query = {"$or": [
+                {"created_at": {"$gt": last["created_at"]}},
+                {"created_at": last["created_at"], "_id": {"$gt": last["_id"]}},
+            ]}
+
+
+def _from_doc(doc):
+    return {"id": doc["id"], "topic": doc["topic"], "type": doc["type"], "data": doc["data"]}
+
+
+def make_broker(db):
+    if EVENT_BROKER == "mongo" and db is not None:
+        return MongoEventBroker(db["events"])
+    if EVENT_BROKER != "memory":
+        logger.warning(f"Unknown EVENT_BROKER {EVENT_BROKER!r}; live events stay within this worker")
+    return None
@@ -0,0 +1,129 @@
+import os
+import re
+
+# Language we answer in when a message is romanized Hindi ("battery kab milegi")
+HINGLISH_RESPONSE_LANGUAGE = os.getenv("HINGLISH_RESPONSE_LANGUAGE", "Hindi")
+
+_WORD = re.compile(r'[A-Za-z]+|[ऀ-ॿ]+')
+_DEVANAGARI_LETTER = re.compile(r'[ऀ-ॿ]')
+_LATIN_LETTER = re.compile(r'[A-Za-z]')
+
+# --- Devanagari lexicons: function words that differ between Hindi and Marathi ---
+HINDI_WORDS = frozenset("""
+है हैं था थी थे हूं हूँ हो नहीं क्या कब कैसे कहां कहाँ क्यों कौन कितना कितनी कितने
+मुझे मेरा मेरी मेरे हमें हमारा आप आपका आपकी आपके तुम तुम्हारा और या लेकिन भी
+को से में पर का की के ने यह वह ये वो इस उस कुछ चाहिए करना करें करो कर रहा रही
+गया गई हुआ हुई होगा होगी मिलेगा मिलेगी बताओ बताइए बताएं दो दीजिए अभी कल वाला
+सदस्यता बैटरी स्टेशन नजदीकी पास छुट्टी बिल
+""".split())
+MARATHI_WORDS = frozenset("""
+आहे आहेत होता होती होते नाही नाहीत काय कधी कसे कसा कशी कुठे का कोण किती
+मला माझा माझी माझे माझ्या आम्हाला आमचा तुम्ही तुम्हाला तुमचा तुमची तुमचे आणि किंवा पण
+ला ने चा ची चे च्या मध्ये वर हा ही हे तो ती ते या त्या काही पाहिजे करायचे करा
+झाला झाली झाले होईल मिळेल मिळाला सांगा द्या आत्ता उद्या वाला शकतो शकते
+सदस्यत्व शेवटचा शेवटची शेवटचे जवळचे जवळच्या जवळ रजा ड्रायव्हर स्वॅप नवीन कृपया नाव
+""".split())
+# Letters far more common in Marathi than Hindi (retroflex LLA)
+MARATHI_LETTERS = frozenset("ळ")
+
+# --- Latin-script lexicons ---
+ENGLISH_WORDS = frozenset("""
+the a an is are am was were be been do does did have has had i you he she it we they
+my your his her our their me him us them this that these those what when where why
+how which who whom can could will would should shall may might must not no yes ok okay
+please thanks thank hello hi hey of to in on at for from with by about and or but if
+want need get got give show tell find check know help much many long left expire expires
+expired renew upgrade apply days day today tomorrow yesterday last next nearest near
+there here any some all time date amount paid pay bill
+""".split())
+# Romanized Hindi
+HINGLISH_WORDS = frozenset("""
+hai hain tha thi the ho hoga hogi nahi nahin nhi kya kyaa kab kaise kese kaha kahan kyu kyun
+kaun kitna kitni kitne mujhe mujhko mera meri mere hum humara aap aapka aapki tum
+aur lekin bhi ko se mein me par ka ki ke ne yeh ye woh wo iss us kuch chahiye karna
+karo karein kar raha rahi gaya gayi hua hui milega milegi batao bataiye do dijiye abhi
+kal wala wali paas najdeek nazdeek chutti bhai ji haan acha accha theek thik
+""".split())
+# Romanized Marathi
+ROMAN_MARATHI_WORDS = frozenset("""
+aahe ahe aahet nahi nahiye kay kadhi kasa kase kashi kuthe kon kiti mala maza majha mazi
+majhi maze majhe mazya tumhi tumhala tumcha tumchi tumche aani ani kinva pan madhye la cha
+chi che paahije pahije karaycha kara zala zali jhala jhali hoil milel milala sanga dya atta
+udya shakto shakte samapt sampto sampte sampla samplay jawal javal raja
+""".split())
+# Shared by the romanized lexicons; they count for neither side
+_ROMAN_SHARED = HINGLISH_WORDS & ROMAN_MARATHI_WORDS
+_HINGLISH_ONLY = HINGLISH_WORDS - _ROMAN_SHARED - ENGLISH_WORDS
+_ROMAN_MARATHI_ONLY = ROMAN_MARATHI_WORDS - _ROMAN_SHARED - ENGLISH_WORDS
+
+
+def _confidence(winner, other, base):
+    """Laplace-smoothed share of the winning side's evidence, floored at base."""
+    return round(max(base, (winner + 1) / (winner + other + 2)), 2)
+
+
+def _detect_devanagari(words):
+    hindi = marathi = 0
+    for w in words:
+        if w in MARATHI_WORDS:
+            marathi += 1
+        if w in HINDI_WORDS:
+            hindi += 1
+        if MARATHI_LETTERS.intersection(w):
+            marathi += 2
+    if marathi > hindi:
+        return "Marathi", _confidence(marathi, hindi, 0.5)
+    # Ties go to Hindi, the larger population
+    return "Hindi", _confidence(hindi, marathi, 0.5)
+
+
+def _detect_latin(words):
+    english = hinglish = marathi = 0
+    for w in words:
+        if w in ENGLISH_WORDS:
+            english += 1
+        elif w in _HINGLISH_ONLY:
+            hinglish += 1
+        elif w in _ROMAN_MARATHI_ONLY:
+            marathi += 1
+        elif w in _ROMAN_SHARED:
+            hinglish += 0.5
+            marathi += 0.5
+    indic = hinglish + marathi
+    # Domain nouns (battery, swap, station) are in no lexicon, so a couple of
+    # Hindi/Marathi function words are enough to outweigh the English ones.
+    if indic >= 1 and indic * 2 >= english:
+        if marathi > hinglish:
+            return "Marathi", _confidence(marathi, hinglish + english, 0.5)
+        return "Hinglish", _confidence(hinglish, marathi + english, 0.5)
+    return "English", _confidence(english, indic, 0.5 if english else 0.4)
+
+
+def detect(text):
+    """
+    Returns (language, confidence) where language is one of 'English',
+    'Hindi', 'Marathi' or 'Hinglish'. Deterministic: a script histogram
+    picks Devanagari vs Latin, then lexicon lookups pick the language.
+    """
+    if not text:
+        return "English", 0.0
+    devanagari = len(_DEVANAGARI_LETTER.findall(text))
+    latin = len(_LATIN_LETTER.findall(text))
+    if not devanagari and not latin:
+        return "English", 0.0
+    words = _WORD.findall(text.lower())
+    if devanagari >= latin:
+        language, confidence = _detect_devanagari([w for w in words if w[0] >= "ऀ"])
+        # Scale by how much of the text is Devanagari at all
+        return language, round(confidence * devanagari / (devanagari + latin), 2) if latin else confidence
+    return _detect_latin([w for w in words if w[0] < "ऀ"])
+
+
+def detect_language(text):
+    """
+    The language to answer in: 'English', 'Hindi' or 'Marathi'.
+    """
+    language, _ = detect(text)
+    if language == "Hinglish":
+        return HINGLISH_RESPONSE_LANGUAGE
+    return language
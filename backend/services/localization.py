@@ -0,0 +1,63 @@
+import re
+from datetime import date
+
+# Month names for Marathi and Hindi (simple transliterations in Devanagari)
+MONTHS_MR = [
+    'जानेवारी','फेब्रुवारी','मार्च','एप्रिल','मे','जून','जुलै','ऑगस्ट','सप्टेंबर','ऑक्टोबर','नोव्हेंबर','डिसेंबर'
+]
+MONTHS_HI = [
+    'जनवरी','फ़रवरी','मार्च','अप्रैल','मई','जून','जुलाई','अगस्त','सितंबर','अक्टूबर','नवंबर','दिसंबर'
+]
+# Fixed English abbreviations, so output doesn't depend on the process locale
+MONTHS_EN = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+DEVANAGARI_DIGITS = str.maketrans('0123456789', '०१२३४५६७८९')
+
+# YYYY-MM-DD, or DD/MM/YYYY and DD-MM-YYYY, in one pass
+_DATE = re.compile(r'\b(?:(\d{4})-(\d{2})-(\d{2})|(\d{1,2})[/-](\d{1,2})[/-](\d{4}))\b')
+
+
+def localize_number(s: str, lang_name: str) -> str:
+    if lang_name in ('Marathi', 'Hindi'):
+        return s.translate(DEVANAGARI_DIGITS)
+    return s
+
+
+def format_date_for_lang(dt: date, lang_name: str) -> str:
+    """Return a human-friendly localized date string for the language."""
+    day = str(dt.day)
+    year = str(dt.year)
+    month_idx = dt.month - 1
+    if lang_name == 'Marathi':
+        return f"{localize_number(day, 'Marathi')} {MONTHS_MR[month_idx]} {localize_number(year, 'Marathi')}"
+    if lang_name == 'Hindi':
+        return f"{localize_number(day, 'Hindi')} {MONTHS_HI[month_idx]} {localize_number(year, 'Hindi')}"
+    # Default English
+    return f"{dt.day:02d} {MONTHS_EN[month_idx]} {dt.year}"
+
+
+def parse_date(text):
+    """Parses exactly YYYY-MM-DD or DD/MM/YYYY (or DD-MM-YYYY); None otherwise."""
+    m = _DATE.fullmatch(text.strip())
+    return _match_to_date(m) if m else None
+
+
+def _match_to_date(m):
+    try:
+        if m.group(1):
+            return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        return date(int(m.group(6)), int(m.group(5)), int(m.group(4)))
+    except ValueError:
+        return None  # e.g. 2025-13-40
+
+
+def localize_dates_in_text(text: str, lang_name: str) -> str:
+    """Find ISO-like and day-first dates in text and replace with localized formats."""
+    if not text or not any(ch.isdigit() for ch in text):
+        return text
+
+    def repl(m):
+        dt = _match_to_date(m)
+        return format_date_for_lang(dt, lang_name) if dt else m.group(0)
+
+    return _DATE.sub(repl, text)
@@ -0,0 +1,198 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, Counter
+
+# bson/pymongo are imported where used; Motor has loaded them by the time
+# a sink exists, but importing this module alone stays cheap
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_SINK_ENABLED = os.getenv("MESSAGE_SINK_ENABLED", "1") != "0"
+MESSAGE_SINK_BATCH_SIZE = int(os.getenv("MESSAGE_SINK_BATCH_SIZE", "200"))
+MESSAGE_SINK_FLUSH_INTERVAL = float(os.getenv("MESSAGE_SINK_FLUSH_INTERVAL", "0.5"))
+# Beyond this many unflushed messages the oldest are dropped (Mongo is down)
+MESSAGE_SINK_MAX_BUFFER = int(os.getenv("MESSAGE_SINK_MAX_BUFFER", "50000"))
+SHUTDOWN_FLUSH_ATTEMPTS = 3
+# A message Mongo rejects this many times (validation error, too large) is
+# moved to the dead-letter collection instead of being retried forever
+MESSAGE_SINK_MAX_ATTEMPTS = int(os.getenv("MESSAGE_SINK_MAX_ATTEMPTS", "3"))
+DEAD_LETTER_TEXT_CHARS = 10000
+
+_DUPLICATE_KEY = 11000
+
+
+class MessageSink:
+    """
+    Write-behind buffer for chat messages.
+
+    add() gives the message a client-side ObjectId and returns at once; run()
+    writes the buffer with insert_many(ordered=False) every
+    MESSAGE_SINK_FLUSH_INTERVAL seconds or as soon as MESSAGE_SINK_BATCH_SIZE
+    messages are waiting. A message stays visible through pending_for() until
+    its insert is acknowledged, so history reads see their own writes.
+    Messages Mongo itself rejects are retried MESSAGE_SINK_MAX_ATTEMPTS
+    times, then dead-lettered; connection errors are retried indefinitely.
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, collection, dead_letter=None, batch_size=MESSAGE_SINK_BATCH_SIZE, interval=MESSAGE_SINK_FLUSH_INTERVAL):
+        self.collection = collection
+        self.dead_letter = dead_letter
+        self.batch_size = batch_size
+        self.interval = interval
+        self._pending = OrderedDict()   # _id -> doc, buffered or in flight, oldest first
+        self._queue = []                # _ids not yet handed to insert_many
+        self._attempts = Counter()      # _id -> times Mongo rejected the document
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self.counters = Counter()
+        self._flush_ms_total = 0.0
+        self._flush_ms_max = 0.0
+        self._last_flush_ms = 0.0
+
+    def add(self, doc):
+        from bson import ObjectId
+        doc.setdefault("_id", ObjectId())
+        self._pending[doc["_id"]] = doc
+        self._queue.append(doc["_id"])
+        self.counters["added"] += 1
+        while len(self._pending) > MESSAGE_SINK_MAX_BUFFER:
+            dropped_id, _ = self._pending.popitem(last=False)
+            self._attempts.pop(dropped_id, None)
+            self.counters["dropped"] += 1
+            logger.error(f"Message sink full; dropped unflushed message {dropped_id}")
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return doc["_id"]
+
+    def pending_for(self, driver_id):
+        """Unflushed messages for a driver, oldest first."""
+        return [dict(doc) for doc in self._pending.values() if doc.get("driver_id") == driver_id]
+
+    async def run(self):
+        """Flushes on size or interval until cancelled."""
+        while True:
+            # asyncio.wait rather than wait_for: on 3.10/3.11 wait_for can
+            # swallow a cancel that races with the event firing
+            waiter = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=self.interval)
+            finally:
+                waiter.cancel()
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self, collection=None):
+        """Writes everything queued so far. Returns False if some writes failed."""
+        async with self._flush_lock:
+            ok = True
+            while self._queue:
+                ids, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+                batch = [self._pending[i] for i in ids if i in self._pending]
+                if batch and not await self._insert(collection or self.collection, batch):
+                    ok = False
+                    break
+            return ok
+
+    async def _insert(self, collection, batch):
+        from pymongo.errors import BulkWriteError
+        start = time.perf_counter()
+        failed = []
+        rejected = []
+        try:
+            await collection.insert_many(batch, ordered=False)
+        except asyncio.CancelledError:
+            # Shutting down mid-flush; leave the batch for close() (a retry of
+            # inserts that did land only hits duplicate keys)
+            self._queue = [doc["_id"] for doc in batch] + self._queue
+            raise
+        except BulkWriteError as e:
+            # Duplicates are retries of writes that already landed
+            errors = {err["index"]: err for err in e.details.get("writeErrors", []) if err.get("code") != _DUPLICATE_KEY}
+            failed = [doc for i, doc in enumerate(batch) if i in errors]
+            if failed:
+                logger.error(f"Message sink: {len(failed)}/{len(batch)} inserts failed: {list(errors.values())[:1]}")
+            for i, err in errors.items():
+                doc = batch[i]
+                self._attempts[doc["_id"]] += 1
+                if self._attempts[doc["_id"]] >= MESSAGE_SINK_MAX_ATTEMPTS:
+                    rejected.append((doc, err))
+            if rejected:
+                await self._dead_letter(rejected)
+                rejected_ids = {doc["_id"] for doc, _ in rejected}
+                failed = [doc for doc in failed if doc["_id"] not in rejected_ids]
+        except Exception as e:
+            logger.error(f"Message sink flush failed, will retry: {e}")
+            failed = batch
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.counters["flushes"] += 1
+        self._flush_ms_total += elapsed_ms
+        self._flush_ms_max = max(self._flush_ms_max, elapsed_ms)
+        self._last_flush_ms = elapsed_ms
+
+        failed_ids = {doc["_id"] for doc in failed}
+        for doc in batch:
+            if doc["_id"] not in failed_ids:
+                self._pending.pop(doc["_id"], None)
+                self._attempts.pop(doc["_id"], None)
+        self.counters["flushed"] += len(batch) - len(failed) - len(rejected)
+        if failed:
+            self.counters["failed_flushes"] += 1
+            # Back to the front of the queue, ahead of newer messages
+            self._queue = [doc["_id"] for doc in failed] + self._queue
+            return False
+        return True
+
+    async def _dead_letter(self, rejected):
+        """Moves documents Mongo keeps rejecting out of the queue, into the dead-letter collection if there is one."""
+        from datetime import datetime
+        records = []
+        for doc, err in rejected:
+            logger.error(f"Message sink: dead-lettering message {doc['_id']} for {doc.get('driver_id')} "
+                         f"after {self._attempts[doc['_id']]} attempts: {err.get('errmsg')}")
+            message = dict(doc)
+            if isinstance(message.get("text"), str):
+                # Oversized documents must still fit in the dead-letter record
+                message["text_length"] = len(message["text"])
+                message["text"] = message["text"][:DEAD_LETTER_TEXT_CHARS]
+            records.append({
+                "message": message,
+                "error": err.get("errmsg"),
+                "code": err.get("code"),
+                "attempts": self._attempts[doc["_id"]],
+                "dead_lettered_at": datetime.utcnow(),
+            })
+        self.counters["dead_lettered"] += len(records)
+        if self.dead_letter is not None:
+            try:
+                await self.dead_letter.insert_many(records, ordered=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["dead_letter_failed"] += len(records)
+                logger.error(f"Message sink: dead-letter insert failed, messages only logged: {e}")
+
+    async def close(self):
+        """Final flush on shutdown, acknowledged only once journaled."""
+        from pymongo.write_concern import WriteConcern
+        durable = self.collection.with_options(write_concern=WriteConcern(w=1, j=True))
+        for attempt in range(SHUTDOWN_FLUSH_ATTEMPTS):
+            if await self.flush(durable):
+                break
+            await asyncio.sleep(0.5 * (attempt + 1))
+        if self._pending:
+            logger.error(f"Message sink closed with {len(self._pending)} unflushed messages")
+
+    def stats(self):
+        flushes = self.counters["flushes"]
+        return {
+            **self.counters,
+            "queue_depth": len(self._queue),
+            "unflushed": len(self._pending),
+            "last_flush_ms": round(self._last_flush_ms, 2),
+            "avg_flush_ms": round(self._flush_ms_total / flushes, 2) if flushes else 0.0,
+            "max_flush_ms": round(self._flush_ms_max, 2),
+        }
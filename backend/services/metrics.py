@@ -0,0 +1,237 @@
+import os
+import time
+import inspect
+import logging
+import secrets
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Spans time each stage of a request (Mongo calls, language detection,
+# prompt build, Bedrock, parsing, translation, Polly, serialization). They
+# are buffered on the request's Trace until its intent and language are
+# known, then observed into voicebot_stage_seconds{stage,intent,language}.
+# Spans may nest (parse_completion includes translation), so per-stage
+# times don't add up to the request time.
+
+TRACE_HEADERS = os.getenv("TRACE_HEADERS", "1") != "0"
+# Label combinations beyond this collapse into "other", so a model that
+# invents intents can't blow up the series count
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "500"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with labels. Observed from executor threads, hence the lock."""
+
+    def __init__(self, name, help_text, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                if len(self._series) >= METRICS_MAX_SERIES:
+                    labels = ("other",) * len(self.labelnames)
+                series = self._series.setdefault(labels, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def quantiles(self, group_by=0):
+        """{label value at position group_by: {"count", "p50_ms", ...}}, interpolated within buckets."""
+        with self._lock:
+            merged = {}
+            for labels, series in self._series.items():
+                acc = merged.setdefault(labels[group_by], [0] * len(series))
+                for i, v in enumerate(series):
+                    acc[i] += v
+        out = {}
+        for key, series in sorted(merged.items()):
+            count = series[-1]
+            out[key] = {"count": count, "avg_ms": round(series[-2] / count * 1000, 1) if count else None}
+            for q in QUANTILES:
+                out[key][f"p{int(q * 100)}_ms"] = self._quantile(series, q)
+        return out
+
+    def _quantile(self, series, q):
+        count = series[-1]
+        if not count:
+            return None
+        rank = q * count
+        lower, below = 0.0, 0
+        for i, bound in enumerate(self.buckets):
+            if series[i] >= rank:
+                in_bucket = series[i] - below
+                fraction = (rank - below) / in_bucket if in_bucket else 1.0
+                return round((lower + (bound - lower) * fraction) * 1000, 1)
+            lower, below = bound, series[i]
+        return round(self.buckets[-1] * 1000, 1)  # beyond the last bucket
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, series in items:
+            base = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, labels))
+            sep = "," if base else ""
+            for i, bound in enumerate(self.buckets):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {series[i]}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return "\n".join(lines)
+
+
+stage_seconds = Histogram("voicebot_stage_seconds", "Time spent in each stage of a request", ("stage", "intent", "language"))
+request_seconds = Histogram("voicebot_request_seconds", "Time to response headers per route", ("route", "method", "status"))
+
+
+class Trace:
+    """
+    Spans of one request. Carries a W3C trace context: the incoming
+    traceparent's trace id is kept, so our timings can be joined with the
+    caller's trace.
+    """
+
+    def __init__(self, traceparent=None):
+        self.trace_id, self.parent_id = _parse_traceparent(traceparent)
+        self.span_id = secrets.token_hex(8)
+        self.spans = []          # (stage, seconds), until finish()
+        self.labels = None       # (intent, language) once finished
+        self.deferred = False    # finished by the endpoint (streams), not the middleware
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            if self.labels is None:
+                self.spans.append((stage, seconds))
+                return
+            labels = self.labels
+        stage_seconds.observe(seconds, stage, *labels)
+
+    def finish(self, intent="", language=""):
+        """Observes the buffered spans under the request's intent and language. Idempotent."""
+        with self._lock:
+            if self.labels is not None:
+                return
+            self.labels = (intent or "", language or "")
+            spans = list(self.spans)
+        for stage, seconds in spans:
+            stage_seconds.observe(seconds, stage, *self.labels)
+
+    def server_timing(self):
+        """Server-Timing header value; repeated stages are summed."""
+        totals = {}
+        with self._lock:
+            for stage, seconds in self.spans:
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        return ", ".join(f"{stage.replace('.', '-')};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+def _parse_traceparent(header):
+    parts = (header or "").strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16 and parts[1] != "0" * 32:
+        try:
+            int(parts[1], 16), int(parts[2], 16)
+            return parts[1].lower(), parts[2].lower()
+        except ValueError:
+            pass
+    return secrets.token_hex(16), None
+
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace(traceparent=None):
+    trace = Trace(traceparent)
+    _current.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current.get()
+
+
+def observe_stage(stage, seconds):
+    trace = _current.get()
+    if trace is not None:
+        trace.record(stage, seconds)
+    else:
+        stage_seconds.observe(seconds, stage, "", "")
+
+
+@contextmanager
+def span(stage):
+    """Times the block as one stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def traced(stage):
+    """Decorator form of span() for plain and async functions."""
+    def wrap(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def run_async(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return run_async
+
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return run
+    return wrap
+
+
+def latency_stats():
+    """Per-stage and per-route quantiles, for /stats."""
+    return {"stages": stage_seconds.quantiles(0), "routes": request_seconds.quantiles(0)}
+
+
+def render(stats):
+    """Prometheus text format: the histograms plus every numeric value in the /stats dict as a gauge."""
+    lines = [stage_seconds.render(), request_seconds.render()]
+    gauges = []
+    _flatten("voicebot", stats, gauges)
+    for name, value in gauges:
+        lines.append(f"# TYPE {name} gauge\n{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            _flatten(f"{prefix}_{_metric_name(str(key))}", child, out)
+    elif isinstance(value, bool):
+        out.append((prefix, int(value)))
+    elif isinstance(value, (int, float)):
+        out.append((prefix, value))
+
+
+def _metric_name(key):
+    return "".join(c if c.isalnum() else "_" for c in key.lower())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,61 +1,172 @@
 
 import os
+import asyncio
 import logging
-from pymongo import MongoClient
-from dotenv import load_dotenv
+from .container import services
+from .driver_cache import DriverCache
+from .message_sink import MessageSink, MESSAGE_SINK_ENABLED
+from .event_hub import EventHub, make_broker, driver_topic, AGENTS_TOPIC
+from .active_escalations import ActiveEscalations, ACTIVE_ESCALATIONS_REFRESH_SECONDS
+from .metrics import traced
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-DB_NAME = os.getenv("MONGO_DB_NAME", "smart_battery_db")
+# Bound by connect(), per process, once the app starts
+client = None
+db = None
+drivers_collection = None
+escalations_collection = None
+messages_collection = None
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Shared by verify_driver, get_driver_details and get_driver_by_phone;
+# kept coherent by watch_driver_changes()
+driver_cache = DriverCache()
+DRIVER_CHANGE_POLL_SECONDS = float(os.getenv("DRIVER_CHANGE_POLL_SECONDS", "30"))
+
+# Write-behind buffer for save_message, created by connect(); run_message_sink() flushes it
+message_sink = None
+
+# Live chat fan-out: save_message and escalation changes publish here, the
+# /events SSE endpoints subscribe; run_event_relay() brings in other workers' events
+event_hub = EventHub()
+
+# Drivers in live chat, for check_active_escalation; other workers' changes
+# arrive as hub events (so it is only trusted with a shared broker), and
+# refresh_active_escalations() reloads periodically
+active_escalations = ActiveEscalations()
+event_hub.add_listener(AGENTS_TOPIC, active_escalations.on_event)
+
+# Fall back to the old multi-field lookup when driver_key misses. Off by
+# default: every unknown id would scan the collection. Set
+# DRIVER_KEY_FALLBACK=1 only until migrate_driver_keys.py has run.
+DRIVER_KEY_FALLBACK = os.getenv("DRIVER_KEY_FALLBACK", "0") == "1"
+# Same for the regex scan behind get_driver_by_phone and phone_key
+PHONE_KEY_FALLBACK = os.getenv("PHONE_KEY_FALLBACK", "0") == "1"
 
-try:
-    # Use a short server selection timeout to fail fast if unreachable
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    # Trigger server selection to validate the connection immediately
-    client.server_info()
-    db = client[DB_NAME]
+def connect():
+    """
+    Binds the collections to this process's Motor client. Cheap (Motor
+    connects lazily); called from the app lifespan, i.e. after any fork.
+    """
+    global client, db, drivers_collection, escalations_collection, messages_collection, message_sink
+    if client is not None:
+        return True
+    db = services.mongo_db()
+    if db is None:
+        return False
+    client = db.client
     drivers_collection = db['drivers']
     escalations_collection = db['escalations']
     messages_collection = db['messages']
-    logger.info("Connected to MongoDB")
-except Exception as e:
-    logger.error(f"Failed to connect to MongoDB: {e}")
-    drivers_collection = None
-    escalations_collection = None
-    messages_collection = None
+    if MESSAGE_SINK_ENABLED:
+        message_sink = MessageSink(messages_collection, dead_letter=db['messages_dead_letter'])
+    event_hub.broker = make_broker(db)
+    # The index is only as fresh as the events reaching this worker
+    active_escalations.relayed = event_hub.shared
+    if active_escalations.enabled and not active_escalations.relayed:
+        logger.warning("No cross-worker event broker; active escalation checks will query Mongo")
+    return True
+
+async def ensure_indexes():
+    """
+    Creates the indexes the service's queries rely on. Idempotent; run at startup.
+    """
+    if client is None:
+        return False
+    specs = [
+        (drivers_collection, [("driver_key", 1)], {"unique": True, "sparse": True, "name": "driver_key_unique"}),
+        (drivers_collection, [("phone_key", 1)], {"unique": True, "sparse": True, "name": "phone_key_unique"}),
+        # Serves history pages, cursors on (timestamp, _id) and the covered ETag head lookup
+        (messages_collection, [("driver_id", 1), ("timestamp", 1), ("_id", 1)], {"name": "driver_timestamp_id"}),
+        (escalations_collection, [("driver_id", 1), ("status", 1)], {"name": "driver_status"}),
+        # Serves the agent queue pages (cursor on created_at, _id) and the per-status count
+        (escalations_collection, [("status", 1), ("created_at", -1), ("_id", -1)], {"name": "status_created_at_id"}),
+    ]
+    ok = True
+    for collection, keys, options in specs:
+        try:
+            await collection.create_index(keys, **options)
+        except Exception as e:
+            ok = False
+            logger.error(f"Failed to ensure index {options['name']} on {collection.name}: {e}")
+    if ok:
+        logger.info("MongoDB indexes ensured")
+    return ok
 
-def verify_driver(driver_id):
+@traced("mongo.verify_driver")
+async def verify_driver(driver_id):
     """
     Verifies if a driver exists in the database.
-    Checks 'driver_id' (snake_case) and 'driverId' (camelCase).
+    Looks up the canonical driver_key derived from 'driver_id' / 'driverId'.
     """
     if drivers_collection is None:
         logger.error("Database connection is not available.")
         return False
-    
-    try:
-        # Check snake_case
-        if drivers_collection.find_one({"driver_id": driver_id}):
-            return True
-        # Check camelCase
-        if drivers_collection.find_one({"driverId": driver_id}):
-            return True
-        
-        # Check int versions if string provided
-        if str(driver_id).isdigit():
-             if drivers_collection.find_one({"driver_id": int(driver_id)}): return True
-             if drivers_collection.find_one({"driverId": int(driver_id)}): return True
-        
+
+    return await get_driver_details(driver_id) is not None
+
+def normalize_driver_key(driver_id):
+    """
+    Canonical form of a driver id, stored on each driver as `driver_key`.
+    'drv001 ', 'DRV001' and 5 / '5' map to the same key.
+    """
+    if driver_id is None:
+        return ''
+    return str(driver_id).strip().upper()
+
+def lookup_keys_for(driver):
+    """
+    Returns the normalized lookup fields for a driver document.
+    Writers should $set these whenever the source fields change.
+    """
+    keys = {}
+    raw_id = driver.get('driver_id') if driver.get('driver_id') is not None else driver.get('driverId')
+    if raw_id is not None:
+        keys['driver_key'] = normalize_driver_key(raw_id)
+    keys.update(_phone_keys_for(driver))
+    return keys
+
+async def _backfill_keys(driver):
+    """
+    $sets the lookup keys a driver document is missing or has stale.
+    Best-effort: a conflict on a unique key (two drivers sharing a phone
+    number) is logged, not raised. Returns True if it wrote.
+    """
+    keys = {k: v for k, v in lookup_keys_for(driver).items() if driver.get(k) != v}
+    if not keys or driver.get("_id") is None:
         return False
+    try:
+        await drivers_collection.update_one({"_id": driver["_id"]}, {"$set": keys})
+        return True
     except Exception as e:
-        logger.error(f"Error verifying driver: {e}")
+        logger.error(f"Could not backfill {', '.join(keys)} on driver {driver['_id']}: {e}")
         return False
 
-def get_driver_details(driver_id):
+async def _legacy_driver_lookup(driver_id):
+    """
+    Pre-driver_key lookup across driver_id/driverId as str and int.
+    Not index-backed; only used until migrate_driver_keys.py has run.
+    """
+    query = {"$or": [
+        {"driver_id": driver_id},
+        {"driverId": driver_id}
+    ]}
+
+    # Handle potential int/str mismatch
+    if str(driver_id).isdigit():
+        query["$or"].extend([
+            {"driver_id": int(driver_id)},
+            {"driverId": int(driver_id)}
+        ])
+
+    driver = await drivers_collection.find_one(query)
+    if driver is not None:
+        logger.warning(f"Driver {driver_id} found via legacy collection scan; backfilling driver_key")
+        await _backfill_keys(driver)
+    return driver
+
+@traced("mongo.get_driver_details")
+async def get_driver_details(driver_id):
     """
     Fetches driver details for context.
     Returns a dictionary or None.
@@ -63,21 +174,23 @@ def get_driver_details(driver_id):
     if drivers_collection is None:
         return None
 
+    key = normalize_driver_key(driver_id)
+    if not key:
+        return None
+
+    cached = driver_cache.get("id", key)
+    if cached is not None:
+        return cached
+
     try:
-        # Try finding by driver_id or driverId
-        query = {"$or": [
-            {"driver_id": driver_id},
-            {"driverId": driver_id}
-        ]}
-        
-        # Handle potential int/str mismatch
-        if str(driver_id).isdigit():
-            query["$or"].extend([
-                {"driver_id": int(driver_id)},
-                {"driverId": int(driver_id)}
-            ])
-
-        driver = drivers_collection.find_one(query, {"_id": 0}) # Exclude _id
+        # Single exact match on the unique driver_key index
+        driver = await drivers_collection.find_one({"driver_key": key})
+        if driver is None and DRIVER_KEY_FALLBACK:
+            driver = await _legacy_driver_lookup(driver_id)
+        if driver is None:
+            return None
+        driver_cache.put("id", key, driver)
+        driver.pop("_id", None) # Exclude _id
         return driver
     except Exception as e:
         logger.error(f"Error fetching driver details: {e}")
@@ -87,55 +200,102 @@ def get_driver_details(driver_id):
 # --- Phone lookup helpers ---
 import re
 
+# Fields older driver documents keep phone numbers in, in priority order
+PHONE_FIELDS = ("phone", "phone_number", "mobile", "mobile_no", "driverMobileNumber")
+PHONE_DEFAULT_COUNTRY_CODE = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "91")
+
 def _normalize_phone(phone):
     if phone is None:
         return ''
     return ''.join(ch for ch in str(phone) if ch.isdigit())
 
+def normalize_phone_key(phone):
+    """Last 10 digits of a phone number in any format; the indexed `phone_key`."""
+    return _normalize_phone(phone)[-10:]
+
+def to_e164(phone):
+    """Best-effort E.164 form, assuming PHONE_DEFAULT_COUNTRY_CODE for national numbers."""
+    digits = _normalize_phone(phone)
+    if len(digits) == 10:
+        return f"+{PHONE_DEFAULT_COUNTRY_CODE}{digits}"
+    if len(digits) == 11 and digits.startswith('0'):
+        return f"+{PHONE_DEFAULT_COUNTRY_CODE}{digits[1:]}"
+    return f"+{digits}" if digits else ''
+
+def _phone_keys_for(driver):
+    for field in PHONE_FIELDS:
+        key = normalize_phone_key(driver.get(field))
+        if key:
+            return {"phone_key": key, "phone_e164": to_e164(driver.get(field))}
+    return {}
 
-def get_driver_by_phone(phone):
+# What lookup_keys_for reads, plus the keys themselves to compare against
+KEY_SOURCE_PROJECTION = {f: 1 for f in ("driver_id", "driverId", "driver_key", "phone_key", "phone_e164", "updated_at", *PHONE_FIELDS)}
+
+async def _legacy_phone_lookup(phone, last10):
+    """
+    Pre-phone_key lookup: exact and unanchored-regex matches across every
+    phone field. Scans the collection; only used until the backfill has run.
+    """
+    query = {"$or": [
+        {"phone": phone},
+        {"phone_number": phone},
+        {"mobile": phone},
+        {"mobile_no": phone},
+        {"driverMobileNumber": phone},
+        {"phone": {"$regex": last10}},
+        {"phone_number": {"$regex": last10}},
+        {"mobile": {"$regex": last10}},
+        {"mobile_no": {"$regex": last10}},
+        {"driverMobileNumber": {"$regex": last10}}
+    ]}
+    driver = await drivers_collection.find_one(query)
+    if driver is not None:
+        logger.warning(f"Phone {last10} found via legacy collection scan; backfilling phone_key")
+        await _backfill_keys(driver)
+    return driver
+
+
+@traced("mongo.get_driver_by_phone")
+async def get_driver_by_phone(phone):
     """Return driver document (without _id) matching a phone number.
-    Tries exact fields and last-10-digits matching to handle varied formats.
+    Matches on the last 10 digits, so '+91 98765-43210' and '9876543210'
+    find the same driver with one point lookup on the phone_key index.
     """
     if drivers_collection is None:
         logger.error("Database connection is not available.")
         return None
 
-    pn = _normalize_phone(phone)
-    if not pn:
+    last10 = normalize_phone_key(phone)
+    if not last10:
         return None
 
-    # Build queries for exact and suffix (last 10 digits) matches
-    last10 = pn[-10:]
+    cached = driver_cache.get("phone", last10)
+    if cached is not None:
+        return cached
     try:
-        query = {"$or": [
-            {"phone": phone},
-            {"phone_number": phone},
-            {"mobile": phone},
-            {"mobile_no": phone},
-            {"driverMobileNumber": phone},
-            {"phone": {"$regex": last10}},
-            {"phone_number": {"$regex": last10}},
-            {"mobile": {"$regex": last10}},
-            {"mobile_no": {"$regex": last10}},
-            {"driverMobileNumber": {"$regex": last10}}
-        ]}
-        driver = drivers_collection.find_one(query, {"_id": 0})
+        driver = await drivers_collection.find_one({"phone_key": last10})
+        if driver is None and PHONE_KEY_FALLBACK:
+            driver = await _legacy_phone_lookup(phone, last10)
+        if driver is None:
+            return None
+        driver_cache.put("phone", last10, driver)
+        driver.pop("_id", None)
         return driver
     except Exception as e:
         logger.error(f"Error fetching driver by phone: {e}")
         return None
 
 
-def verify_phone(phone):
+async def verify_phone(phone):
     """Return True if phone exists for any driver, False otherwise."""
-    d = get_driver_by_phone(phone)
+    d = await get_driver_by_phone(phone)
     return d is not None
 
-from datetime import datetime
-from bson.objectid import ObjectId
+from datetime import datetime, timedelta, timezone
 
-def create_escalation(driver_id, intent, confidence, summary=None):
+@traced("mongo.create_escalation")
+async def create_escalation(driver_id, intent, confidence, summary=None):
     """
     Creates a new escalation ticket in the database.
     """
@@ -151,45 +311,71 @@ def create_escalation(driver_id, intent, confidence, summary=None):
             "status": "OPEN",
             "created_at": datetime.utcnow()
         }
-        result = escalations_collection.insert_one(ticket)
+        result = await escalations_collection.insert_one(ticket)
         logger.info(f"Escalation ticket created: {result.inserted_id}")
+        _publish_escalation(str(result.inserted_id), driver_id, "OPEN")
         return str(result.inserted_id)
     except Exception as e:
         logger.error(f"Error creating escalation: {e}")
         return None
 
-def get_escalations(status=None):
+# What the dashboard list shows; anything else is fetched per ticket
+ESCALATION_LIST_FIELDS = {"driver_id": 1, "intent": 1, "confidence": 1, "summary": 1, "status": 1, "created_at": 1}
+
+@traced("mongo.get_escalations")
+async def get_escalations(status=None, limit=50, before=None):
     """
-    Retrieves escalation tickets, optionally filtered by status.
+    Retrieves a page of escalation tickets, newest first, optionally
+    filtered by status. Returns {"tickets": [...], "next_cursor": ...};
+    pass next_cursor back as before= for the following page (None on the
+    last one). Raises ValueError for a malformed cursor.
     """
+    page = {"tickets": [], "next_cursor": None}
     if escalations_collection is None:
-        return []
-        
+        return page
+    query = {}
+    if status:
+        query["status"] = status
+    if before:
+        query.update(_cursor_filter("$lt", *parse_cursor(before), field="created_at"))
     try:
-        query = {}
-        if status:
-            query["status"] = status
-            
-        # Sort by newest first
-        tickets = list(escalations_collection.find(query).sort("created_at", -1))
-        # Convert ObjectId and datetime to string for JSON serialization
-        for t in tickets:
-            t["id"] = str(t["_id"])
-            del t["_id"]
-            if "created_at" in t:
-                t["created_at"] = t["created_at"].isoformat()
-                
-        return tickets
+        # One extra to know whether there is a next page
+        tickets = await escalations_collection.find(query, ESCALATION_LIST_FIELDS) \
+            .sort([("created_at", -1), ("_id", -1)]).limit(limit + 1).to_list(length=limit + 1)
     except Exception as e:
         logger.error(f"Error fetching escalations: {e}")
-        return []
+        return page
+    if len(tickets) > limit:
+        tickets = tickets[:limit]
+        page["next_cursor"] = make_cursor(tickets[-1], field="created_at")
+    # Convert ObjectId and datetime to string for JSON serialization
+    for t in tickets:
+        t["id"] = str(t.pop("_id"))
+        if "created_at" in t:
+            t["created_at"] = t["created_at"].isoformat()
+    page["tickets"] = tickets
+    return page
+
+@traced("mongo.count_escalations")
+async def count_escalations(status):
+    """Number of tickets with a status; counted on the status_created_at_id index. None on error."""
+    if escalations_collection is None:
+        return 0
+    try:
+        return await escalations_collection.count_documents({"status": status})
+    except Exception as e:
+        logger.error(f"Error counting escalations: {e}")
+        return None
 
 # --- Live Chat Helpers ---
 
-def save_message(driver_id, sender, text):
+@traced("mongo.save_message")
+async def save_message(driver_id, sender, text):
     """
     Saves a chat message to the database.
     sender: 'user', 'bot', or 'agent'
+    With the message sink enabled the write is buffered and the id is
+    assigned client-side; get_chat_history still sees the message.
     """
     if messages_collection is None:
         return None
@@ -198,25 +384,87 @@ def save_message(driver_id, sender, text):
             "driver_id": driver_id,
             "sender": sender,
             "text": text,
-            "timestamp": datetime.utcnow()
+            # Mongo stores milliseconds; truncate now so buffered and stored copies sort alike
+            "timestamp": _now_millis()
         }
-        result = messages_collection.insert_one(msg)
-        return str(result.inserted_id)
+        if message_sink is not None:
+            message_sink.add(msg)
+        else:
+            await messages_collection.insert_one(msg)
+        _publish_message(msg)
+        return str(msg["_id"])
     except Exception as e:
         logger.error(f"Error saving message: {e}")
         return None
 
-def get_chat_history(driver_id, limit=50):
+def _now_millis():
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+_EPOCH = datetime(1970, 1, 1)
+_CURSOR = re.compile(r'^(\d+)-([0-9a-f]{24})$')
+
+def make_cursor(msg, field="timestamp"):
+    """Opaque position of a message in its conversation (or of a ticket in the queue): "<epoch millis>-<_id>"."""
+    millis = (msg.get(field, _EPOCH) - _EPOCH) // timedelta(milliseconds=1)
+    return f"{millis}-{msg['_id']}"
+
+def parse_cursor(cursor):
     """
-    Retrieves chat history for a driver.
+    (timestamp, _id) from a history cursor. A bare ISO timestamp is also
+    accepted (for since=), giving (timestamp, None). Raises ValueError.
+    """
+    m = _CURSOR.match(cursor)
+    if m:
+        from bson import ObjectId
+        return _EPOCH + timedelta(milliseconds=int(m.group(1))), ObjectId(m.group(2))
+    ts = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts, None
+
+def _cursor_filter(op, ts, oid, field="timestamp"):
+    if oid is None:
+        return {field: {op: ts}}
+    return {"$or": [{field: {op: ts}}, {field: ts, "_id": {op: oid}}]}
+
+def _in_bounds(msg, op, ts, oid):
+    key, bound = ((msg["timestamp"],), (ts,)) if oid is None else ((msg["timestamp"], msg["_id"]), (ts, oid))
+    return key > bound if op == "$gt" else key < bound
+
+@traced("mongo.get_chat_history")
+async def get_chat_history(driver_id, limit=50, before=None, after=None):
+    """
+    Retrieves a page of chat history for a driver, oldest first.
+    By default (or with before=) the newest `limit` messages before the
+    cursor; with after= the oldest `limit` messages after it, so polling
+    with the last message's cursor returns only new messages. Each message
+    carries its `cursor`. Raises ValueError for a malformed cursor.
     """
     if messages_collection is None:
         return []
+    bound = None
+    if after:
+        bound = ("$gt", *parse_cursor(after))
+    elif before:
+        bound = ("$lt", *parse_cursor(before))
     try:
-        msgs = list(messages_collection.find({"driver_id": driver_id}).sort("timestamp", 1).limit(limit))
+        query = {"driver_id": driver_id}
+        if bound:
+            query.update(_cursor_filter(*bound))
+        direction = 1 if after else -1
+        msgs = await messages_collection.find(query).sort([("timestamp", direction), ("_id", direction)]).limit(limit).to_list(length=limit)
+        if message_sink is not None:
+            # Overlay writes that haven't been flushed yet
+            stored = {m["_id"] for m in msgs}
+            unflushed = [m for m in message_sink.pending_for(driver_id)
+                         if m["_id"] not in stored and (bound is None or _in_bounds(m, *bound))]
+            msgs.extend(unflushed)
+        msgs.sort(key=lambda m: (m.get("timestamp", _EPOCH), m["_id"]))
+        msgs = msgs[:limit] if after else msgs[-limit:]
         for m in msgs:
-            m["id"] = str(m["_id"])
-            del m["_id"]
+            m["cursor"] = make_cursor(m)
+            m["id"] = str(m.pop("_id"))
             if "timestamp" in m:
                 m["timestamp"] = m["timestamp"].isoformat()
         return msgs
@@ -224,31 +472,67 @@ def get_chat_history(driver_id, limit=50):
         logger.error(f"Error fetching chat history: {e}")
         return []
 
-def update_escalation_status(ticket_id, status):
+@traced("mongo.get_chat_history_head")
+async def get_chat_history_head(driver_id):
+    """
+    Cursor of the driver's newest message, or "" if there are none. Messages
+    are append-only, so this identifies the conversation's state; the lookup
+    is covered by the driver_timestamp_id index.
+    """
+    if messages_collection is None:
+        return ""
+    try:
+        latest = await messages_collection.find_one(
+            {"driver_id": driver_id}, {"_id": 1, "timestamp": 1},
+            sort=[("timestamp", -1), ("_id", -1)]
+        )
+    except Exception as e:
+        logger.error(f"Error fetching chat history head: {e}")
+        return None
+    candidates = [latest] if latest else []
+    if message_sink is not None:
+        candidates.extend(message_sink.pending_for(driver_id))
+    if not candidates:
+        return ""
+    return make_cursor(max(candidates, key=lambda m: (m.get("timestamp", _EPOCH), m["_id"])))
+
+@traced("mongo.update_escalation_status")
+async def update_escalation_status(ticket_id, status):
     """
     Updates the status of an escalation ticket.
     """
     if escalations_collection is None:
         return False
     try:
-        escalations_collection.update_one(
+        from bson import ObjectId
+        ticket = await escalations_collection.find_one_and_update(
             {"_id": ObjectId(ticket_id)},
-            {"$set": {"status": status}}
+            {"$set": {"status": status}},
+            projection={"driver_id": 1}
         )
+        if ticket:
+            active_escalations.apply(ticket_id, ticket.get("driver_id"), status)
+            _publish_escalation(ticket_id, ticket.get("driver_id"), status)
         return True
     except Exception as e:
         logger.error(f"Error updating escalation: {e}")
         return False
 
-def check_active_escalation(driver_id):
+@traced("mongo.check_active_escalation")
+async def check_active_escalation(driver_id):
     """
     Checks if there is an active (IN_PROGRESS) escalation for the driver.
-    Returns the ticket ID if active, else None.
+    Returns the ticket ID if active, else None. Answered from the in-memory
+    index once it has loaded and other workers' changes are relayed to it;
+    otherwise Mongo is asked.
     """
     if escalations_collection is None:
         return None
+    known, ticket_id = active_escalations.lookup(driver_id)
+    if known:
+        return ticket_id
     try:
-        active = escalations_collection.find_one({
+        active = await escalations_collection.find_one({
             "driver_id": driver_id, 
             "status": "IN_PROGRESS"
         })
@@ -258,3 +542,109 @@ def check_active_escalation(driver_id):
     except Exception as e:
         logger.error(f"Error checking active escalation: {e}")
         return None
+
+# --- Live events ---
+
+def serialize_message(msg):
+    """A message document in the shape get_chat_history returns."""
+    return {
+        "id": str(msg["_id"]),
+        "driver_id": msg["driver_id"],
+        "sender": msg["sender"],
+        "text": msg["text"],
+        "timestamp": msg["timestamp"].isoformat(),
+        "cursor": make_cursor(msg),
+    }
+
+def _publish_message(msg):
+    data = serialize_message(msg)
+    # The cursor is unique per message, and lets a reconnecting client resume from it
+    event_hub.publish(driver_topic(msg["driver_id"]), "message", data, data["cursor"])
+
+def _publish_escalation(ticket_id, driver_id, status):
+    data = {"id": ticket_id, "driver_id": driver_id, "status": status}
+    event_id = f"esc-{ticket_id}-{status}-{(_now_millis() - _EPOCH) // timedelta(milliseconds=1)}"
+    event_hub.publish(AGENTS_TOPIC, "escalation", data, event_id)
+    if driver_id:
+        event_hub.publish(driver_topic(driver_id), "escalation", data, event_id + "-driver")
+
+async def run_event_relay():
+    """Delivers events published by other workers until cancelled."""
+    await event_hub.run()
+
+def event_hub_stats():
+    return event_hub.stats()
+
+async def refresh_active_escalations():
+    """Loads the active-escalation index, then reloads it periodically until cancelled."""
+    if not active_escalations.enabled:
+        return
+    while True:
+        await active_escalations.load(escalations_collection)
+        await asyncio.sleep(ACTIVE_ESCALATIONS_REFRESH_SECONDS if active_escalations.ready else 5)
+
+def active_escalations_stats():
+    return active_escalations.stats()
+
+# --- Message write-behind ---
+
+async def run_message_sink():
+    """Flushes buffered messages until cancelled; see close_message_sink()."""
+    if message_sink is not None:
+        await message_sink.run()
+
+async def close_message_sink():
+    if message_sink is not None:
+        await message_sink.close()
+
+def message_sink_stats():
+    return message_sink.stats() if message_sink is not None else {"enabled": False}
+
+# --- Driver cache invalidation ---
+
+async def watch_driver_changes():
+    """
+    Keeps driver_cache coherent with the drivers collection, and the lookup
+    keys of changed drivers current (any writer, not just the scripts that
+    call lookup_keys_for). Uses a change stream when the deployment supports
+    one (replica set / Atlas); otherwise polls for documents whose
+    `updated_at` moved forward, which relies on writers stamping
+    `updated_at`. Runs until cancelled.
+    """
+    if drivers_collection is None:
+        return
+
+    try:
+        async with drivers_collection.watch(full_document="updateLookup") as stream:
+            logger.info("Watching drivers collection for cache invalidation")
+            async for change in stream:
+                op = change.get("operationType")
+                if op in ("drop", "rename", "dropDatabase", "invalidate"):
+                    driver_cache.clear()
+                    break
+                doc_id = change.get("documentKey", {}).get("_id")
+                if doc_id is not None:
+                    driver_cache.invalidate(doc_id)
+                if change.get("fullDocument"):
+                    # Our own $set comes back as a change with nothing left to write
+                    await _backfill_keys(change["fullDocument"])
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"Driver change stream unavailable ({e}); polling updated_at every {DRIVER_CHANGE_POLL_SECONDS}s")
+
+    since = datetime.utcnow()
+    while True:
+        await asyncio.sleep(DRIVER_CHANGE_POLL_SECONDS)
+        try:
+            cursor = drivers_collection.find({"updated_at": {"$gt": since}}, KEY_SOURCE_PROJECTION)
+            async for doc in cursor:
+                driver_cache.invalidate(doc["_id"])
+                await _backfill_keys(doc)
+                if isinstance(doc.get("updated_at"), datetime) and doc["updated_at"] > since:
+                    since = doc["updated_at"]
+        except Exception as e:
+            logger.error(f"Error polling driver changes: {e}")
+
+def driver_cache_stats():
+    return driver_cache.stats()
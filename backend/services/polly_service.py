@@ -1,16 +1,21 @@
 
-import boto3
 import os
+import hmac
+import json
+import zlib
 import base64
-from botocore.exceptions import BotoCoreError, ClientError
+import hashlib
 import logging
+import secrets
+import threading
+from .async_utils import run_blocking
+from .audio_cache import audio_cache, AudioCache, AUDIO_CACHE_DIR
+from .container import services
+from .bedrock_invoker import aws_errors
+from .metrics import traced
 
 logger = logging.getLogger(__name__)
 
-# Initialize Polly client
-APP_REGION = os.getenv("AWS_REGION", "us-west-2")
-polly_client = boto3.client('polly', region_name=APP_REGION)
-
 # Normalize language names to mapped keys
 VOICE_MAPPING = {
     "english": "Joanna",
@@ -24,46 +29,230 @@ VOICE_MAPPING = {
     "french": "Celine",
 }
 
-def generate_audio_base64(text, language="English"):
+def voice_for_language(language):
+    """Maps a language name/code to the Polly voice used for it."""
+    # Accept various language forms: 'Marathi', 'mr', 'मराठी', 'marathi'
+    lang_key = (language or '').strip().lower()
+    if lang_key == 'marathi' or lang_key == 'mr':
+        lang_key = 'marathi'
+
+    # Default to Joanna (English) if language not found
+    return VOICE_MAPPING.get(lang_key, 'Joanna')
+
+
+# Audio ids carry their own job: "<cache key>.<payload>.<signature>", where
+# the payload is the compressed (text, voice) and the signature an HMAC over
+# both. Any worker can synthesize any id without shared state, and nobody
+# can get arbitrary text spoken on our Polly account. Workers must share
+# AUDIO_ID_SECRET; without it, a secret is kept next to the audio cache,
+# which covers workers on one host.
+AUDIO_ID_SECRET = os.getenv("AUDIO_ID_SECRET")
+AUDIO_STREAM_CHUNK_SIZE = 16 * 1024
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def _audio_id_secret():
+    global _secret
+    with _secret_lock:
+        if _secret is None:
+            _secret = AUDIO_ID_SECRET.encode("utf-8") if AUDIO_ID_SECRET else _shared_secret()
+        return _secret
+
+
+def _shared_secret():
+    path = os.path.join(AUDIO_CACHE_DIR, ".audio_id_secret")
+    try:
+        os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    except FileExistsError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not create {path} ({e}); audio ids will only resolve on this worker")
+        return secrets.token_bytes(32)
+    try:
+        with open(path, encoding="utf-8") as f:
+            secret = f.read().strip()
+        if secret:
+            return secret.encode("utf-8")
+    except OSError as e:
+        logger.warning(f"Could not read {path}: {e}")
+    return secrets.token_bytes(32)
+
+
+def _sign(key, payload):
+    return hmac.new(_audio_id_secret(), f"{key}.{payload}".encode("ascii"), hashlib.sha256).hexdigest()[:32]
+
+
+def register_audio(text, language="English"):
     """
-    Generates speech from text using AWS Polly and returns it as a base64 encoded string.
+    Returns the id under which audio for this text is served. Nothing is
+    synthesized yet; the id itself says what to synthesize.
     """
+    voice_id = voice_for_language(language)
+    # Keyed on the requested engine; a standard-engine fallback is cached
+    # under the same key so the next request doesn't retry neural.
+    key = AudioCache.make_key(text, voice_id, 'neural', 'mp3')
+    raw = json.dumps([text, voice_id], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    payload = base64.urlsafe_b64encode(zlib.compress(raw, 9)).decode("ascii").rstrip("=")
+    return f"{key}.{payload}.{_sign(key, payload)}"
+
+
+def cache_key(audio_id):
+    """The content hash an audio id is cached under."""
+    return audio_id.split(".", 1)[0]
+
+
+def _lookup_job(audio_id):
+    """(text, voice_id) for a signed id, or None for bare or tampered ids."""
+    parts = audio_id.split(".")
+    if len(parts) != 3:
+        return None
+    key, payload, signature = parts
+    if not hmac.compare_digest(signature, _sign(key, payload)):
+        return None
     try:
-        # Accept various language forms: 'Marathi', 'mr', 'मराठी', 'marathi'
-        lang_key = (language or '').strip().lower()
-        if lang_key == 'marathi' or lang_key == 'mr':
-            lang_key = 'marathi'
+        raw = zlib.decompress(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        text, voice_id = json.loads(raw)
+    except (ValueError, TypeError, zlib.error) as e:
+        logger.warning(f"Undecodable audio id payload: {e}")
+        return None
+    return text, voice_id
 
-        # Default to Joanna (English) if language not found
-        voice_id = VOICE_MAPPING.get(lang_key, 'Joanna')
 
-        try:
-            response = polly_client.synthesize_speech(
-                Text=text,
-                OutputFormat='mp3',
-                VoiceId=voice_id,
-                Engine='neural'
-            )
-        except (BotoCoreError, ClientError) as e:
-            logger.warning(f"Neural engine failed for voice {voice_id}, falling back to standard. Error: {e}")
-            response = polly_client.synthesize_speech(
-                Text=text,
-                OutputFormat='mp3',
-                VoiceId=voice_id,
-                Engine='standard'
-            )
-
-        audio_stream = response.get('AudioStream')
+def get_cached_audio(audio_id):
+    """Returns cached audio (bytes-like) for the id, or None."""
+    if audio_cache is None:
+        return None
+    return audio_cache.get(cache_key(audio_id))
+
+
+@traced("polly.synthesize")
+def _synthesize_speech(text, voice_id):
+    polly_client = services.polly()
+    if polly_client is None:
+        raise RuntimeError("Polly client unavailable")
+    try:
+        return polly_client.synthesize_speech(
+            Text=text,
+            OutputFormat='mp3',
+            VoiceId=voice_id,
+            Engine='neural'
+        )
+    except aws_errors() as e:
+        logger.warning(f"Neural engine failed for voice {voice_id}, falling back to standard. Error: {e}")
+        return polly_client.synthesize_speech(
+            Text=text,
+            OutputFormat='mp3',
+            VoiceId=voice_id,
+            Engine='standard'
+        )
+
+
+def _synthesize_job(audio_id, text, voice_id):
+    key = cache_key(audio_id)
+    try:
+        cached = get_cached_audio(key)
+        if cached is not None:
+            return cached
+
+        audio_stream = _synthesize_speech(text, voice_id).get('AudioStream')
         if audio_stream:
             audio_bytes = audio_stream.read()
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-            return audio_base64
+            if audio_cache is not None:
+                audio_cache.put(key, audio_bytes)
+            return audio_bytes
 
         return None
 
-    except (BotoCoreError, ClientError) as e:
+    except aws_errors() as e:
         logger.error(f"Polly error: {e}")
         return None
     except Exception as e:
         logger.error(f"Unexpected error in TTS: {e}")
         return None
+
+
+def synthesize_audio(text, language="English"):
+    """
+    Returns MP3 bytes for the text, or None on failure.
+    Identical (text, voice, engine, format) requests are served from the audio
+    cache without calling Polly.
+    """
+    audio_id = register_audio(text, language=language)
+    return _synthesize_job(audio_id, text, voice_for_language(language))
+
+
+def synthesize_registered(audio_id):
+    """Synthesizes (or loads from cache) a previously registered audio id."""
+    job = _lookup_job(audio_id)
+    if job is None:
+        return get_cached_audio(audio_id)
+    return _synthesize_job(audio_id, *job)
+
+
+def prepare_audio(text, language="English"):
+    """
+    Synthesizes the text into the audio cache and returns its audio id,
+    or None if synthesis failed.
+    """
+    audio_id = register_audio(text, language=language)
+    if _synthesize_job(audio_id, text, voice_for_language(language)) is None:
+        return None
+    return audio_id
+
+
+def stream_audio(audio_id, chunk_size=AUDIO_STREAM_CHUNK_SIZE):
+    """
+    Returns a generator that passes Polly's AudioStream through chunk by chunk,
+    or None if the id doesn't carry a valid job. The complete audio is stored
+    in the cache once the stream has been read to the end. Errors end the
+    stream early, since the response headers have already gone out.
+    """
+    job = _lookup_job(audio_id)
+    if job is None:
+        return None
+    text, voice_id = job
+
+    def chunks():
+        parts = []
+        try:
+            audio_stream = _synthesize_speech(text, voice_id).get('AudioStream')
+            if not audio_stream:
+                return
+            for chunk in audio_stream.iter_chunks(chunk_size):
+                parts.append(chunk)
+                yield chunk
+        except aws_errors() as e:
+            logger.error(f"Polly error while streaming {cache_key(audio_id)}: {e}")
+            return
+        except Exception as e:
+            logger.error(f"Unexpected error while streaming {cache_key(audio_id)}: {e}")
+            return
+        if audio_cache is not None:
+            audio_cache.put(cache_key(audio_id), b"".join(parts))
+
+    return chunks()
+
+
+def generate_audio_base64(text, language="English"):
+    """
+    Generates speech from text using AWS Polly and returns it as a base64 encoded string.
+    """
+    audio_bytes = synthesize_audio(text, language=language)
+    if audio_bytes is None:
+        return None
+    return base64.b64encode(audio_bytes).decode('utf-8')
+
+
+def audio_cache_stats():
+    return audio_cache.stats() if audio_cache is not None else {"enabled": False}
+
+async def prepare_audio_async(text, language="English"):
+    """
+    Non-blocking variant of prepare_audio for async endpoints.
+    """
+    return await run_blocking(prepare_audio, text, language=language)
+
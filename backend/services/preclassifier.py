@@ -0,0 +1,251 @@
+import os
+import re
+import math
+import time
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# on     - answer gibberish/emergency locally and skip Bedrock
+# shadow - still call Bedrock, but record how often we would have agreed
+# off    - disabled
+# Shadow by default: local hits page a human, so check agreement_rate and
+# shadow_missed_emergencies on /stats against real traffic before enforcing.
+# 'on' falls back to shadow while any data/shorthand_messages.txt line is
+# classified as gibberish.
+PRECLASSIFIER_MODE = os.getenv("PRECLASSIFIER_MODE", "shadow").strip().lower()
+
+_TOKEN = re.compile(r'[A-Za-z0-9ऀ-ॿ]+')
+_DEVANAGARI = re.compile(r'[ऀ-ॿ]')
+_LATIN = re.compile(r'[A-Za-z]')
+
+# --- Emergency phrases ---
+# A danger word alone isn't enough ("Smoking allowed at station?", "the
+# accident report for my invoice"): each pattern needs the word in a phrase
+# that says something is happening. Matched against the message lower-cased
+# and reduced to its tokens, so punctuation and spacing don't matter.
+# Devanagari patterns avoid \b, which breaks on vowel signs.
+EMERGENCY_EN = (
+    r"\b(on|caught|catching|catches|catch) fire\b",
+    r"\bfire (in|on|from|inside|near) (my|the|a)\b",
+    r"\bthere (is|s|was) (a |an )?(fire|smoke|explosion|blast)\b",
+    r"\b(smoke|flames|sparks|fumes) (is |are )?(coming|come|comes|rising|from|out)\b",
+    r"\b(battery|vehicle|scooter|bike|car|charger|rickshaw|auto) (is |has |just |got )?(burning|exploded|blasted|smoking|sparking|melting)\b",
+    r"\b(i am|i m|im|i got|got|i have been|he is|she is|someone is|somebody is|driver is|we are|people are) (badly |seriously |very )?(injured|hurt|bleeding|electrocuted)\b",
+    r"\b(met with|had|have had|been in|meet with) (an |a )?accident\b",
+    r"\b(call|need|send|get) (an |the )?ambulance\b",
+    r"\b(got|getting|gave|giving) (an |a )?(electric )?shock\b",
+)
+# Hindi, in Devanagari and romanized
+EMERGENCY_HI = (
+    r"आग (लग|लगी|लगा)", r"\baag lag",
+    r"धु[आंँ]+ (निकल|आ रहा|उठ)", r"\bdhu(a|an|aan|am|wa) (nikal|aa raha|aa rha|uth)",
+    r"(धमाका|विस्फोट|ब्लास्ट) (हुआ|हो गया|हो गई)", r"\b(dhamaka|visfot|blast) (hua|ho gaya|ho gya)\b",
+    r"(घायल|जख्मी|ज़ख्मी) (हो|हूं|हूँ|है|हैं)", r"\b(ghayal|zakhmi|jakhmi) (ho|hu|hoon|hun|hai|hain)\b",
+    r"चोट (लग|आई)", r"\bchot (lag|aayi|aai|aa gayi)",
+    r"(दुर्घटना|हादसा|एक्सीडेंट) (हो|हुआ)", r"\b(accident|hadsa|durghatna) (ho gaya|ho gya|hua|ho gayi)\b",
+    r"(करंट|झटका) (लगा|लग)", r"\b(current|jhatka) (laga|lag gaya|lag gya)\b",
+    r"एम्बुलेंस (बुलाओ|भेजो|चाहिए)", r"\bambulance (bulao|bhejo|chahiye)\b",
+)
+EMERGENCY_MR = (
+    r"आग (लागली|लागले|लागला)", r"(पेटली|पेटला|पेटले|जळत आहे|जळाली)", r"\bpet(li|la|le)\b",
+    r"धूर (येत|निघत)", r"\bdhur (yet|nighat)",
+    r"स्फोट (झाला|झाले)", r"\bsphot (zala|jhala)\b",
+    r"अपघात (झाला|झाले)", r"\bapghat (zala|jhala)\b",
+    r"जखमी (झालो|झाला|झाले|आहे)", r"\bjakhmi (zalo|zala|jhalo|jhala|aahe)\b",
+)
+_EMERGENCY = re.compile("|".join(f"(?:{p})" for p in EMERGENCY_EN + EMERGENCY_HI + EMERGENCY_MR))
+
+EMERGENCY_RESPONSES = {
+    "English": "This sounds like an emergency. Please move away from the vehicle and battery right now. I am connecting you to a human agent immediately.",
+    "Hindi": "यह आपातकाल लगता है। कृपया तुरंत वाहन और बैटरी से दूर हो जाएं। मैं आपको अभी एक एजेंट से जोड़ रहा हूं।",
+    "Marathi": "ही आपत्कालीन परिस्थिती वाटते. कृपया लगेच वाहन आणि बॅटरीपासून दूर व्हा. मी तुम्हाला आत्ताच एजंटशी जोडत आहे.",
+}
+
+# Exactly what the prompt tells the model to return for gibberish
+GIBBERISH_RESULT = {"intent": "unrelated", "confidence": 1.0, "response": "I didn't understand that.", "language": "English", "escalate": True, "source": "preclassifier"}
+
+# --- Gibberish detection (Latin script only) ---
+# Words we should never call gibberish even if their spelling looks odd
+KNOWN_WORDS = frozenset("""
+a i ok hi hii hey hello help plz pls thx thanks bye yes no my me mr
+swap swaps battery batt station stn nearest invoice bill subscription plan
+leave sub recharge kya kab kaha kahan kaise kese kyu hai hain mera meri mujhe
+nahi nhi haan bhai sir madam hmm hmmm thnx tnx tq ty brb
+""".split())
+# SMS shorthand that fails the spelling heuristics below (no vowels, rare bigrams)
+SMS_ABBREVIATIONS = frozenset("""
+tmrw tmr tmrow tmw 2mrw 2day tdy ystrdy yday msg msgs txt pls plz plzz thnks thnk thks thku
+sry srry wat wht wen whn hw abt nd nw lyk pblm prblm prob pbm bcoz bcz coz cuz bcs frm wid wrk ofc
+dnt cnt wnt didnt isnt hrs mins secs amt pymt pmt recd rcvd acc acct acnt chrg chrgr chrgng
+chg bkp num mob nmbr dtls info pic pics docs req reqd asap btw idk omg ppl gud gm gn kk krna kro
+krdo krde krdiya hr kb jb tb sb bht bhut bohot bhot kch kuch kyc mkt stn svc srvc sm smth
+swp swpd btry bttry btr rchrg rchg sbscrptn sbscrpn subs pymnt pmnt invc rcpt nrst whr vhcl vcl
+khtm bhjo nxt hlp gd mrng nmskr nmste dhnywd dhnyvd xyz
+""".split())
+# Messages that must never be called gibberish; checked before mode 'on' is honoured
+SHORTHAND_MESSAGES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "shorthand_messages.txt")
+# Most frequent English bigrams (plus ones common in romanized Hindi/Marathi)
+COMMON_BIGRAMS = frozenset("""
+th he in er an re on at en nd ti es or te of ed is it al ar st to nt ng se ha as ou io le ve co me
+de hi ri ro ic ne ea ra ce li ch ll be ma si om ur ca el ta la ns di fo ho pe ec pr no ct us ac ot
+il tr ly nc et ut ss so rs un lo wa ge ie wh ee wi em ad ol rt po we na ul ni ts mo ow pa im mi ai
+sh ir su id os iv ia am fi ci vi pl ig tu ev ld ry mp fe bl ab gh ty op wo sa ay ex ke fr oo av ag
+if ap gr od bo sp rd do uc bu ei ov by rm ep tt oc fa ef cu rn sc gi da yo cr cl du ga qu ue ff ba
+ey ls va um pp ua up lu go ht ru ug ds lt pi rc rr eg au ck ew mu br bi pt ak pu ui rg ib tl ny ki
+rk ys ob mm fu ph og ms ye ud mb ip ub oi rl gu dr hr cc tw ft wn nu af hu nn eo vo rv nf xp gn sm
+fl iz ok nl my gl aw ju oa eq sy sl ps jo lf nv je nk kn gs dy hy ze ks xt bs ik dd cy rp sk xi oe
+oy ws lv dl rf eu dg wr xa yi ka kh bh dh jh ya aa ji ja jk ah zi az ji ku ko ek uk ai
+""".split())
+_VOWELS = frozenset("aeiouy")
+MIN_BIGRAM_SCORE = 0.5
+MAX_CONSONANT_RUN = 4
+
+
+def _char_entropy(token):
+    counts = Counter(token)
+    n = len(token)
+    return -sum(c / n * math.log2(c / n) for c in counts.values())
+
+
+def _looks_like_word(token):
+    """Heuristic for a single lower-cased Latin token of 3+ letters."""
+    if token in KNOWN_WORDS or token in SMS_ABBREVIATIONS or any(ch.isdigit() for ch in token):
+        return True
+    if len(token) >= 4 and _char_entropy(token) < 1.0:
+        return False  # "aaaa", "hhhhhh"
+    if not any(ch in _VOWELS for ch in token):
+        return False
+    run = longest = 0
+    for ch in token:
+        run = 0 if ch in _VOWELS else run + 1
+        longest = max(longest, run)
+    if longest > MAX_CONSONANT_RUN:
+        return False
+    bigrams = [token[i:i + 2] for i in range(len(token) - 1)]
+    score = sum(1 for b in bigrams if b in COMMON_BIGRAMS) / len(bigrams)
+    return score >= MIN_BIGRAM_SCORE
+
+
+def is_gibberish(text):
+    """
+    True only when no part of the message looks like language. Conservative:
+    Devanagari text, IDs/numbers and short replies ("ok", "hi") are left to the LLM.
+    """
+    if _DEVANAGARI.search(text):
+        return False
+    tokens = [t.lower() for t in _TOKEN.findall(text)]
+    if not tokens:
+        # Only punctuation/symbols
+        return bool(text.strip())
+    if not _LATIN.search(text):
+        return False
+    candidates = [t for t in tokens if len(t) >= 3]
+    if not candidates:
+        return False
+    return not any(_looks_like_word(t) for t in candidates)
+
+
+def load_shorthand_messages(path=SHORTHAND_MESSAGES_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    except OSError as e:
+        logger.warning(f"Could not read shorthand messages: {e}")
+        return []
+
+
+def shorthand_regressions(messages=None):
+    """The shorthand messages is_gibberish gets wrong."""
+    return [m for m in (load_shorthand_messages() if messages is None else messages) if is_gibberish(m)]
+
+
+def is_emergency(text):
+    normalized = " ".join(t.lower() for t in _TOKEN.findall(text.replace("'", "")))
+    return _EMERGENCY.search(normalized) is not None
+
+
+def emergency_result(language="English", source="preclassifier"):
+    """The localized emergency answer; it always escalates."""
+    lang = language if language in EMERGENCY_RESPONSES else "English"
+    return {"intent": "emergency", "confidence": 0.99, "response": EMERGENCY_RESPONSES[lang], "language": lang, "escalate": True, "source": source}
+
+
+class PreClassifier:
+    """
+    Answers the two cases the prompt hard-codes (gibberish and fire/smoke/
+    explosion/injury emergencies) without a model call, and keeps
+    hit/agreement stats.
+    """
+
+    def __init__(self, mode=PRECLASSIFIER_MODE):
+        self.mode = mode
+        self.counters = Counter()
+        self._total_us = 0.0
+        if mode == "on":
+            # A real message answered as gibberish is escalated instead of answered
+            misses = shorthand_regressions()
+            if misses:
+                logger.error(f"Pre-classifier calls {len(misses)} shorthand messages gibberish "
+                             f"(e.g. {misses[0]!r}); staying in shadow mode")
+                self.mode = "shadow"
+
+    @property
+    def enabled(self):
+        return self.mode in ("on", "shadow")
+
+    def classify(self, text, language="English"):
+        """Returns a complete intent result, or None if the LLM is needed."""
+        if not self.enabled or not text:
+            return None
+        start = time.perf_counter()
+        result = None
+        if is_emergency(text):
+            result = emergency_result(language)
+            self.counters["emergency_hits"] += 1
+        elif is_gibberish(text):
+            result = dict(GIBBERISH_RESULT)
+            self.counters["gibberish_hits"] += 1
+        self._total_us += (time.perf_counter() - start) * 1e6
+        self.counters["checks"] += 1
+        if result is not None:
+            self.counters["hits"] += 1
+        return result
+
+    def answer(self, text, language="English"):
+        """The local result when mode is 'on'; None means call the LLM."""
+        if self.mode != "on":
+            return None
+        return self.classify(text, language)
+
+    def observe(self, text, language, llm_result):
+        """Shadow mode: compares what we would have said with the LLM's answer."""
+        if self.mode != "shadow" or not llm_result or llm_result.get("intent") == "error":
+            return
+        local = self.classify(text, language)
+        llm_intent = llm_result.get("intent")
+        self.counters["shadow_compared"] += 1
+        if local is None:
+            if llm_intent == "emergency":
+                self.counters["shadow_missed_emergencies"] += 1
+            return
+        self.counters["shadow_hits_compared"] += 1
+        if local["intent"] == llm_intent:
+            self.counters["shadow_agreed"] += 1
+        else:
+            logger.info(f"Pre-classifier disagreed: local={local['intent']} llm={llm_intent} text={text!r}")
+
+    def stats(self):
+        checks = self.counters["checks"]
+        hits_compared = self.counters["shadow_hits_compared"]
+        return {
+            "mode": self.mode,
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / checks, 4) if checks else 0.0,
+            "agreement_rate": round(self.counters["shadow_agreed"] / hits_compared, 4) if hits_compared else None,
+            "avg_latency_us": round(self._total_us / checks, 2) if checks else 0.0,
+        }
+
+
+preclassifier = PreClassifier()
@@ -0,0 +1,198 @@
+import os
+import json
+import math
+import logging
+import threading
+from datetime import datetime, date
+
+logger = logging.getLogger(__name__)
+
+# Estimated input tokens per prompt; optional sections are trimmed to fit
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "900"))
+MAX_QUERY_CHARS = int(os.getenv("PROMPT_MAX_QUERY_CHARS", "1000"))
+
+# --- Static text, assembled once at import ---
+SYSTEM_PREAMBLE = """<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+You are a helpful AI assistant for a battery swapping service.
+
+Classify the user's intent into one of:
+- leave (checking leave balance, applying for leave)
+- subscription (plan details, renewal, upgrade)
+- nearest station (finding a battery station)
+- battery swap (process of swapping, issues with swapping)
+- invoice (last bill, amount, payment history)
+- emergency (critical safety issues like fire, blast, smoke, accident, injury)
+- unrelated (anything else)
+
+CRITICAL RULES:
+- If the intent is 'emergency' or 'unrelated', you MUST set "escalate": true.
+- If the user mentions fire, smoke, explosion, or immediate danger, classify as 'emergency'.
+- PRIORITY: If the user asks for an invoice, bill, or receipt (e.g., "battery swap invoice"), classify as 'invoice', even if 'battery swap' is mentioned.
+
+Output only the raw JSON object: no explanation, preamble, postscript or markdown code blocks. The "language" field must be one of "English", "Hindi", "Marathi".
+If the user input is gibberish, random characters, or meaningless, return:
+{"intent": "unrelated", "confidence": 1.0, "response": "I didn't understand that.", "language": "English", "escalate": true}"""
+
+EXAMPLE_FORMAT = """Example Format:
+{"intent": "DETECTED_INTENT", "confidence": 0.95, "response": "GENERATED_RESPONSE", "language": "DETECTED_LANGUAGE", "escalate": false}"""
+
+LANGUAGE_HINTS = {
+    "English": "Detected language: English. Answer in English.",
+    "Hindi": "Detected language: Hindi. Answer in Hindi (Devanagari).",
+    "Marathi": "Detected language: Marathi. Answer in Marathi using Devanagari script and set the 'language' field to 'Marathi'.",
+}
+# Optional: steers the model away from Hindi when answering in Marathi
+MARATHI_STYLE_HINT = "Use Marathi-specific phrases and grammar (examples: 'आहे', 'मला', 'कृपया', 'तुमची', 'तुम्ही', 'सदस्यत्व', 'शेवटचे') and avoid Hindi-only words like 'आपकी' or 'आपका'."
+
+USER_TURN = "<|eot_id|><|start_header_id|>user<|end_header_id|>\n{query}<|eot_id|><|start_header_id|>assistant<|end_header_id|>"
+
+# Context fields the model may use: (field, English label, Marathi label, priority).
+# Lower priority numbers are more important and are trimmed last.
+CONTEXT_FIELDS = (
+    ("name", "Name", "नाव", 1),
+    ("driver_name", "Name", "नाव", 1),
+    ("subscription", "Subscription", "सदस्यत्व", 1),
+    ("plan", "Plan", "योजना", 1),
+    ("subscription_expiry", "Subscription expiry", "सदस्यत्व समाप्ती", 1),
+    ("last_swap", "Last swap", "शेवटचा स्वॅप", 1),
+    ("last_invoice", "Last invoice", "शेवटचे बिल", 2),
+    ("last_bill", "Last bill", "शेवटचे बिल", 2),
+    ("amount", "Amount", "रक्कम", 2),
+    ("last_payment", "Last payment", "शेवटचे पेमेंट", 2),
+    ("leave_balance", "Leave balance", "रजा शिल्लक", 2),
+    ("driverId", "Driver ID", "ड्रायव्हर आयडी", 3),
+    ("driver_id", "Driver ID", "ड्रायव्हर आयडी", 3),
+    ("vehicle_no", "Vehicle", "वाहन क्रमांक", 3),
+)
+# Priorities of the optional non-context sections
+EXAMPLE_PRIORITY = 4
+STYLE_HINT_PRIORITY = 5
+
+
+def estimate_tokens(text):
+    """
+    Rough Llama 3 token estimate without loading a tokenizer: ~4 ASCII
+    characters per token, Devanagari and other scripts ~1.5 per token.
+    """
+    ascii_chars = sum(1 for ch in text if ch < "\x80")
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 1.5)
+
+
+_STATIC_TOKENS = estimate_tokens(SYSTEM_PREAMBLE) + estimate_tokens(USER_TURN)
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(timespec="minutes")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+    return str(value).strip()
+
+
+def context_lines(context, language):
+    """Whitelisted, non-empty context fields as (priority, "Label: value") pairs."""
+    lines = []
+    seen_labels = set()
+    for field, label, marathi_label, priority in CONTEXT_FIELDS:
+        value = (context or {}).get(field)
+        if value in (None, "", [], {}):
+            continue
+        label = marathi_label if language == "Marathi" else label
+        if label in seen_labels:
+            continue  # e.g. both driverId and driver_id
+        seen_labels.add(label)
+        lines.append((priority, f"{label}: {_format_value(value)}"))
+    return lines
+
+
+class PromptMetrics:
+    """Per-request prompt token counts (estimated, and Bedrock's own when reported)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.estimated_total = 0
+        self.estimated_max = 0
+        self.actual_requests = 0
+        self.actual_total = 0
+        self.trimmed_sections = 0
+        self.over_budget = 0
+
+    def observe_estimate(self, tokens, trimmed, over_budget):
+        with self._lock:
+            self.requests += 1
+            self.estimated_total += tokens
+            self.estimated_max = max(self.estimated_max, tokens)
+            self.trimmed_sections += trimmed
+            self.over_budget += int(over_budget)
+
+    def observe_actual(self, tokens):
+        if not tokens:
+            return
+        with self._lock:
+            self.actual_requests += 1
+            self.actual_total += int(tokens)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "budget": PROMPT_TOKEN_BUDGET,
+                "requests": self.requests,
+                "avg_estimated_tokens": round(self.estimated_total / self.requests, 1) if self.requests else 0.0,
+                "max_estimated_tokens": self.estimated_max,
+                "avg_actual_tokens": round(self.actual_total / self.actual_requests, 1) if self.actual_requests else None,
+                "trimmed_sections": self.trimmed_sections,
+                "over_budget": self.over_budget,
+            }
+
+
+prompt_metrics = PromptMetrics()
+
+
+def build_prompt(user_query, context, detected_lang_name, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Builds the Llama 3 prompt for intent classification.
+
+    The system preamble, language hint and user turn are always included.
+    Context lines, the example format and the Marathi style hint are optional
+    and dropped lowest-priority first (highest number, later lines first)
+    until the estimate fits the budget.
+    """
+    language = detected_lang_name if detected_lang_name in LANGUAGE_HINTS else "English"
+    query = (user_query or "")[:MAX_QUERY_CHARS]
+    hint = LANGUAGE_HINTS[language]
+
+    # (priority, order, section text); order keeps the output layout stable
+    optional = [(priority, i, line) for i, (priority, line) in enumerate(context_lines(context, language))]
+    optional.append((EXAMPLE_PRIORITY, len(optional), EXAMPLE_FORMAT))
+    if language == "Marathi":
+        optional.append((STYLE_HINT_PRIORITY, len(optional), MARATHI_STYLE_HINT))
+
+    used = _STATIC_TOKENS + estimate_tokens(query) + estimate_tokens(hint)
+    sizes = {i: estimate_tokens(text) + 1 for _, i, text in optional}
+    used += sum(sizes.values())
+    kept = set(sizes)
+    trimmed = 0
+    for priority, i, _ in sorted(optional, key=lambda s: (-s[0], -s[1])):
+        if used <= budget:
+            break
+        kept.discard(i)
+        used -= sizes[i]
+        trimmed += 1
+
+    over_budget = used > budget
+    if over_budget:
+        logger.warning(f"Prompt is ~{used} tokens, over the {budget} token budget after trimming")
+    prompt_metrics.observe_estimate(used, trimmed, over_budget)
+
+    facts = [text for priority, i, text in optional if i in kept and priority < EXAMPLE_PRIORITY]
+    extras = [text for priority, i, text in optional if i in kept and priority >= EXAMPLE_PRIORITY]
+
+    parts = [SYSTEM_PREAMBLE]
+    if facts:
+        parts.append("Driver details (use these values verbatim when relevant):\n" + "\n".join(facts))
+    parts.append(" ".join([hint] + [t for t in extras if t is MARATHI_STYLE_HINT]))
+    parts.extend(t for t in extras if t is EXAMPLE_FORMAT)
+    return "\n\n".join(parts) + USER_TURN.format(query=query)
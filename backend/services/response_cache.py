@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict, Counter
+from .prompt_builder import CONTEXT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+# Only reuse answers whose prompt carried no driver context at all
+RESPONSE_CACHE_CONTEXT_FREE_ONLY = os.getenv("RESPONSE_CACHE_CONTEXT_FREE_ONLY", "0") == "1"
+
+# Intents whose answers may be reused, and for how long. Intents missing
+# here (error, unknown, live_chat, ...) are never cached.
+DEFAULT_INTENT_TTLS = {
+    "subscription": 300,
+    "battery swap": 600,
+    "invoice": 300,
+    "leave": 300,
+    "nearest station": 3600,
+}
+# Never cached, whatever RESPONSE_CACHE_TTLS says: free-form answers that can
+# echo who the driver is ("Hi Arjun", "You are driver DRV 004"), and
+# emergencies, which must reach the model (and an agent) every time. Any
+# result with escalate=true is skipped as well.
+UNCACHEABLE_INTENTS = frozenset({"unrelated", "greeting", "emergency"})
+
+
+def _parse_ttls(raw):
+    """Parses RESPONSE_CACHE_TTLS, e.g. "invoice=60,nearest station=7200"."""
+    ttls = dict(DEFAULT_INTENT_TTLS)
+    for part in (raw or "").split(","):
+        if "=" in part:
+            intent, seconds = part.split("=", 1)
+            try:
+                ttls[intent.strip().lower()] = float(seconds)
+            except ValueError:
+                logger.warning(f"Ignoring bad RESPONSE_CACHE_TTLS entry: {part}")
+    return ttls
+
+
+INTENT_TTLS = _parse_ttls(os.getenv("RESPONSE_CACHE_TTLS"))
+
+# --- Query normalization ---
+# Common spelling variants of romanized Hindi/Marathi, folded to one form
+TRANSLIT_FOLDS = {
+    "kese": "kaise", "kaisey": "kaise", "kaise": "kaise", "kesa": "kaisa",
+    "kyaa": "kya", "kia": "kya", "kyu": "kyon", "kyun": "kyon", "kyo": "kyon",
+    "h": "hai", "he": "hai", "hain": "hai", "hy": "hai",
+    "kaha": "kahan", "kha": "kahan", "kidhar": "kahan",
+    "mera": "mera", "meraa": "mera", "mra": "mera", "meri": "meri", "mujhe": "mujhe", "mje": "mujhe",
+    "nhi": "nahi", "nai": "nahi", "nahin": "nahi",
+    "batery": "battery", "battary": "battery", "bettery": "battery",
+    "subscribtion": "subscription", "subcription": "subscription",
+    "staion": "station", "stn": "station",
+}
+# Filler that never changes the answer
+STOPWORDS = frozenset("""
+please pls plz kindly the a an hi hello hey sir madam ji bhai bro
+कृपया प्लीज नमस्ते नमस्कार जी
+""".split())
+_REPEATS = re.compile(r'(.)\1{2,}')
+
+
+def normalize_query(text):
+    """
+    Folds case, punctuation, whitespace and common transliteration variants so
+    "Where is the nearest station??" and "where is nearest station" share a key.
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    # Devanagari: drop nukta, treat chandrabindu as anusvara
+    text = text.replace("़", "").replace("ँ", "ं")
+    chars = []
+    for ch in text:
+        cat = unicodedata.category(ch)
+        if cat[0] in "PSZ" or ch.isspace():
+            chars.append(" ")
+        elif cat == "Mn" and ch < "ɐ":
+            continue  # Latin diacritics
+        else:
+            chars.append(ch)
+    words = []
+    for word in "".join(chars).split():
+        word = _REPEATS.sub(r"\1\1", word)
+        word = TRANSLIT_FOLDS.get(word, word)
+        if word not in STOPWORDS:
+            words.append(word)
+    return " ".join(words)
+
+
+def context_fingerprint(context):
+    """
+    Hash of every driver-context field the prompt builder may put in the
+    prompt (name and driver id included), or "" when there are none. An
+    answer is only ever reused for the exact same projected context: the
+    model can work any of these values into its reply, transliterated or
+    shortened, so there's no safe way to tell which ones it used.
+    """
+    values = {}
+    for field, _, _, _ in CONTEXT_FIELDS:
+        value = (context or {}).get(field)
+        if value not in (None, "", [], {}):
+            values[field] = value
+    if not values:
+        return ""
+    return hashlib.sha1(json.dumps(values, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Reuses intent results for repeated questions without calling Bedrock.
+
+    The key is (normalized query, language, fingerprint of the driver
+    context that went into the prompt). Answers given without any driver
+    context are shared by everyone; personalized ones are only reused for
+    the same driver with unchanged details. Entries expire per intent
+    (INTENT_TTLS). Used from executor threads, hence the lock.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttls=None, context_free_only=RESPONSE_CACHE_CONTEXT_FREE_ONLY, enabled=RESPONSE_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.ttls = ttls or INTENT_TTLS
+        self.context_free_only = context_free_only
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (query, language, fingerprint) -> (expires_at, result)
+        self.counters = Counter()
+
+    def get(self, query, language, context=None):
+        if not self.enabled:
+            return None
+        fingerprint = context_fingerprint(context)
+        if fingerprint and self.context_free_only:
+            self.counters["misses"] += 1
+            return None
+        key = (normalize_query(query), language, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            expires_at, result = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return {**result, "source": "cache"}
+
+    def put(self, query, language, context, result):
+        if not self.enabled or not result:
+            return
+        intent = str(result.get("intent", "")).lower()
+        ttl = self.ttls.get(intent, 0)
+        if intent in UNCACHEABLE_INTENTS or result.get("escalate") or ttl <= 0 or not result.get("response"):
+            self.counters["skipped"] += 1
+            return
+        fingerprint = context_fingerprint(context)
+        if fingerprint and self.context_free_only:
+            self.counters["skipped"] += 1
+            return
+        norm = normalize_query(query)
+        if not norm:
+            return
+        key = (norm, language, fingerprint)
+        stored = {k: v for k, v in result.items() if k != "source"}
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, stored)
+            self._entries.move_to_end(key)
+            self.counters["stores"] += 1
+            self.counters["personalized_stores" if fingerprint else "shared_stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "enabled": self.enabled,
+                "context_free_only": self.context_free_only,
+                "entries": len(self._entries),
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache()
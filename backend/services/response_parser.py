@@ -0,0 +1,218 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Candidate '{' positions tried before giving up on a generation
+MAX_DECODE_ATTEMPTS = 8
+
+_decoder = json.JSONDecoder()
+
+# Single-character JSON escapes
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class StreamingJSONParser:
+    """
+    Incremental parser for the JSON object the model generates.
+
+    Feed it text chunks as they arrive; it skips any preamble or markdown fence
+    before the first '{' and returns events as soon as they are known:
+      ("delta", key, text)  - new characters of a streamed string field
+      ("field", key, value) - a top-level key whose value is complete
+      ("done", None, dict)  - the top-level object closed
+    Work is linear in the total input size.
+    """
+
+    def __init__(self, stream_fields=("response",)):
+        self.stream_fields = set(stream_fields)
+        self.fields = {}
+        self.done = False
+        self._started = False
+        self._state = "key"      # key -> colon -> value -> after -> key ...
+        self._key = None
+        self._key_chars = []
+        self._in_string = False
+        self._escape = None      # None, "" right after a backslash, "uXXXX" while collecting
+        self._high_surrogate = None
+        self._raw = []           # raw text of a non-streamed value
+        self._value_depth = 0
+        self._streaming = False  # current value is a streamed string field
+        self._text = []          # decoded text of the streamed field
+        self._delta = []
+
+    def feed(self, chunk):
+        """
+        Consumes a chunk of generated text and returns the new events.
+        """
+        events = []
+        for ch in chunk:
+            if self.done:
+                break
+            self._step(ch, events)
+        self._flush_delta(events)
+        return events
+
+    def _flush_delta(self, events):
+        if self._delta:
+            events.append(("delta", self._key, "".join(self._delta)))
+            self._delta = []
+
+    def _decode(self, ch):
+        """Decodes one character inside a string; returns the text it produces."""
+        if self._escape is None:
+            if ch == '\\':
+                self._escape = ""
+                return ""
+            return ch
+        if self._escape == "":
+            if ch == 'u':
+                self._escape = "u"
+                return ""
+            self._escape = None
+            return _ESCAPES.get(ch, ch)
+        self._escape += ch
+        if len(self._escape) < 5:
+            return ""
+        try:
+            code = int(self._escape[1:], 16)
+        except ValueError:
+            code = 0xFFFD
+        self._escape = None
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
+    def _complete_value(self, value, events):
+        self.fields[self._key] = value
+        events.append(("field", self._key, value))
+        self._state = "after"
+
+    def _close(self, events):
+        self.done = True
+        events.append(("done", None, dict(self.fields)))
+
+    def _step(self, ch, events):
+        if not self._started:
+            if ch == '{':
+                self._started = True
+            return
+
+        if self._state == "key":
+            if self._in_string:
+                if ch == '"' and self._escape is None:
+                    self._in_string = False
+                    self._key = "".join(self._key_chars)
+                    self._state = "colon"
+                else:
+                    self._key_chars.append(self._decode(ch))
+            elif ch == '"':
+                self._in_string = True
+                self._key_chars = []
+            elif ch == '}':
+                self._close(events)
+            return
+
+        if self._state == "colon":
+            if ch == ':':
+                self._state = "value"
+                self._raw = []
+                self._value_depth = 0
+                self._streaming = False
+            return
+
+        if self._state == "after":
+            if ch == ',':
+                self._state = "key"
+            elif ch == '}':
+                self._close(events)
+            return
+
+        # self._state == "value"
+        if self._streaming:
+            if ch == '"' and self._escape is None:
+                self._in_string = False
+                self._streaming = False
+                self._flush_delta(events)
+                self._complete_value("".join(self._text), events)
+                return
+            text = self._decode(ch)
+            if text:
+                self._text.append(text)
+                self._delta.append(text)
+            return
+
+        if not self._raw and not self._in_string and ch.isspace():
+            return
+
+        if not self._raw and ch == '"' and self._key in self.stream_fields:
+            self._in_string = True
+            self._streaming = True
+            self._text = []
+            return
+
+        if self._in_string:
+            self._raw.append(ch)
+            if self._escape is not None:
+                self._escape = None
+            elif ch == '\\':
+                self._escape = ""
+            elif ch == '"':
+                self._in_string = False
+                if self._value_depth == 0:
+                    self._complete_value(self._load_raw(), events)
+            return
+
+        if self._value_depth == 0 and ch in ',}':
+            self._complete_value(self._load_raw(), events)
+            if ch == ',':
+                self._state = "key"
+            else:
+                self._close(events)
+            return
+
+        self._raw.append(ch)
+        if ch == '"':
+            self._in_string = True
+        elif ch in '{[':
+            self._value_depth += 1
+        elif ch in '}]':
+            self._value_depth -= 1
+            if self._value_depth == 0:
+                self._complete_value(self._load_raw(), events)
+
+    def _load_raw(self):
+        raw = "".join(self._raw).strip()
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            logger.debug(f"Streaming parser kept raw value for {self._key}: {raw}")
+            return raw
+
+
+def extract_json_object(text):
+    """
+    Returns the first complete JSON object in a model generation, or None.
+
+    Markdown fences, preambles and trailing text are skipped: each candidate
+    '{' is handed to raw_decode, which stops at the end of the object, and
+    only the first MAX_DECODE_ATTEMPTS candidates are tried.
+    """
+    if not text:
+        return None
+    idx = text.find('{')
+    attempts = 0
+    while idx != -1 and attempts < MAX_DECODE_ATTEMPTS:
+        try:
+            value, _ = _decoder.raw_decode(text, idx)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+        attempts += 1
+        idx = text.find('{', idx + 1)
+    return None
@@ -0,0 +1,168 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict, Counter
+
+from .audio_cache import normalize_text
+from .async_utils import submit_blocking
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_MEMO_MAX_ENTRIES = int(os.getenv("TRANSLATION_MEMO_MAX_ENTRIES", "2000"))
+# Misses longer than this are translated in the background; the first reply
+# goes out untranslated and later identical replies hit the memo.
+TRANSLATION_SYNC_MAX_CHARS = int(os.getenv("TRANSLATION_SYNC_MAX_CHARS", "200"))
+# Optional JSON file adding to the stock table: {"English text": {"Marathi": "...", "Hindi": "..."}}
+TRANSLATION_TABLE_PATH = os.getenv("TRANSLATION_TABLE_PATH")
+
+# The bot's fixed phrases, translated once by hand
+STOCK_PHRASES = {
+    "I didn't understand that.": {
+        "Marathi": "मला ते समजले नाही.",
+        "Hindi": "मुझे वह समझ नहीं आया।",
+    },
+    "Backend service unavailable.": {
+        "Marathi": "सेवा सध्या उपलब्ध नाही.",
+        "Hindi": "सेवा अभी उपलब्ध नहीं है।",
+    },
+    "AI service error": {
+        "Marathi": "सेवेत त्रुटी आली आहे.",
+        "Hindi": "सेवा में त्रुटि हुई है।",
+    },
+    "Error processing AI response": {
+        "Marathi": "उत्तर तयार करताना त्रुटी आली.",
+        "Hindi": "उत्तर तैयार करते समय त्रुटि हुई।",
+    },
+    "Unexpected error": {
+        "Marathi": "अनपेक्षित त्रुटी आली.",
+        "Hindi": "अप्रत्याशित त्रुटि हुई।",
+    },
+    "Message sent to agent.": {
+        "Marathi": "संदेश एजंटला पाठवला आहे.",
+        "Hindi": "संदेश एजेंट को भेज दिया गया है।",
+    },
+    "An agent will contact you shortly.": {
+        "Marathi": "एजंट लवकरच तुमच्याशी संपर्क साधेल.",
+        "Hindi": "एजेंट जल्द ही आपसे संपर्क करेगा।",
+    },
+    "I am connecting you to a human agent.": {
+        "Marathi": "मी तुम्हाला एजंटशी जोडत आहे.",
+        "Hindi": "मैं आपको एजेंट से जोड़ रहा हूं।",
+    },
+    "Please visit the nearest battery station.": {
+        "Marathi": "कृपया जवळच्या बॅटरी स्टेशनला भेट द्या.",
+        "Hindi": "कृपया नजदीकी बैटरी स्टेशन पर जाएं।",
+    },
+    "Please share your driver ID.": {
+        "Marathi": "कृपया तुमचा ड्रायव्हर आयडी सांगा.",
+        "Hindi": "कृपया अपना ड्राइवर आईडी बताएं।",
+    },
+    "Thank you!": {
+        "Marathi": "धन्यवाद!",
+        "Hindi": "धन्यवाद!",
+    },
+}
+
+
+def _load_table(path):
+    table = {normalize_text(k): v for k, v in STOCK_PHRASES.items()}
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                for text, translations in json.load(f).items():
+                    table.setdefault(normalize_text(text), {}).update(translations)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load translation table {path}: {e}")
+    return table
+
+
+class TranslationMemo:
+    """
+    Memoizes translations of bot replies, keyed on the normalized source text.
+
+    Lookups go to the stock-phrase table first, then an LRU of earlier model
+    translations. translate_fn(text, language) is the model call, used only
+    on a miss; it returns None on failure so errors are never memoized.
+    Used from executor threads, hence the lock.
+    """
+
+    def __init__(self, translate_fn, table=None, max_entries=TRANSLATION_MEMO_MAX_ENTRIES, sync_max_chars=TRANSLATION_SYNC_MAX_CHARS):
+        self.translate_fn = translate_fn
+        self.table = _load_table(TRANSLATION_TABLE_PATH) if table is None else table
+        self.max_entries = max_entries
+        self.sync_max_chars = sync_max_chars
+        self._lock = threading.Lock()
+        self._memo = OrderedDict()  # (text, language) -> translation
+        self._pending = set()
+        self.counters = Counter()
+
+    def lookup(self, text, language):
+        key = normalize_text(text)
+        stock = self.table.get(key, {}).get(language)
+        with self._lock:
+            if stock is not None:
+                self.counters["stock_hits"] += 1
+                return stock
+            translated = self._memo.get((key, language))
+            if translated is not None:
+                self._memo.move_to_end((key, language))
+                self.counters["memo_hits"] += 1
+            return translated
+
+    def translate(self, text, language):
+        """
+        Returns (translation, pending). On a miss, short texts are translated
+        inline; long ones are queued and the original text comes back with
+        pending=True.
+        """
+        if not text or not text.strip():
+            return text, False
+        translated = self.lookup(text, language)
+        if translated is not None:
+            return translated, False
+        with self._lock:
+            self.counters["misses"] += 1
+        if len(text) > self.sync_max_chars:
+            self.translate_in_background(text, language)
+            return text, True
+        translated = self._translate_and_store(text, language)
+        return (translated, False) if translated is not None else (text, False)
+
+    def translate_in_background(self, text, language):
+        key = (normalize_text(text), language)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            self.counters["background"] += 1
+        submit_blocking(self._translate_and_store, text, language)
+
+    def _translate_and_store(self, text, language):
+        key = (normalize_text(text), language)
+        try:
+            translated = self.translate_fn(text, language)
+        except Exception as e:
+            logger.error(f"{language} translation failed: {e}")
+            translated = None
+        with self._lock:
+            self._pending.discard(key)
+            if not translated:
+                self.counters["failures"] += 1
+                return None
+            self.counters["model_calls"] += 1
+            self._memo[key] = translated
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+                self.counters["evictions"] += 1
+        return translated
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "stock_phrases": len(self.table),
+                "memo_entries": len(self._memo),
+                "pending": len(self._pending),
+            }
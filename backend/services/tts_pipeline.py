@@ -0,0 +1,124 @@
+import os
+import re
+import asyncio
+import logging
+from .polly_service import prepare_audio_async
+
+logger = logging.getLogger(__name__)
+
+# Marker yielded by SpeechPipeline.chunks() after reset()
+RESET = object()
+
+# Sentences shorter than this are merged with the next one so we don't pay a
+# Polly round-trip for fragments like "Hi." or "1."
+MIN_SENTENCE_CHARS = int(os.getenv("TTS_MIN_SENTENCE_CHARS", "12"))
+
+# Sentence end: . ! ? or the Devanagari danda, followed by whitespace; or a newline
+_SENTENCE_END = re.compile(r'[.!?।॥]+["\')\]]*\s+|\n+')
+
+
+class SentenceSplitter:
+    """
+    Cuts streamed text into sentences as soon as each one is complete.
+    """
+
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        """Adds text and returns the sentences completed by it."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Returns whatever is left once the stream has ended."""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
+
+
+class SpeechPipeline:
+    """
+    Synthesizes sentences while the model is still generating.
+
+    Each sentence is sent to Polly as soon as it is complete and lands in the
+    audio cache; chunks() yields the audio ids strictly in sentence order,
+    regardless of which call finishes first.
+    """
+
+    def __init__(self, language, prepare=None, synthesize=prepare_audio_async):
+        self.language = language
+        self._prepare = prepare or (lambda text: text)
+        self._synthesize = synthesize
+        self._splitter = SentenceSplitter()
+        self._queue = asyncio.Queue()
+        self._tasks = []
+        self._seq = 0
+        self.spoken = []
+
+    def feed(self, text):
+        for sentence in self._splitter.feed(text):
+            self._submit(sentence)
+
+    def finish(self):
+        """Marks the end of the text; flushes the trailing partial sentence."""
+        for sentence in self._splitter.flush():
+            self._submit(sentence)
+        self._queue.put_nowait(None)
+
+    def reset(self, text):
+        """
+        Drops audio that hasn't been delivered yet and speaks `text` instead,
+        e.g. when the final response was translated after streaming.
+        Use instead of finish().
+        """
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._splitter = SentenceSplitter()
+        self.spoken = []
+        self._queue.put_nowait(RESET)
+        self.feed(text)
+        self.finish()
+
+    def _submit(self, sentence):
+        sentence = self._prepare(sentence)
+        task = asyncio.create_task(self._synthesize(sentence, language=self.language))
+        self._tasks.append(task)
+        self.spoken.append(sentence)
+        self._queue.put_nowait((self._seq, sentence, task))
+        self._seq += 1
+
+    async def chunks(self):
+        """
+        Yields (seq, sentence, audio_id) in order until the text is finished,
+        or RESET when previously yielded audio should be discarded.
+        """
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            if item is RESET:
+                yield RESET
+                continue
+            seq, sentence, task = item
+            try:
+                audio_id = await task
+            except asyncio.CancelledError:
+                if task.cancelled():
+                    continue
+                raise
+            except Exception as e:
+                logger.error(f"TTS failed for sentence {seq}: {e}")
+                continue
+            if audio_id:
+                yield seq, sentence, audio_id
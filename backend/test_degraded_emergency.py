@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+
+# Emergencies must still page an agent while Bedrock is down: forces the
+# breaker open (pre-classifier off, so only degraded mode can catch them) and
+# checks every degraded entry point escalates each phrase.
+# Usage (from backend/): python test_degraded_emergency.py
+
+os.environ["PRECLASSIFIER_MODE"] = "off"
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench.stubs import StubBedrockClient
+from services.container import services
+from services import bedrock_service
+from services.circuit_breaker import OPEN
+from services.bedrock_invoker import aws_errors
+
+PHRASES = [
+    ("my battery is on fire", "English"),
+    ("मेरी बैटरी में आग लग गई", "Hindi"),
+    ("I met with an accident", "English"),
+    ("there is smoke coming from the scooter", "English"),
+]
+
+services.override(bedrock_client=StubBedrockClient("fixed:0ms", "fixed:0ms", 0.0, 0.0, None))
+with bedrock_service.breaker._lock:
+    bedrock_service.breaker._transition(OPEN)
+
+
+def streamed(text):
+    _, chunks = bedrock_service.open_intent_stream(text)
+    return json.loads("".join(chunks))
+
+
+ENTRY_POINTS = [
+    ("detect_intent", bedrock_service.detect_intent),
+    ("open_intent_stream", streamed),
+    # A stream that failed midway with an AWS error
+    ("fallback_result", lambda text: bedrock_service.fallback_result(text, "English", None, aws_errors()[0]())),
+]
+
+failures = 0
+for text, language in PHRASES:
+    for name, call in ENTRY_POINTS:
+        result = call(text)
+        expected_language = "English" if name == "fallback_result" else language
+        if result.get("intent") == "emergency" and result.get("escalate") is True and result.get("language") == expected_language:
+            print(f"ok   {name}: {text!r}")
+        else:
+            failures += 1
+            print(f"FAIL {name}: {text!r} -> {result}")
+
+print(f"\nBreaker {bedrock_service.breaker.state}: {failures} failure(s)")
+sys.exit(1 if failures else 0)
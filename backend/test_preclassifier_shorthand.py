@@ -0,0 +1,26 @@
+import os
+import sys
+
+# Checks the pre-classifier against data/shorthand_messages.txt (real driver
+# shorthand that must never be called gibberish) and a few keyboard mashes
+# that must be. PRECLASSIFIER_MODE=on is refused while the first list fails.
+# Usage (from backend/): python test_preclassifier_shorthand.py
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.preclassifier import is_gibberish, load_shorthand_messages, shorthand_regressions
+
+GIBBERISH = ["asdfghjkl", "qwrtypsdfg", "zxcvbnm", "sdfsdf sdfsdf", "jjjjjjj", "fghfgh"]
+
+messages = load_shorthand_messages()
+failures = 0
+for message in shorthand_regressions(messages):
+    failures += 1
+    print(f"FAIL shorthand called gibberish: {message!r}")
+for text in GIBBERISH:
+    if not is_gibberish(text):
+        failures += 1
+        print(f"FAIL gibberish not caught: {text!r}")
+
+print(f"\n{len(messages)} shorthand messages, {len(GIBBERISH)} gibberish samples: {failures} failure(s)")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,52 @@
+
+import os
+import sys
+from datetime import datetime
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("MONGO_DB_NAME", "smart_battery_db")
+
+# Runs `explain` on every query shape the backend issues and fails if any of
+# them still needs a collection scan. Run after migrate_driver_keys.py and
+# once the app has started (it ensures the indexes).
+
+client = MongoClient(MONGO_URI)
+db = client[DB_NAME]
+
+QUERIES = [
+    ("drivers.driver_key", db.drivers, {"driver_key": "DRV001"}, None),
+    ("drivers.phone_key", db.drivers, {"phone_key": "9876543210"}, None),
+    ("messages.history", db.messages, {"driver_id": "DRV001"}, [("timestamp", -1), ("_id", -1)]),
+    ("escalations.active", db.escalations, {"driver_id": "DRV001", "status": "IN_PROGRESS"}, None),
+    ("escalations.queue", db.escalations, {"status": "OPEN"}, [("created_at", -1), ("_id", -1)]),
+]
+
+def stages(plan):
+    """Yields every stage name in a winning plan tree."""
+    yield plan.get("stage")
+    for child in plan.get("inputStages", []):
+        yield from stages(child)
+    if "inputStage" in plan:
+        yield from stages(plan["inputStage"])
+
+failures = 0
+for name, collection, query, sort in QUERIES:
+    cursor = collection.find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    plan = cursor.explain()["queryPlanner"]["winningPlan"]
+    # Sharded/SBE explains nest the classic plan one level down
+    plan = plan.get("queryPlan", plan)
+    found = set(stages(plan))
+    if "COLLSCAN" in found:
+        failures += 1
+        print(f"FAIL {name}: collection scan ({' -> '.join(s for s in stages(plan) if s)})")
+    else:
+        print(f"ok   {name}: {' -> '.join(s for s in stages(plan) if s)}")
+
+print(f"\nChecked at {datetime.utcnow().isoformat()}: {failures} collection scan(s)")
+sys.exit(1 if failures else 0)
@@ -1,8 +1,13 @@
 
 import os
+import sys
+from datetime import datetime
 from dotenv import load_dotenv
 from pymongo import MongoClient
 
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from services.mongo_service import lookup_keys_for
+
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
@@ -13,10 +18,12 @@ try:
     db = client[DB_NAME]
     
     # Update DRV001 with a phone number
-    result = db.drivers.update_one(
-        {"driverId": "DRV001"},
-        {"$set": {"phone": "9876543210"}}
-    )
+    changes = {"driverId": "DRV001", "phone": "9876543210"}
+    # The lookup keys are derived from the new values; updated_at lets the
+    # backend's driver cache notice the change
+    changes.update(lookup_keys_for(changes))
+    changes["updated_at"] = datetime.utcnow()
+    result = db.drivers.update_one({"driverId": "DRV001"}, {"$set": changes})
     
     if result.modified_count > 0:
         print("Updated DRV001 with phone number 9876543210")
@@ -1,6 +1,10 @@
 
 import sys
 import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+
 from services.bedrock_service import detect_intent
 from services.polly_service import generate_audio_base64
 
@@ -10,11 +10,15 @@ const AgentChat = () => {
     const [input, setInput] = useState('')
     const [loading, setLoading] = useState(false)
     const messagesEndRef = useRef(null)
+    const historyRef = useRef([])  // Server history so far; fetches only ask for what came after it
 
     useEffect(() => {
-        fetchHistory()
-        const interval = setInterval(fetchHistory, 3000) // Poll every 3 seconds
-        return () => clearInterval(interval)
+        historyRef.current = []
+        // New messages are pushed; (re)connecting catches up on anything missed
+        const events = new EventSource(`${import.meta.env.VITE_API_URL}/events/driver/${driverId}`)
+        events.onopen = fetchHistory
+        events.addEventListener('message', (e) => mergeMessages([JSON.parse(e.data)]))
+        return () => events.close()
     }, [driverId])
 
     useEffect(() => {
@@ -23,13 +27,27 @@ const AgentChat = () => {
 
     const fetchHistory = async () => {
         try {
-            const response = await axios.get(`${import.meta.env.VITE_API_URL}/chat/history/${driverId}`)
-            setMessages(response.data)
+            // Ask only for messages after the newest one we already have
+            const last = historyRef.current[historyRef.current.length - 1]
+            const response = await axios.get(`${import.meta.env.VITE_API_URL}/chat/history/${driverId}`, {
+                params: last ? { after: last.cursor } : {},
+                validateStatus: status => status === 200 || status === 304
+            })
+            if (response.status === 304) return
+            mergeMessages(response.data)
         } catch (err) {
             console.error("Failed to fetch history:", err)
         }
     }
 
+    const mergeMessages = (incoming) => {
+        const known = new Set(historyRef.current.map(msg => msg.id))
+        const fresh = incoming.filter(msg => !known.has(msg.id))
+        if (fresh.length === 0) return
+        historyRef.current = [...historyRef.current, ...fresh]
+        setMessages(historyRef.current)
+    }
+
     const sendMessage = async (e) => {
         e.preventDefault()
         if (!input.trim()) return
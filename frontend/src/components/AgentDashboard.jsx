@@ -8,21 +8,32 @@ const AgentDashboard = () => {
     const [tickets, setTickets] = useState([])
     const [loading, setLoading] = useState(true)
     const [activeTab, setActiveTab] = useState('OPEN')
+    const [nextCursor, setNextCursor] = useState(null)
+    const [total, setTotal] = useState(0)
+    const [loadingMore, setLoadingMore] = useState(false)
 
     useEffect(() => {
         fetchTickets()
     }, [activeTab])
 
-    // Auto-refresh every 5 seconds
+    // Refresh when an escalation is created, accepted or resolved
     useEffect(() => {
-        const interval = setInterval(fetchTickets, 5000)
-        return () => clearInterval(interval)
+        const events = new EventSource(`${import.meta.env.VITE_API_URL}/events/agents`)
+        events.onopen = fetchTickets
+        events.addEventListener('escalation', fetchTickets)
+        return () => events.close()
     }, [activeTab])
 
+    // Refreshes only ever fetch the first page, so their cost doesn't grow with history
     const fetchTickets = async () => {
         try {
-            const response = await axios.get(`${import.meta.env.VITE_API_URL}/agent/escalations?status=${activeTab}`)
-            setTickets(response.data)
+            const [page, count] = await Promise.all([
+                axios.get(`${import.meta.env.VITE_API_URL}/agent/escalations`, { params: { status: activeTab } }),
+                axios.get(`${import.meta.env.VITE_API_URL}/agent/escalations/count`, { params: { status: activeTab } })
+            ])
+            setTickets(page.data.tickets)
+            setNextCursor(page.data.next_cursor)
+            setTotal(count.data.count)
             setLoading(false)
         } catch (err) {
             console.error("Failed to fetch tickets:", err)
@@ -30,6 +41,24 @@ const AgentDashboard = () => {
         }
     }
 
+    const loadMore = async () => {
+        if (!nextCursor) return
+        setLoadingMore(true)
+        try {
+            const response = await axios.get(`${import.meta.env.VITE_API_URL}/agent/escalations`, {
+                params: { status: activeTab, before: nextCursor }
+            })
+            setTickets(prev => {
+                const known = new Set(prev.map(ticket => ticket.id))
+                return [...prev, ...response.data.tickets.filter(ticket => !known.has(ticket.id))]
+            })
+            setNextCursor(response.data.next_cursor)
+        } catch (err) {
+            console.error("Failed to load more tickets:", err)
+        }
+        setLoadingMore(false)
+    }
+
     const handleAccept = async (ticketId, driverId) => {
         try {
             await axios.post(`${import.meta.env.VITE_API_URL}/agent/accept`, { ticket_id: ticketId })
@@ -133,6 +162,14 @@ const AgentDashboard = () => {
                     )}
                 </div>
             )}
+
+            {!loading && nextCursor && (
+                <div style={{ textAlign: 'center', marginTop: '20px' }}>
+                    <button onClick={loadMore} disabled={loadingMore} className="secondary" style={{ width: 'auto' }}>
+                        {loadingMore ? 'Loading...' : `Load more (${tickets.length} of ${total})`}
+                    </button>
+                </div>
+            )}
         </div>
     )
 }
@@ -3,6 +3,36 @@ import { useNavigate, useLocation, Navigate } from 'react-router-dom'
 import { useState, useRef, useEffect } from 'react'
 import axios from 'axios'
 
+// POSTs to /chat/stream and calls onEvent(event, data) for every Server-Sent Event
+const streamChat = async (payload, onEvent) => {
+    const res = await fetch(`${import.meta.env.VITE_API_URL}/chat/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload)
+    })
+    if (!res.ok || !res.body) throw new Error(`Stream failed: ${res.status}`)
+
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader()
+    let buffer = ''
+    while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += value
+        let sep
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, sep)
+            buffer = buffer.slice(sep + 2)
+            let event = 'message'
+            let data = ''
+            for (const line of raw.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim()
+                else if (line.startsWith('data:')) data += line.slice(5).trim()
+            }
+            if (data) onEvent(event, JSON.parse(data))
+        }
+    }
+}
+
 const ChatInterface = () => {
     const navigate = useNavigate()
     const location = useLocation()
@@ -16,6 +46,10 @@ const ChatInterface = () => {
     const [isListening, setIsListening] = useState(false)
     const [startTime] = useState(Date.now())  // Track when this session started locally
     const messagesEndRef = useRef(null)
+    const streamingRef = useRef(false)  // Pause history polling while a reply is streaming in
+    const audioQueueRef = useRef([])  // Sentence-by-sentence playback queue for streamed audio
+    const currentAudioRef = useRef(null)
+    const historyRef = useRef([])  // Server history so far; fetches only ask for what came after it
 
     if (!driverId) {
         return <Navigate to="/" />
@@ -42,6 +76,36 @@ const ChatInterface = () => {
         }
     }
 
+    const playNextAudio = () => {
+        const src = audioQueueRef.current.shift()
+        if (!src) {
+            currentAudioRef.current = null
+            return
+        }
+        const audio = new Audio(src)
+        currentAudioRef.current = audio
+        audio.onended = playNextAudio
+        audio.onerror = playNextAudio
+        audio.play().catch(audioErr => {
+            console.error("Failed to play audio:", audioErr)
+            playNextAudio()
+        })
+    }
+
+    const enqueueAudio = (src) => {
+        audioQueueRef.current.push(src)
+        if (!currentAudioRef.current) playNextAudio()
+    }
+
+    const stopAudio = () => {
+        audioQueueRef.current = []
+        if (currentAudioRef.current) {
+            currentAudioRef.current.onended = null
+            currentAudioRef.current.pause()
+            currentAudioRef.current = null
+        }
+    }
+
     const scrollToBottom = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: "smooth" })
     }
@@ -59,66 +123,88 @@ const ChatInterface = () => {
         setInput('')
         setLoading(true)
 
-        try {
-            const response = await axios.post(`${import.meta.env.VITE_API_URL}/chat`, {
-                message: userMsg,
-                driver_id: driverId
-            })
-
-            const data = response.data
-
-            // Only add bot response if it exists (live chat might not return immediate response)
-            if (data.response) {
-                setMessages(prev => [...prev, {
-                    role: 'bot',
-                    text: data.response,
-                    intent: data.intent,
-                    escalate: data.escalate
-                }])
-            }
+        const botId = Date.now()
+        const updateBot = (patch) => setMessages(prev => prev.map(m => m.id === botId ? { ...m, ...patch(m) } : m))
+        let started = false
+        const start = () => {
+            if (started) return
+            started = true
+            setLoading(false)
+            setMessages(prev => [...prev, { id: botId, role: 'bot', text: '' }])
+        }
 
-            // Play Audio if available
-            if (data.audio) {
-                try {
-                    const audio = new Audio(`data:audio/mp3;base64,${data.audio}`)
-                    audio.play()
-                } catch (audioErr) {
-                    console.error("Failed to play audio:", audioErr)
+        streamingRef.current = true
+        try {
+            await streamChat({ message: userMsg, driver_id: driverId }, (event, data) => {
+                if (event === 'token') {
+                    start()
+                    updateBot(m => ({ text: m.text + data.text }))
+                } else if (event === 'meta') {
+                    start()
+                    updateBot(() => data)
+                } else if (event === 'done') {
+                    // Live chat might not return an immediate response
+                    if (!data.response) return
+                    start()
+                    updateBot(() => ({ text: data.response, intent: data.intent, escalate: data.escalate }))
+
+                    // Handoff Simulation (Only if strictly escalated by AI, not live chat)
+                    if (data.escalate && !data.live_mode) {
+                        setTimeout(() => {
+                            setMessages(prev => [...prev, {
+                                role: 'bot',
+                                text: "⚠️ Escalation triggered. Connecting you to a human agent... Please wait.",
+                                intent: "system"
+                            }])
+                        }, 1500)
+                    }
+                } else if (event === 'audio') {
+                    // Sentence audio arrives in order; queue it behind what is playing.
+                    // The browser streams /audio/{id} and starts playing progressively.
+                    enqueueAudio(`${import.meta.env.VITE_API_URL}${data.audio_url}`)
+                } else if (event === 'audio_reset') {
+                    stopAudio()
                 }
-            }
-
-            // Handoff Simulation (Only if strictly escalated by AI, not live chat)
-            if (data.escalate && !data.live_mode) {
-                setTimeout(() => {
-                    setMessages(prev => [...prev, {
-                        role: 'bot',
-                        text: "⚠️ Escalation triggered. Connecting you to a human agent... Please wait.",
-                        intent: "system"
-                    }])
-                }, 1500)
-            }
+            })
 
         } catch (err) {
             setMessages(prev => [...prev, { role: 'bot', text: "Sorry, I'm having trouble connecting to the server." }])
         } finally {
+            streamingRef.current = false
             setLoading(false)
         }
     }
 
-    // Polling and History logic
+    // Live history: the server pushes an event per message, and each one
+    // triggers a fetch of whatever came after our newest message
     useEffect(() => {
         if (!driverId) return;
 
+        historyRef.current = []
+
         const fetchHistory = async () => {
+            if (streamingRef.current) return
             try {
-                const response = await axios.get(`https://voicebot-0khz.onrender.com/chat/history/${driverId}`)
+                // Ask only for messages after the newest one we already have
+                const last = historyRef.current[historyRef.current.length - 1]
+                const response = await axios.get(`${import.meta.env.VITE_API_URL}/chat/history/${driverId}`, {
+                    params: last ? { after: last.cursor } : {},
+                    validateStatus: status => status === 200 || status === 304
+                })
+                if (response.status === 304) return
+
+                const known = new Set(historyRef.current.map(msg => msg.id))
+                const fresh = response.data.filter(msg => !known.has(msg.id))
+                if (fresh.length === 0) return
+                historyRef.current = [...historyRef.current, ...fresh]
+                const allMessages = historyRef.current
 
                 // Check if the chat was ended by agent
-                const lastMsg = response.data[response.data.length - 1]
+                const lastMsg = allMessages[allMessages.length - 1]
                 if (lastMsg && lastMsg.text === "Chat ended by agent." && lastMsg.sender === 'system') {
                     // Force a local update to include this message then stop
                     // Filter one last time to make sure we show the relevant history
-                    const history = response.data
+                    const history = allMessages
                         .filter(msg => !msg.timestamp || new Date(msg.timestamp).getTime() > startTime)
                         .map(msg => ({
                             role: msg.sender === 'user' ? 'user' : (msg.sender === 'system' ? 'system' : 'bot'),
@@ -132,7 +218,7 @@ const ChatInterface = () => {
 
                 // Normal Flow: Filter history based on local session start time
                 // (Assumes backend messages have valid timestamps)
-                const history = response.data
+                const history = allMessages
                     .filter(msg => !msg.timestamp || new Date(msg.timestamp).getTime() > startTime)
                     .map(msg => ({
                         role: msg.sender === 'user' ? 'user' : 'bot',
@@ -151,9 +237,10 @@ const ChatInterface = () => {
             }
         }
 
-        fetchHistory()
-        const interval = setInterval(fetchHistory, 3000)
-        return () => clearInterval(interval)
+        const events = new EventSource(`${import.meta.env.VITE_API_URL}/events/driver/${driverId}`)
+        events.onopen = fetchHistory
+        events.addEventListener('message', fetchHistory)
+        return () => events.close()
     }, [driverId, startTime])
 
 
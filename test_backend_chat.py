@@ -16,7 +16,7 @@ try:
     if response.status_code == 200:
         data = response.json()
         print(f"Response Intent: {data.get('intent')}")
-        print(f"Has Audio: {'audio' in data}")
+        print(f"Has Audio: {'audio_url' in data}")
     else:
         print(f"Response: {response.text}")
 except Exception as e:
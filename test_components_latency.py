@@ -5,6 +5,8 @@ import time
 import logging
 
 sys.path.append(os.path.abspath('backend'))
+from dotenv import load_dotenv
+load_dotenv()
 os.environ['AWS_REGION'] = 'us-west-2'
 
 try: